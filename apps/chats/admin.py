@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Conversacion, Mensaje
+from .models import Conversacion, Mensaje, ConversacionLectura, BloqueMensajesArchivados
 
 
 @admin.register(Conversacion)
@@ -50,4 +50,19 @@ class MensajeAdmin(admin.ModelAdmin):
             return f"[{obj.get_tipo_display()}]"
         return obj.contenido[:50] + '...' if len(obj.contenido) > 50 else obj.contenido
     
-    contenido_corto.short_description = 'Contenido'
\ No newline at end of file
+    contenido_corto.short_description = 'Contenido'
+
+
+@admin.register(ConversacionLectura)
+class ConversacionLecturaAdmin(admin.ModelAdmin):
+    list_display = ['id_conversacion', 'id_usuario', 'ultimo_leido_id', 'fecha']
+    search_fields = ['id_usuario__nombres', 'id_usuario__apellidos']
+    readonly_fields = ['fecha']
+
+
+@admin.register(BloqueMensajesArchivados)
+class BloqueMensajesArchivadosAdmin(admin.ModelAdmin):
+    list_display = ['id', 'id_conversacion', 'mes', 'id_mensaje_desde', 'id_mensaje_hasta', 'cantidad', 'created_at']
+    list_filter = ['mes']
+    exclude = ['datos']
+    readonly_fields = ['id_conversacion', 'mes', 'id_mensaje_desde', 'id_mensaje_hasta', 'cantidad', 'created_at']
\ No newline at end of file
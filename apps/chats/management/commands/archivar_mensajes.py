@@ -0,0 +1,99 @@
+"""
+Mueve los mensajes antiguos a bloques mensuales comprimidos (BloqueMensajesArchivados).
+
+Uso:
+    python manage.py archivar_mensajes
+    python manage.py archivar_mensajes --dias 90 --bloque 500
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.chats.models import Mensaje, BloqueMensajesArchivados
+
+
+class Command(BaseCommand):
+    help = 'Archiva en bloques comprimidos los mensajes más antiguos que N días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'CHATS_ARCHIVO_DIAS', 180),
+            help='Antigüedad mínima (en días) de los mensajes a archivar'
+        )
+        parser.add_argument(
+            '--bloque',
+            type=int,
+            default=getattr(settings, 'CHATS_ARCHIVO_BLOQUE', 1000),
+            help='Cantidad máxima de mensajes por bloque'
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        antiguos = Mensaje.objects.filter(fecha_envio__lt=limite)
+
+        conversaciones = antiguos.order_by().values_list('id_conversacion', flat=True).distinct()
+
+        total_mensajes = 0
+        total_bloques = 0
+        for conversacion_id in conversaciones.iterator():
+            mensajes, bloques = self.archivar_conversacion(
+                antiguos.filter(id_conversacion=conversacion_id),
+                conversacion_id,
+                options['bloque']
+            )
+            total_mensajes += mensajes
+            total_bloques += bloques
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_mensajes} mensajes archivados en {total_bloques} bloques'
+        ))
+
+    def archivar_conversacion(self, antiguos, conversacion_id, tamano_bloque):
+        """Recorre los mensajes por id en lotes y cierra un bloque por cada cambio de mes"""
+        total = 0
+        bloques = 0
+        pendientes = []
+        mes_actual = None
+        ultimo_id = 0
+
+        while True:
+            lote = list(antiguos.filter(id_mensaje__gt=ultimo_id).order_by('id_mensaje')[:tamano_bloque])
+            if not lote:
+                break
+            ultimo_id = lote[-1].id_mensaje
+
+            for mensaje in lote:
+                mes = timezone.localtime(mensaje.fecha_envio).date().replace(day=1)
+                if pendientes and (mes != mes_actual or len(pendientes) >= tamano_bloque):
+                    total += self.guardar_bloque(conversacion_id, mes_actual, pendientes)
+                    bloques += 1
+                    pendientes = []
+                mes_actual = mes
+                pendientes.append(mensaje)
+
+        if pendientes:
+            total += self.guardar_bloque(conversacion_id, mes_actual, pendientes)
+            bloques += 1
+
+        return total, bloques
+
+    @transaction.atomic
+    def guardar_bloque(self, conversacion_id, mes, mensajes):
+        """Crea el bloque comprimido y elimina las filas originales en la misma transacción"""
+        ids = [mensaje.id_mensaje for mensaje in mensajes]
+        BloqueMensajesArchivados.objects.create(
+            id_conversacion_id=conversacion_id,
+            mes=mes,
+            id_mensaje_desde=ids[0],
+            id_mensaje_hasta=ids[-1],
+            cantidad=len(ids),
+            datos=BloqueMensajesArchivados.comprimir(mensajes)
+        )
+        Mensaje.objects.filter(id_mensaje__in=ids).delete()
+        return len(ids)
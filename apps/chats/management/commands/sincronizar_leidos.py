@@ -0,0 +1,46 @@
+"""
+Rellena los campos de compatibilidad `leido`/`fecha_leido` de Mensaje
+a partir de las marcas de lectura (ConversacionLectura).
+
+Uso:
+    python manage.py sincronizar_leidos
+    python manage.py sincronizar_leidos --desde-horas 24
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.chats.models import ConversacionLectura
+from apps.chats.utils import sincronizar_flags_leido
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza los flags leido de Mensaje con las marcas de lectura'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde-horas',
+            type=int,
+            default=None,
+            help='Procesar solo marcas actualizadas en las últimas N horas'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de mensajes actualizados por UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        lecturas = ConversacionLectura.objects.all().order_by('id')
+        if options['desde_horas'] is not None:
+            limite = timezone.now() - timedelta(hours=options['desde_horas'])
+            lecturas = lecturas.filter(fecha__gte=limite)
+
+        total = 0
+        for lectura in lecturas.iterator(chunk_size=500):
+            total += sincronizar_flags_leido(lectura, tamano_lote=options['lote'])
+
+        self.stdout.write(self.style.SUCCESS(f'{total} mensajes marcados como leídos'))
@@ -1,4 +1,10 @@
+import json
+import zlib
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.utils.dateparse import parse_datetime
 
 
 class Conversacion(models.Model):
@@ -72,6 +78,10 @@ class Conversacion(models.Model):
         return self.id_usuario_2 if self.id_usuario_1 == usuario_actual else self.id_usuario_1
 
 
+# Configuración de texto completo de la búsqueda de mensajes (ver utils.buscar_mensajes)
+FTS_CONFIG = 'spanish'
+
+
 class Mensaje(models.Model):
     TIPO_MENSAJE_CHOICES = [
         ('texto', 'Texto'),
@@ -119,14 +129,108 @@ class Mensaje(models.Model):
         ordering = ['fecha_envio']
         indexes = [
             models.Index(fields=['id_conversacion', '-fecha_envio']),
-            models.Index(fields=['id_remitente'])
+            models.Index(fields=['id_remitente']),
+            # Misma expresión que filtra utils.buscar_mensajes (solo PostgreSQL)
+            GinIndex(SearchVector('contenido', config=FTS_CONFIG), name='mensaje_contenido_fts_idx'),
         ]
 
     def __str__(self):
         estado = "(eliminado)" if self.eliminado else "(editado)" if self.editado else ""
         return f"Mensaje de {self.id_remitente} {estado}"
 
-    def marcar_como_leido(self):
-        if not self.leido:
-            self.leido = True
-            self.save(update_fields=['leido', 'fecha_leido'])
\ No newline at end of file
+    def marcar_como_leido(self, lector):
+        """Avanza la marca de lectura del lector hasta este mensaje"""
+        from .utils import marcar_conversacion_leida
+        marcar_conversacion_leida(self.id_conversacion_id, lector, hasta_id=self.id_mensaje)
+
+
+class ConversacionLectura(models.Model):
+    """
+    Marca de lectura por participante.
+    Todo mensaje con id_mensaje > ultimo_leido_id se considera no leído.
+    """
+    id = models.AutoField(primary_key=True)
+    id_conversacion = models.ForeignKey(
+        'Conversacion',
+        on_delete=models.CASCADE,
+        related_name='lecturas',
+        db_column='id_conversacion'
+    )
+    id_usuario = models.ForeignKey(
+        'users.Usuario',
+        on_delete=models.CASCADE,
+        related_name='lecturas_conversacion',
+        db_column='id_usuario'
+    )
+    ultimo_leido_id = models.IntegerField(default=0)
+    fecha = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'conversacion_lectura'
+        unique_together = [['id_conversacion', 'id_usuario']]
+        indexes = [
+            models.Index(fields=['id_usuario'])
+        ]
+
+    def __str__(self):
+        return f"{self.id_usuario} leyó hasta {self.ultimo_leido_id}"
+
+
+class BloqueMensajesArchivados(models.Model):
+    """
+    Bloque comprimido de mensajes antiguos de una conversación.
+    Cada bloque pertenece a un solo mes y cubre un rango contiguo de ids.
+    """
+    CAMPOS = [
+        'id_mensaje', 'id_remitente_id', 'tipo', 'contenido', 'archivo',
+        'leido', 'fecha_leido', 'editado', 'eliminado', 'fecha_envio', 'updated_at',
+    ]
+    CAMPOS_FECHA = ['fecha_leido', 'fecha_envio', 'updated_at']
+
+    id = models.AutoField(primary_key=True)
+    id_conversacion = models.ForeignKey(
+        'Conversacion',
+        on_delete=models.CASCADE,
+        related_name='bloques_archivados',
+        db_column='id_conversacion'
+    )
+    mes = models.DateField()  # Primer día del mes
+    id_mensaje_desde = models.IntegerField()
+    id_mensaje_hasta = models.IntegerField()
+    cantidad = models.IntegerField()
+    datos = models.BinaryField()  # JSON comprimido con zlib
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'mensaje_archivo'
+        indexes = [
+            models.Index(fields=['id_conversacion', '-id_mensaje_hasta']),
+            models.Index(fields=['mes'])
+        ]
+
+    def __str__(self):
+        return f"Archivo {self.mes:%Y-%m} de la conversación {self.id_conversacion_id}"
+
+    @classmethod
+    def comprimir(cls, mensajes):
+        """Serializa y comprime una lista de Mensaje"""
+        filas = []
+        for mensaje in mensajes:
+            fila = {campo: getattr(mensaje, campo) for campo in cls.CAMPOS}
+            for campo in cls.CAMPOS_FECHA:
+                if fila[campo] is not None:
+                    fila[campo] = fila[campo].isoformat()
+            filas.append(fila)
+        return zlib.compress(json.dumps(filas, ensure_ascii=False).encode('utf-8'), 6)
+
+    def leer(self):
+        """Devuelve los mensajes del bloque como instancias de Mensaje (sin guardar)"""
+        filas = json.loads(zlib.decompress(bytes(self.datos)).decode('utf-8'))
+        mensajes = []
+        for fila in filas:
+            for campo in self.CAMPOS_FECHA:
+                if fila[campo] is not None:
+                    fila[campo] = parse_datetime(fila[campo])
+            mensajes.append(Mensaje(id_conversacion_id=self.id_conversacion_id, **fila))
+        return mensajes
\ No newline at end of file
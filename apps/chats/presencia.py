@@ -0,0 +1,83 @@
+"""
+Presencia y estado "escribiendo..." de los chats.
+Todo vive en la caché con expiración; no se escribe nada en la base de datos.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+PRESENCIA_TTL = getattr(settings, 'CHATS_PRESENCIA_TTL', 60)
+ESCRIBIENDO_TTL = getattr(settings, 'CHATS_ESCRIBIENDO_TTL', 6)
+PARTICIPANTES_TTL = 60 * 60 * 24
+# El cliente consulta el estado más seguido de lo que dura "escribiendo..."
+ESTADO_INTERVALO = max(1, min(getattr(settings, 'CHATS_ESTADO_INTERVALO', 3), ESCRIBIENDO_TTL // 2))
+
+
+def _clave_presencia(id_usuario):
+    return f'chats:presencia:{id_usuario}'
+
+
+def _clave_escribiendo(id_conversacion, id_usuario):
+    return f'chats:escribiendo:{id_conversacion}:{id_usuario}'
+
+
+def participantes(id_conversacion):
+    """
+    (id_usuario_1, id_usuario_2) de la conversación, o None si no existe.
+    Los participantes no cambian, así que el sondeo del estado no consulta la base.
+    """
+    from .models import Conversacion
+
+    clave = f'chats:participantes:{id_conversacion}'
+    pareja = cache.get(clave)
+    if pareja is None:
+        pareja = Conversacion.objects.filter(id_conversacion=id_conversacion).values_list(
+            'id_usuario_1_id', 'id_usuario_2_id'
+        ).first()
+        if pareja is None:
+            return None
+        cache.set(clave, tuple(pareja), PARTICIPANTES_TTL)
+    return tuple(pareja)
+
+
+def registrar_latido(id_usuario):
+    """Marca al usuario como en línea durante PRESENCIA_TTL segundos"""
+    cache.set(_clave_presencia(id_usuario), int(timezone.now().timestamp()), PRESENCIA_TTL)
+
+
+def esta_en_linea(id_usuario):
+    """Indica si el usuario envió un latido recientemente"""
+    return cache.get(_clave_presencia(id_usuario)) is not None
+
+
+def estados_en_linea(ids_usuarios):
+    """
+    Estado en línea de varios usuarios en un solo viaje a la caché.
+
+    Returns:
+        dict: {id_usuario: bool}
+    """
+    claves = {_clave_presencia(id_usuario): id_usuario for id_usuario in ids_usuarios}
+    presentes = cache.get_many(list(claves))
+    return {id_usuario: clave in presentes for clave, id_usuario in claves.items()}
+
+
+def marcar_escribiendo(id_conversacion, id_usuario, escribiendo=True):
+    """Activa (con expiración corta) o limpia el estado escribiendo de un participante"""
+    clave = _clave_escribiendo(id_conversacion, id_usuario)
+    if escribiendo:
+        cache.set(clave, 1, ESCRIBIENDO_TTL)
+    else:
+        cache.delete(clave)
+
+
+def usuarios_escribiendo(id_conversacion, ids_participantes):
+    """
+    Participantes que están escribiendo en la conversación.
+
+    Returns:
+        set: ids de usuario
+    """
+    claves = {_clave_escribiendo(id_conversacion, id_usuario): id_usuario for id_usuario in ids_participantes}
+    return {claves[clave] for clave in cache.get_many(list(claves))}
@@ -13,6 +13,13 @@ urlpatterns = [
     # Ver chat por ID (usado desde dashboard)
     path('chat/<int:chat_id>/', views.ver_chat_por_id, name='ver_chat_por_id'),
     
+    # Buscar dentro de las conversaciones
+    path('buscar/', views.buscar_mensajes, name='buscar_mensajes'),
+    
+    # Presencia y estado escribiendo
+    path('chat/<int:chat_id>/escribiendo/', views.escribiendo, name='escribiendo'),
+    path('chat/<int:chat_id>/estado/', views.estado_chat, name='estado_chat'),
+    
     # Editar mensaje
     path('mensaje/editar/<int:mensaje_id>/', views.editar_mensaje, name='editar_mensaje'),
     
@@ -1,83 +1,377 @@
-from django.db.models import Q
-from .models import Chat, Mensaje
+from django.db.models import Q, F, Count, OuterRef, Subquery, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Conversacion, Mensaje, ConversacionLectura, BloqueMensajesArchivados, FTS_CONFIG
 
 
 def obtener_o_crear_chat(usuario_1, usuario_2):
     """
-    Obtiene un chat existente entre dos usuarios o lo crea si no existe.
-    
+    Obtiene una conversación existente entre dos usuarios o la crea si no existe.
+
     Args:
         usuario_1: Usuario actual
         usuario_2: Otro usuario
-    
+
     Returns:
-        Chat: Instancia del chat
+        Conversacion: Instancia de la conversación
     """
-    chat = Chat.objects.filter(
-        Q(usuario_1=usuario_1, usuario_2=usuario_2) |
-        Q(usuario_1=usuario_2, usuario_2=usuario_1)
+    conversacion = Conversacion.objects.filter(
+        Q(id_usuario_1=usuario_1, id_usuario_2=usuario_2) |
+        Q(id_usuario_1=usuario_2, id_usuario_2=usuario_1)
     ).first()
-    
-    if not chat:
-        chat = Chat.objects.create(
-            usuario_1=usuario_1,
-            usuario_2=usuario_2
+
+    if not conversacion:
+        # Asegurar que id_usuario_1 < id_usuario_2 (según constraint del SQL)
+        if usuario_1.id_usuario > usuario_2.id_usuario:
+            usuario_1, usuario_2 = usuario_2, usuario_1
+        conversacion = Conversacion.objects.create(
+            id_usuario_1=usuario_1,
+            id_usuario_2=usuario_2
         )
-    
-    return chat
+
+    return conversacion
+
+
+def _marca_lectura(usuario, conversacion_ref=None):
+    """Subconsulta con el último id leído por el usuario en la conversación"""
+    if conversacion_ref is None:
+        conversacion_ref = OuterRef('id_conversacion')
+    return Subquery(
+        ConversacionLectura.objects.filter(
+            id_conversacion=conversacion_ref,
+            id_usuario=usuario
+        ).values('ultimo_leido_id')[:1]
+    )
+
+
+def mensajes_no_leidos(usuario):
+    """
+    QuerySet de mensajes no leídos por el usuario en todas sus conversaciones.
+    Un mensaje no está leído si su id supera la marca de lectura del usuario.
+    """
+    return Mensaje.objects.filter(
+        Q(id_conversacion__id_usuario_1=usuario) | Q(id_conversacion__id_usuario_2=usuario),
+        eliminado=False
+    ).exclude(
+        id_remitente=usuario
+    ).annotate(
+        marca_lectura=Coalesce(_marca_lectura(usuario), 0)
+    ).filter(
+        id_mensaje__gt=F('marca_lectura')
+    )
 
 
 def contar_mensajes_no_leidos(usuario):
     """
     Cuenta todos los mensajes no leídos para un usuario.
-    
+
     Args:
         usuario: Usuario para contar mensajes
-    
+
     Returns:
         int: Cantidad de mensajes no leídos
     """
-    # Obtener todos los chats donde participa el usuario
-    chats = Chat.objects.filter(
-        Q(usuario_1=usuario) | Q(usuario_2=usuario)
+    return mensajes_no_leidos(usuario).count()
+
+
+def anotar_no_leidos(conversaciones, usuario):
+    """
+    Anota cada conversación con `no_leidos` en una sola consulta.
+
+    Args:
+        conversaciones: QuerySet de Conversacion
+        usuario: Usuario lector
+
+    Returns:
+        QuerySet: Conversaciones con el atributo no_leidos
+    """
+    return conversaciones.annotate(
+        marca_lectura=Coalesce(_marca_lectura(usuario, OuterRef('pk')), 0)
+    ).annotate(
+        no_leidos=Count(
+            'mensajes',
+            filter=Q(
+                mensajes__eliminado=False,
+                mensajes__id_mensaje__gt=F('marca_lectura')
+            ) & ~Q(mensajes__id_remitente=usuario)
+        )
     )
-    
-    # Contar mensajes no leídos que no fueron enviados por el usuario
-    return Mensaje.objects.filter(
-        id_chat__in=chats,
-        eliminado=False,
-        leido=False
-    ).exclude(remitente=usuario).count()
+
+
+def marcar_conversacion_leida(conversacion, usuario, hasta_id=None):
+    """
+    Avanza la marca de lectura del usuario en la conversación.
+    La marca nunca retrocede, por lo que es seguro llamarla en paralelo.
+
+    Args:
+        conversacion: Conversacion o su id
+        usuario: Usuario que está leyendo
+        hasta_id: Último id de mensaje leído (por defecto, el más reciente)
+    """
+    if hasta_id is None:
+        hasta_id = Mensaje.objects.filter(
+            id_conversacion=conversacion
+        ).aggregate(ultimo=Max('id_mensaje'))['ultimo']
+
+    if not hasta_id:
+        return
+
+    def avanzar():
+        return ConversacionLectura.objects.filter(
+            id_conversacion=conversacion,
+            id_usuario=usuario,
+            ultimo_leido_id__lt=hasta_id
+        ).update(ultimo_leido_id=hasta_id, fecha=timezone.now())
+
+    if not avanzar():
+        conversacion_id = getattr(conversacion, 'pk', conversacion)
+        _, creada = ConversacionLectura.objects.get_or_create(
+            id_conversacion_id=conversacion_id,
+            id_usuario=usuario,
+            defaults={'ultimo_leido_id': hasta_id}
+        )
+        if not creada:
+            # Otra petición creó la fila entre medio, quizá con una marca menor
+            avanzar()
 
 
 def marcar_mensajes_como_leidos(chat, usuario_actual):
     """
     Marca todos los mensajes de un chat como leídos para el usuario actual.
-    
+
     Args:
-        chat: Chat donde marcar mensajes
+        chat: Conversación donde marcar mensajes
         usuario_actual: Usuario que está leyendo
     """
-    Mensaje.objects.filter(
-        id_chat=chat,
-        eliminado=False,
+    marcar_conversacion_leida(chat, usuario_actual)
+
+
+def sincronizar_flags_leido(lectura, tamano_lote=1000):
+    """
+    Rellena los campos `leido`/`fecha_leido` de Mensaje a partir de una marca
+    de lectura. Se mantienen solo por compatibilidad y se actualizan por lotes.
+
+    Returns:
+        int: Cantidad de mensajes actualizados
+    """
+    pendientes = Mensaje.objects.filter(
+        id_conversacion_id=lectura.id_conversacion_id,
+        id_mensaje__lte=lectura.ultimo_leido_id,
         leido=False
-    ).exclude(remitente=usuario_actual).update(leido=True)
+    ).exclude(id_remitente_id=lectura.id_usuario_id)
+
+    total = 0
+    while True:
+        ids = list(pendientes.values_list('id_mensaje', flat=True)[:tamano_lote])
+        if not ids:
+            return total
+        total += Mensaje.objects.filter(id_mensaje__in=ids).update(
+            leido=True,
+            fecha_leido=lectura.fecha
+        )
 
 
 def obtener_chats_recientes(usuario, limite=10):
     """
-    Obtiene los chats más recientes de un usuario.
-    
+    Obtiene las conversaciones más recientes de un usuario.
+
     Args:
         usuario: Usuario para obtener chats
         limite: Cantidad máxima de chats a retornar
-    
+
     Returns:
-        QuerySet: Chats ordenados por último mensaje
+        QuerySet: Conversaciones ordenadas por último mensaje
     """
-    chats = Chat.objects.filter(
-        Q(usuario_1=usuario) | Q(usuario_2=usuario)
-    ).order_by('-fecha_creacion')[:limite]
-    
-    return chats
\ No newline at end of file
+    conversaciones = Conversacion.objects.filter(
+        Q(id_usuario_1=usuario) | Q(id_usuario_2=usuario)
+    ).order_by('-ultimo_mensaje_at')[:limite]
+
+    return conversaciones
+
+
+# ==================== PAGINACIÓN DE MENSAJES ====================
+MENSAJES_POR_PAGINA = 50
+
+
+def leer_mensajes_archivados(conversacion, antes=None, cantidad=MENSAJES_POR_PAGINA):
+    """
+    Lee mensajes del archivo comprimido, del más nuevo al más antiguo.
+    Descomprime un bloque a la vez, así la memoria queda acotada al tamaño de un bloque.
+
+    Args:
+        conversacion: Conversación a leer
+        antes: Solo mensajes con id menor a este
+        cantidad: Cantidad máxima de mensajes a devolver
+
+    Returns:
+        list: Mensajes no eliminados en orden descendente de id
+    """
+    bloques = BloqueMensajesArchivados.objects.filter(id_conversacion=conversacion)
+    if antes is not None:
+        bloques = bloques.filter(id_mensaje_desde__lt=antes)
+
+    resultado = []
+    for bloque in bloques.order_by('-id_mensaje_hasta').iterator(chunk_size=4):
+        for mensaje in reversed(bloque.leer()):
+            if mensaje.eliminado or (antes is not None and mensaje.id_mensaje >= antes):
+                continue
+            resultado.append(mensaje)
+            if len(resultado) >= cantidad:
+                return resultado
+    return resultado
+
+
+def _mensajes_anteriores(conversacion, base, cantidad, hasta=None, incluir_hasta=False):
+    """
+    Devuelve hasta `cantidad` mensajes anteriores a `hasta` en orden descendente,
+    completando desde el archivo cuando la tabla viva se queda sin mensajes.
+    """
+    vivos = base
+    if hasta is not None:
+        if incluir_hasta:
+            vivos = vivos.filter(id_mensaje__lte=hasta)
+        else:
+            vivos = vivos.filter(id_mensaje__lt=hasta)
+    mensajes = list(vivos.order_by('-id_mensaje')[:cantidad])
+
+    if len(mensajes) < cantidad:
+        if mensajes:
+            cursor = mensajes[-1].id_mensaje
+        elif hasta is not None:
+            cursor = hasta + 1 if incluir_hasta else hasta
+        else:
+            cursor = None
+        archivados = leer_mensajes_archivados(conversacion, antes=cursor, cantidad=cantidad - len(mensajes))
+        if archivados:
+            # Los mensajes archivados no tienen remitente cargado: resolverlo en una consulta
+            from apps.users.models import Usuario
+            ids = {m.id_remitente_id for m in archivados}
+            remitentes = Usuario.objects.in_bulk(ids)
+            for mensaje in archivados:
+                mensaje.id_remitente = remitentes.get(mensaje.id_remitente_id)
+            mensajes.extend(archivados)
+
+    return mensajes
+
+
+def obtener_pagina_mensajes(conversacion, antes=None, alrededor=None, limite=MENSAJES_POR_PAGINA):
+    """
+    Devuelve una página de mensajes (en orden cronológico) sin cargar todo el historial.
+    Al llegar al inicio de la tabla viva continúa leyendo del archivo.
+
+    Args:
+        conversacion: Conversación a paginar
+        antes: Cargar los mensajes anteriores a este id
+        alrededor: Cargar la página centrada en este id (salto desde la búsqueda)
+        limite: Cantidad máxima de mensajes por página
+
+    Returns:
+        dict: mensajes, hay_anteriores, hay_posteriores
+    """
+    base = Mensaje.objects.filter(
+        id_conversacion=conversacion,
+        eliminado=False
+    ).select_related('id_remitente')
+
+    hay_posteriores = False
+
+    if alrededor is not None:
+        mitad = limite // 2
+        anteriores = _mensajes_anteriores(conversacion, base, mitad + 1, hasta=alrededor, incluir_hasta=True)
+        posteriores = list(base.filter(id_mensaje__gt=alrededor).order_by('id_mensaje')[:limite - mitad + 1])
+        hay_posteriores = len(posteriores) > limite - mitad
+        posteriores = posteriores[:limite - mitad]
+    else:
+        hay_posteriores = antes is not None
+        mitad = limite
+        anteriores = _mensajes_anteriores(conversacion, base, limite + 1, hasta=antes)
+        posteriores = []
+
+    hay_anteriores = len(anteriores) > mitad
+    anteriores = anteriores[:mitad]
+    anteriores.reverse()
+
+    return {
+        'mensajes': anteriores + posteriores,
+        'hay_anteriores': hay_anteriores,
+        'hay_posteriores': hay_posteriores,
+    }
+
+
+# ==================== BÚSQUEDA DE MENSAJES ====================
+
+
+def _fragmento(contenido, termino, ancho=80):
+    """Recorta el contenido alrededor de la primera coincidencia"""
+    contenido = contenido or ''
+    posicion = contenido.lower().find(termino.split()[0].lower()) if termino.split() else -1
+    if posicion < 0 or len(contenido) <= ancho:
+        return contenido[:ancho]
+    inicio = max(0, posicion - ancho // 3)
+    fragmento = contenido[inicio:inicio + ancho]
+    if inicio > 0:
+        fragmento = '…' + fragmento
+    if inicio + ancho < len(contenido):
+        fragmento += '…'
+    return fragmento
+
+
+def buscar_mensajes(usuario, termino, limite=20):
+    """
+    Busca texto dentro de las conversaciones en las que participa el usuario.
+    En PostgreSQL usa el índice GIN de texto completo; en otros motores
+    hace un icontains por cada palabra.
+
+    Returns:
+        list: Diccionarios con la conversación, el fragmento y el id del mensaje
+    """
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchVector
+    from django.db import connection
+
+    mensajes = Mensaje.objects.filter(
+        Q(id_conversacion__id_usuario_1=usuario) | Q(id_conversacion__id_usuario_2=usuario),
+        eliminado=False
+    )
+
+    usar_fts = connection.vendor == 'postgresql'
+    if usar_fts:
+        # El SearchVector es el mismo del índice GIN de Mensaje.Meta.indexes
+        consulta = SearchQuery(termino, config=FTS_CONFIG, search_type='plain')
+        mensajes = mensajes.annotate(
+            documento=SearchVector('contenido', config=FTS_CONFIG)
+        ).filter(documento=consulta).annotate(
+            fragmento=SearchHeadline(
+                'contenido', consulta, config=FTS_CONFIG,
+                start_sel='', stop_sel='', max_words=20, min_words=8
+            )
+        )
+    else:
+        for palabra in termino.split():
+            mensajes = mensajes.filter(contenido__icontains=palabra)
+
+    campos = [
+        'id_mensaje', 'id_conversacion', 'fecha_envio', 'contenido',
+        'id_conversacion__id_usuario_1', 'id_conversacion__id_usuario_2',
+        'id_conversacion__id_usuario_1__nombres', 'id_conversacion__id_usuario_1__apellidos',
+        'id_conversacion__id_usuario_2__nombres', 'id_conversacion__id_usuario_2__apellidos',
+    ]
+    if usar_fts:
+        campos.append('fragmento')
+
+    resultados = []
+    for fila in mensajes.order_by('-id_mensaje').values(*campos)[:limite]:
+        otro = 2 if fila['id_conversacion__id_usuario_1'] == usuario.id_usuario else 1
+        resultados.append({
+            'id_mensaje': fila['id_mensaje'],
+            'id_conversacion': fila['id_conversacion'],
+            'fecha_envio': fila['fecha_envio'],
+            'otro_usuario': {
+                'id_usuario': fila[f'id_conversacion__id_usuario_{otro}'],
+                'nombre': f"{fila[f'id_conversacion__id_usuario_{otro}__nombres']} "
+                          f"{fila[f'id_conversacion__id_usuario_{otro}__apellidos']}".strip(),
+            },
+            'fragmento': fila['fragmento'] if usar_fts else _fragmento(fila['contenido'], termino),
+        })
+
+    return resultados
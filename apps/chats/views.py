@@ -1,21 +1,42 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Max
+from django.db.models import F, Q, OuterRef, Subquery
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_GET
 from django.utils import timezone
 from django.contrib import messages
 
 from .models import Conversacion, Mensaje
 from .forms import MensajeForm, EditarMensajeForm
+from .utils import (
+    anotar_no_leidos, marcar_conversacion_leida,
+    obtener_pagina_mensajes, buscar_mensajes as buscar_en_mensajes
+)
+from .presencia import (
+    registrar_latido, estados_en_linea, marcar_escribiendo, usuarios_escribiendo,
+    participantes, ESCRIBIENDO_TTL, ESTADO_INTERVALO
+)
+
 from apps.users.models import Usuario, Profile
+from apps.users.services import miniaturas
+from apps.users.services.directorio import buscar_directorio
+from apps.users.middleware import obtener_usuario, usuario_basico
+
+
+def _entero_o_none(valor):
+    """Convierte un parámetro GET a entero, o None si no es válido"""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
 
 
 @login_required
 def lista_chats(request):
     """Vista para mostrar la lista de chats del usuario"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -23,76 +44,67 @@ def lista_chats(request):
     # Obtener término de búsqueda
     search_query = request.GET.get('search', '').strip()
     
-    # Obtener todos los usuarios registrados excepto el usuario actual
-    todos_usuarios = Usuario.objects.exclude(id_usuario=usuario_actual.id_usuario)
+    # Conversaciones del usuario con sus no leídos y último mensaje, indexadas por el otro participante
+    ultimo = Mensaje.objects.filter(
+        id_conversacion=OuterRef('pk'), eliminado=False
+    ).order_by('-fecha_envio')
+    conversaciones = anotar_no_leidos(
+        Conversacion.objects.filter(
+            Q(id_usuario_1=usuario_actual) | Q(id_usuario_2=usuario_actual)
+        ),
+        usuario_actual
+    ).annotate(
+        ultimo_contenido=Subquery(ultimo.values('contenido')[:1]),
+        ultima_fecha=Subquery(ultimo.values('fecha_envio')[:1]),
+    )
+    conversaciones_por_usuario = {}
+    for conv in conversaciones:
+        otro_id = conv.id_usuario_2_id if conv.id_usuario_1_id == usuario_actual.id_usuario else conv.id_usuario_1_id
+        conversaciones_por_usuario[otro_id] = conv
     
-    # Filtrar por búsqueda si hay término de búsqueda
-    if search_query:
-        todos_usuarios = todos_usuarios.filter(
-            Q(nombres__icontains=search_query) |
-            Q(apellidos__icontains=search_query) |
-            Q(username__icontains=search_query)
-        )
+    # Página del directorio: primero quienes ya tienen conversación, la más reciente
+    # primero (ordenado en SQL para que la paginación respete ese orden)
+    ultima_conversacion = Conversacion.objects.filter(
+        Q(id_usuario_1=usuario_actual, id_usuario_2=OuterRef('id_usuario'))
+        | Q(id_usuario_2=usuario_actual, id_usuario_1=OuterRef('id_usuario'))
+    ).order_by(F('ultimo_mensaje_at').desc(nulls_last=True))
+    directorio = buscar_directorio(
+        search_query,
+        pagina=request.GET.get('pagina'),
+        excluir_id=usuario_actual.id_usuario,
+        prioridad_ids=list(conversaciones_por_usuario),
+        anotaciones={'ultimo_mensaje_at': Subquery(ultima_conversacion.values('ultimo_mensaje_at')[:1])},
+        orden=[F('ultimo_mensaje_at').desc(nulls_last=True)],
+    )
+    
+    # Estado en línea de todos los participantes en una sola consulta a la caché
+    registrar_latido(usuario_actual.id_usuario)
+    en_linea = estados_en_linea([fila['id_usuario'] for fila in directorio['resultados']])
     
     # Crear una lista de usuarios con información de chat
     usuarios_con_chat = []
     
-    for usuario in todos_usuarios:
-        # Buscar si existe una conversación con este usuario
-        conversacion_existente = Conversacion.objects.filter(
-            (Q(id_usuario_1=usuario_actual) & Q(id_usuario_2=usuario)) |
-            (Q(id_usuario_1=usuario) & Q(id_usuario_2=usuario_actual))
-        ).first()
-        
-        # Obtener el último mensaje si existe la conversación
-        ultimo_mensaje = None
-        fecha_ultimo_mensaje = None
-        mensajes_no_leidos = 0
-        
-        if conversacion_existente:
-            ultimo_mensaje_obj = conversacion_existente.mensajes.filter(
-                eliminado=False
-            ).order_by('-fecha_envio').first()
-            
-            if ultimo_mensaje_obj:
-                ultimo_mensaje = ultimo_mensaje_obj.contenido
-                fecha_ultimo_mensaje = ultimo_mensaje_obj.fecha_envio
-            
-            # Contar mensajes no leídos
-            mensajes_no_leidos = Mensaje.objects.filter(
-                id_conversacion=conversacion_existente,
-                eliminado=False,
-                leido=False
-            ).exclude(id_remitente=usuario_actual).count()
-        
-        # Obtener foto del perfil del usuario
-        try:
-            perfil_usuario = usuario.profile
-            foto_url = perfil_usuario.foto_url.url if perfil_usuario.foto_url else None
-        except Profile.DoesNotExist:
-            foto_url = None
+    for usuario in directorio['resultados']:
+        conversacion_existente = conversaciones_por_usuario.get(usuario['id_usuario'])
         
         usuarios_con_chat.append({
             'usuario': usuario,
             'conversacion': conversacion_existente,
-            'ultimo_mensaje': ultimo_mensaje,
-            'fecha_ultimo_mensaje': fecha_ultimo_mensaje,
-            'foto_url': foto_url,
-            'mensajes_no_leidos': mensajes_no_leidos,
-            'nombre_completo': f"{usuario.nombres} {usuario.apellidos}" if usuario.nombres and usuario.apellidos else usuario.username
+            'ultimo_mensaje': conversacion_existente.ultimo_contenido if conversacion_existente else None,
+            'fecha_ultimo_mensaje': conversacion_existente.ultima_fecha if conversacion_existente else None,
+            'foto_url': usuario['foto_url'],
+            'mensajes_no_leidos': conversacion_existente.no_leidos if conversacion_existente else 0,
+            'en_linea': en_linea.get(usuario['id_usuario'], False),
+            'nombre_completo': usuario['nombre_completo']
         })
     
-    # Ordenar: primero por fecha de último mensaje (más reciente primero), luego alfabéticamente
-    usuarios_con_chat.sort(key=lambda x: (
-        x['fecha_ultimo_mensaje'] is None,
-        -(x['fecha_ultimo_mensaje'].timestamp() if x['fecha_ultimo_mensaje'] else 0),
-        x['nombre_completo'].lower()
-    ))
-    
     return render(request, 'chats/lista_chats.html', {
         'usuarios_con_chat': usuarios_con_chat,
         'usuario_actual': usuario_actual,
-        'search_query': search_query
+        'search_query': search_query,
+        'pagina': directorio['pagina'],
+        'hay_anterior': directorio['hay_anterior'],
+        'hay_siguiente': directorio['hay_siguiente'],
     })
 
 
@@ -100,7 +112,7 @@ def lista_chats(request):
 def ver_chat(request, usuario_id):
     """Vista para ver o crear un chat con un usuario específico"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -132,16 +144,6 @@ def ver_chat(request, usuario_id):
                 id_usuario_2=usuario_actual
             )
 
-    # Marcar mensajes como leídos
-    Mensaje.objects.filter(
-        id_conversacion=conversacion,
-        eliminado=False,
-        leido=False
-    ).exclude(id_remitente=usuario_actual).update(
-        leido=True,
-        fecha_leido=timezone.now()
-    )
-
     # Procesar formulario si es POST
     if request.method == 'POST':
         form = MensajeForm(request.POST)
@@ -160,19 +162,27 @@ def ver_chat(request, usuario_id):
     else:
         form = MensajeForm()
     
-    # Obtener mensajes de la conversación (solo no eliminados)
-    mensajes = Mensaje.objects.filter(
-        id_conversacion=conversacion, 
-        eliminado=False
-    ).select_related('id_remitente').order_by('fecha_envio')
+    # Obtener solo la página de mensajes solicitada (solo no eliminados)
+    pagina = obtener_pagina_mensajes(
+        conversacion,
+        antes=_entero_o_none(request.GET.get('antes')),
+        alrededor=_entero_o_none(request.GET.get('mensaje'))
+    )
+    mensajes = pagina['mensajes']
+    
+    # Avanzar la marca de lectura hasta el último mensaje mostrado
+    if mensajes:
+        marcar_conversacion_leida(conversacion, usuario_actual, hasta_id=mensajes[-1].id_mensaje)
     
     # Obtener foto del otro usuario
     try:
         perfil_otro_usuario = otro_usuario.profile
-        foto_otro_usuario = perfil_otro_usuario.foto_url.url if perfil_otro_usuario.foto_url else None
+        foto_otro_usuario = miniaturas.url(perfil_otro_usuario.foto_url, 'chico')
     except Profile.DoesNotExist:
         foto_otro_usuario = None
     
+    registrar_latido(usuario_actual.id_usuario)
+    
     return render(request, 'chats/ver_chat.html', {
         'conversacion': conversacion,
         'mensajes': mensajes,
@@ -180,7 +190,13 @@ def ver_chat(request, usuario_id):
         'otro_usuario': otro_usuario,
         'foto_otro_usuario': foto_otro_usuario,
         'nombre_otro_usuario': f"{otro_usuario.nombres} {otro_usuario.apellidos}" if otro_usuario.nombres and otro_usuario.apellidos else otro_usuario.username,
-        'usuario_actual': usuario_actual
+        'usuario_actual': usuario_actual,
+        'hay_anteriores': pagina['hay_anteriores'],
+        'hay_posteriores': pagina['hay_posteriores'],
+        'mensaje_destacado': _entero_o_none(request.GET.get('mensaje')),
+        'otro_en_linea': estados_en_linea([otro_usuario.id_usuario])[otro_usuario.id_usuario],
+        'estado_intervalo': ESTADO_INTERVALO,
+        'escribiendo_ttl': ESCRIBIENDO_TTL,
     })
 
 
@@ -188,7 +204,7 @@ def ver_chat(request, usuario_id):
 def ver_chat_por_id(request, chat_id):
     """Vista para abrir un chat específico por ID (usado desde dashboard)"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -204,16 +220,6 @@ def ver_chat_por_id(request, chat_id):
     # Determinar el otro usuario usando el método del modelo
     otro_usuario = conversacion.obtener_otro_usuario(usuario_actual)
     
-    # Marcar como leídos todos los mensajes que no fueron enviados por el usuario actual
-    Mensaje.objects.filter(
-        id_conversacion=conversacion,
-        eliminado=False,
-        leido=False
-    ).exclude(id_remitente=usuario_actual).update(
-        leido=True,
-        fecha_leido=timezone.now()
-    )
-
     # Procesar formulario si es POST
     if request.method == 'POST':
         form = MensajeForm(request.POST)
@@ -232,19 +238,27 @@ def ver_chat_por_id(request, chat_id):
     else:
         form = MensajeForm()
     
-    # Obtener mensajes de la conversación ordenados por fecha (solo los no eliminados)
-    mensajes = Mensaje.objects.filter(
-        id_conversacion=conversacion, 
-        eliminado=False
-    ).select_related('id_remitente').order_by('fecha_envio')
+    # Obtener solo la página de mensajes solicitada (solo no eliminados)
+    pagina = obtener_pagina_mensajes(
+        conversacion,
+        antes=_entero_o_none(request.GET.get('antes')),
+        alrededor=_entero_o_none(request.GET.get('mensaje'))
+    )
+    mensajes = pagina['mensajes']
+    
+    # Avanzar la marca de lectura hasta el último mensaje mostrado
+    if mensajes:
+        marcar_conversacion_leida(conversacion, usuario_actual, hasta_id=mensajes[-1].id_mensaje)
     
     # Obtener foto del otro usuario
     try:
         perfil_otro_usuario = Profile.objects.get(id_usuario=otro_usuario)
-        foto_otro_usuario = perfil_otro_usuario.foto_url.url if perfil_otro_usuario.foto_url else None
+        foto_otro_usuario = miniaturas.url(perfil_otro_usuario.foto_url, 'chico')
     except Profile.DoesNotExist:
         foto_otro_usuario = None
     
+    registrar_latido(usuario_actual.id_usuario)
+    
     return render(request, 'chats/ver_chat.html', {
         'conversacion': conversacion,
         'mensajes': mensajes,
@@ -252,7 +266,13 @@ def ver_chat_por_id(request, chat_id):
         'otro_usuario': otro_usuario,
         'foto_otro_usuario': foto_otro_usuario,
         'nombre_otro_usuario': f"{otro_usuario.nombres} {otro_usuario.apellidos}" if otro_usuario.nombres and otro_usuario.apellidos else otro_usuario.username,
-        'usuario_actual': usuario_actual
+        'usuario_actual': usuario_actual,
+        'hay_anteriores': pagina['hay_anteriores'],
+        'hay_posteriores': pagina['hay_posteriores'],
+        'mensaje_destacado': _entero_o_none(request.GET.get('mensaje')),
+        'otro_en_linea': estados_en_linea([otro_usuario.id_usuario])[otro_usuario.id_usuario],
+        'estado_intervalo': ESTADO_INTERVALO,
+        'escribiendo_ttl': ESCRIBIENDO_TTL,
     })
 
 
@@ -261,7 +281,7 @@ def ver_chat_por_id(request, chat_id):
 def editar_mensaje(request, mensaje_id):
     """Vista para editar un mensaje existente"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -290,7 +310,7 @@ def editar_mensaje(request, mensaje_id):
 def eliminar_mensaje(request, mensaje_id):
     """Vista para eliminar (marcar como eliminado) un mensaje"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         return JsonResponse({'error': 'Usuario no encontrado'}, status=400)
     
@@ -301,4 +321,80 @@ def eliminar_mensaje(request, mensaje_id):
         mensaje.save(update_fields=['eliminado'])
         return JsonResponse({'success': True, 'message': 'Mensaje eliminado correctamente'})
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@require_GET
+def buscar_mensajes(request):
+    """Buscar texto dentro de las conversaciones del usuario"""
+    try:
+        usuario_actual = obtener_usuario(request)
+    except Usuario.DoesNotExist:
+        return JsonResponse({'error': 'Usuario no encontrado'}, status=400)
+    
+    termino = request.GET.get('q', '').strip()
+    if len(termino) < 2:
+        return JsonResponse({'resultados': []})
+    
+    resultados = buscar_en_mensajes(usuario_actual, termino)
+    for resultado in resultados:
+        # Cursor para abrir solo la página alrededor del mensaje encontrado
+        resultado['url'] = (
+            f"{reverse('chats:ver_chat_por_id', args=[resultado['id_conversacion']])}"
+            f"?mensaje={resultado['id_mensaje']}#mensaje-{resultado['id_mensaje']}"
+        )
+    
+    return JsonResponse({'resultados': resultados})
+
+
+# ==========================================
+# PRESENCIA Y ESCRIBIENDO
+# ==========================================
+
+# Estos endpoints se sondean cada pocos segundos: el usuario sale de la sesión
+# (usuario_basico) y los participantes de la caché, sin consultar la base
+
+def _participantes(chat_id, id_usuario):
+    """Ids de los participantes de la conversación, o None si el usuario no participa"""
+    pareja = participantes(chat_id)
+    if not pareja or id_usuario not in pareja:
+        return None
+    return pareja
+
+
+@login_required
+@require_POST
+def escribiendo(request, chat_id):
+    """Activar o limpiar el estado escribiendo del usuario en una conversación"""
+    id_usuario = usuario_basico(request).get('id_usuario')
+    if id_usuario is None:
+        return JsonResponse({'error': 'Usuario no encontrado'}, status=400)
+    
+    if not _participantes(chat_id, id_usuario):
+        return JsonResponse({'error': 'Conversación no encontrada'}, status=404)
+    
+    activo = request.POST.get('escribiendo', '1') != '0'
+    marcar_escribiendo(chat_id, id_usuario, activo)
+    return JsonResponse({'success': True})
+
+
+@login_required
+@require_GET
+def estado_chat(request, chat_id):
+    """Estado en línea y escribiendo del otro participante (también cuenta como latido)"""
+    id_usuario = usuario_basico(request).get('id_usuario')
+    if id_usuario is None:
+        return JsonResponse({'error': 'Usuario no encontrado'}, status=400)
+    
+    pareja = _participantes(chat_id, id_usuario)
+    if not pareja:
+        return JsonResponse({'error': 'Conversación no encontrada'}, status=404)
+    
+    otro_id = pareja[1] if pareja[0] == id_usuario else pareja[0]
+    registrar_latido(id_usuario)
+    
+    return JsonResponse({
+        'en_linea': estados_en_linea([otro_id])[otro_id],
+        'escribiendo': otro_id in usuarios_escribiendo(chat_id, [otro_id]),
+    })
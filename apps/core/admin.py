@@ -0,0 +1,31 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from apps.core import tareas
+from .models import Tarea
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'cola', 'estado', 'prioridad', 'intentos',
+                    'ejecutar_despues', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'cola', 'nombre']
+    search_fields = ['nombre']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_fin', 'resultado', 'error']
+    date_hierarchy = 'fecha_creacion'
+    actions = ['reintentar']
+    change_list_template = 'admin/core/tarea/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        """Agrega profundidad y latencia por cola sobre el listado"""
+        extra_context = extra_context or {}
+        extra_context['resumen_colas'] = tareas.resumen_colas()
+        return super().changelist_view(request, extra_context=extra_context)
+
+    @admin.action(description='Reintentar tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        total = queryset.exclude(estado='ejecutando').update(
+            estado='pendiente', intentos=0, error=None, fecha_fin=None,
+            ejecutar_despues=timezone.now()
+        )
+        self.message_user(request, f'{total} tarea(s) vuelven a la cola.')
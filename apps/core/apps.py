@@ -4,4 +4,17 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
-    verbose_name = 'Core'
\ No newline at end of file
+    verbose_name = 'Core'
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.models.signals import post_save, post_delete
+        from apps.core.utils import referencias
+
+        # Cualquier cambio en una tabla de referencia invalida su versión
+        for nombre, (etiqueta, _, _) in referencias.REFERENCIAS.items():
+            def invalidar(sender, nombre=nombre, **kwargs):
+                referencias.invalidar(nombre)
+            modelo = apps.get_model(etiqueta)
+            post_save.connect(invalidar, sender=modelo, weak=False, dispatch_uid=f'referencias-{nombre}-save')
+            post_delete.connect(invalidar, sender=modelo, weak=False, dispatch_uid=f'referencias-{nombre}-delete')
@@ -0,0 +1,92 @@
+"""
+Worker de la cola de tareas (modelo Tarea).
+
+Uso:
+    python manage.py run_worker
+    python manage.py run_worker --concurrency 4 --cola pdf --cola default
+    python manage.py run_worker --una-vez
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from apps.core import tareas
+
+
+def _ejecutar(tarea):
+    try:
+        return tareas.ejecutar(tarea)
+    finally:
+        # Cada hilo tiene su propia conexión: no dejarla abierta entre tareas
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano encoladas con @tarea'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Tareas ejecutadas a la vez (hilos)'
+        )
+        parser.add_argument(
+            '--cola',
+            action='append',
+            dest='colas',
+            help='Procesar solo estas colas (se puede repetir)'
+        )
+        parser.add_argument(
+            '--espera',
+            type=float,
+            default=1.0,
+            help='Segundos entre consultas a la cola cuando está vacía'
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Terminar cuando no queden tareas listas'
+        )
+
+    def handle(self, *args, **options):
+        concurrencia = max(1, options['concurrency'])
+        espera = options['espera']
+        autodiscover_modules('tareas')
+
+        colas = ', '.join(options['colas'] or ['todas'])
+        self.stdout.write(f'Worker iniciado: {concurrencia} hilo(s), colas: {colas}')
+
+        en_curso = set()
+        completadas = fallidas = 0
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            try:
+                while True:
+                    libres = concurrencia - len(en_curso)
+                    if libres:
+                        close_old_connections()
+                        for tarea in tareas.reclamar(libres, options['colas']):
+                            en_curso.add(pool.submit(_ejecutar, tarea))
+
+                    if not en_curso:
+                        if options['una_vez']:
+                            break
+                        time.sleep(espera)
+                        continue
+
+                    terminadas, en_curso = wait(en_curso, timeout=espera, return_when=FIRST_COMPLETED)
+                    for futuro in terminadas:
+                        if futuro.result():
+                            completadas += 1
+                        else:
+                            fallidas += 1
+            except KeyboardInterrupt:
+                self.stdout.write('Deteniendo worker, esperando tareas en curso...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{completadas} tarea(s) completadas, {fallidas} con error'
+        ))
@@ -1,3 +1,5 @@
 from .base import TimeStampedModel, SoftDeleteModel, BaseModel
+from .tareas import Tarea
+from .contadores import Contador
 
-__all__ = ['TimeStampedModel', 'SoftDeleteModel', 'BaseModel']
+__all__ = ['TimeStampedModel', 'SoftDeleteModel', 'BaseModel', 'Tarea', 'Contador']
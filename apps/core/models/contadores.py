@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class Contador(models.Model):
+    """Contador con nombre (ver apps.core.utils.secuencias) para bases sin secuencias"""
+    nombre = models.CharField(max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'contador'
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tarea(models.Model):
+    """Tarea en segundo plano (ver apps.core.tareas y `manage.py run_worker`)"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('ejecutando', 'Ejecutando'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    nombre = models.CharField(max_length=200)  # Nombre registrado con @tarea
+    cola = models.CharField(max_length=50, default='default')
+    argumentos = models.JSONField(default=dict, blank=True)  # {'args': [...], 'kwargs': {...}}
+    prioridad = models.SmallIntegerField(default=0)  # Mayor se ejecuta antes
+
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    ejecutar_despues = models.DateTimeField(default=timezone.now)
+
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'tarea'
+        indexes = [
+            models.Index(fields=['estado', 'cola', 'ejecutar_despues']),
+            models.Index(fields=['estado', 'fecha_fin']),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.id} ({self.estado})"
+
+    @property
+    def espera(self):
+        """Tiempo entre la creación y el inicio de la ejecución"""
+        if self.fecha_inicio:
+            return self.fecha_inicio - self.fecha_creacion
+        return None
@@ -0,0 +1,183 @@
+"""
+Cola de tareas en segundo plano guardada en la base de datos (modelo Tarea).
+
+Definir una tarea en el módulo `tareas.py` de cualquier app:
+
+    from apps.core.tareas import tarea
+
+    @tarea(cola='pdf', max_intentos=5)
+    def generar_pdf(usuario_id):
+        ...
+
+y encolarla con `generar_pdf.encolar(usuario_id)`. Los workers
+(`python manage.py run_worker --concurrency 4`) la ejecutan; si falla se
+reintenta con espera exponencial hasta `max_intentos`.
+"""
+
+import json
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from apps.core.models import Tarea
+from apps.core.utils import colas
+
+logger = logging.getLogger(__name__)
+
+_registro = {}
+
+
+# ==================== REGISTRO ====================
+
+class FuncionTarea:
+    """Función registrada como tarea; llamarla directamente la ejecuta en línea"""
+
+    def __init__(self, funcion, nombre, cola, max_intentos):
+        self.funcion = funcion
+        self.nombre = nombre
+        self.cola = cola
+        self.max_intentos = max_intentos
+        self.__doc__ = funcion.__doc__
+        self.__wrapped__ = funcion
+
+    def __call__(self, *args, **kwargs):
+        return self.funcion(*args, **kwargs)
+
+    def encolar(self, *args, **kwargs):
+        return self.programar(args=args, kwargs=kwargs)
+
+    def programar(self, args=(), kwargs=None, retraso=None, prioridad=0):
+        """Encola con opciones: retraso (segundos o timedelta) y prioridad"""
+        if isinstance(retraso, (int, float)):
+            retraso = timedelta(seconds=retraso)
+        return Tarea.objects.create(
+            nombre=self.nombre,
+            cola=self.cola,
+            argumentos={'args': list(args), 'kwargs': kwargs or {}},
+            prioridad=prioridad,
+            max_intentos=self.max_intentos,
+            ejecutar_despues=timezone.now() + (retraso or timedelta()),
+        )
+
+
+def tarea(funcion=None, *, nombre=None, cola='default', max_intentos=3):
+    """Decorador que registra una función como tarea en segundo plano"""
+    def registrar(funcion):
+        clave = nombre or f'{funcion.__module__}.{funcion.__qualname__}'
+        registrada = FuncionTarea(funcion, clave, cola, max_intentos)
+        _registro[clave] = registrada
+        return registrada
+
+    if funcion is not None:
+        return registrar(funcion)
+    return registrar
+
+
+def registrada(nombre):
+    if nombre not in _registro:
+        autodiscover_modules('tareas')
+    return _registro.get(nombre)
+
+
+# ==================== EJECUCIÓN ====================
+
+def reclamar(limite, colas_=None):
+    """Marca como 'ejecutando' hasta `limite` tareas listas y las devuelve"""
+    ahora = timezone.now()
+    vencido = ahora - timedelta(seconds=settings.TAREAS_TIEMPO_MAX)
+    # Las 'ejecutando' vencidas son de un worker que murió; si ya agotaron
+    # sus intentos (p.ej. la tarea misma mata al worker) no se reintentan
+    Tarea.objects.filter(
+        estado='ejecutando', fecha_inicio__lt=vencido, intentos__gte=F('max_intentos')
+    ).update(estado='fallida', error='El worker se detuvo ejecutando la tarea', fecha_fin=ahora)
+    disponibles = Tarea.objects.filter(
+        Q(estado='pendiente', ejecutar_despues__lte=ahora)
+        | Q(estado='ejecutando', fecha_inicio__lt=vencido, intentos__lt=F('max_intentos'))
+    )
+    if colas_:
+        disponibles = disponibles.filter(cola__in=colas_)
+    disponibles = disponibles.order_by('-prioridad', 'ejecutar_despues', 'id')
+
+    ids = colas.reclamar(
+        disponibles, limite,
+        {'estado': 'ejecutando', 'fecha_inicio': ahora, 'intentos': F('intentos') + 1},
+    )
+    return list(Tarea.objects.filter(id__in=ids).order_by('-prioridad', 'ejecutar_despues', 'id'))
+
+
+def _serializable(valor):
+    try:
+        json.dumps(valor)
+        return valor
+    except (TypeError, ValueError):
+        return repr(valor)
+
+
+def espera_reintento(intento):
+    """Espera exponencial con algo de azar: base, 2·base, 4·base, ..."""
+    base = settings.TAREAS_REINTENTO_BASE
+    return timedelta(seconds=base * 2 ** (intento - 1) * random.uniform(1, 1.5))
+
+
+def ejecutar(tarea_):
+    """Ejecuta una tarea reclamada y guarda su resultado o programa el reintento"""
+    funcion = registrada(tarea_.nombre)
+    try:
+        if funcion is None:
+            raise LookupError(f'Tarea no registrada: {tarea_.nombre}')
+        resultado = funcion(*tarea_.argumentos.get('args', []), **tarea_.argumentos.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        agotada = funcion is None or tarea_.intentos >= tarea_.max_intentos
+        logger.warning('Tarea %s #%s falló (intento %s)', tarea_.nombre, tarea_.id, tarea_.intentos)
+        Tarea.objects.filter(id=tarea_.id).update(
+            estado='fallida' if agotada else 'pendiente',
+            error=error,
+            fecha_fin=timezone.now() if agotada else None,
+            ejecutar_despues=timezone.now() + espera_reintento(tarea_.intentos),
+        )
+        return False
+
+    Tarea.objects.filter(id=tarea_.id).update(
+        estado='completada', resultado=_serializable(resultado), error=None, fecha_fin=timezone.now()
+    )
+    return True
+
+
+# ==================== MONITOREO ====================
+
+def resumen_colas(desde=None):
+    """Profundidad y latencia por cola (para el admin)"""
+    ahora = timezone.now()
+    desde = desde or ahora - timedelta(hours=1)
+    filas = Tarea.objects.values('cola').annotate(
+        pendientes=Count('id', filter=Q(estado='pendiente', ejecutar_despues__lte=ahora)),
+        programadas=Count('id', filter=Q(estado='pendiente', ejecutar_despues__gt=ahora)),
+        ejecutando=Count('id', filter=Q(estado='ejecutando')),
+        fallidas=Count('id', filter=Q(estado='fallida', fecha_fin__gte=desde)),
+        completadas=Count('id', filter=Q(estado='completada', fecha_fin__gte=desde)),
+        mas_antigua=Min('ejecutar_despues', filter=Q(estado='pendiente', ejecutar_despues__lte=ahora)),
+        espera_media=Avg(
+            F('fecha_inicio') - F('fecha_creacion'),
+            filter=Q(estado='completada', fecha_fin__gte=desde),
+        ),
+    ).order_by('cola')
+
+    resumen = []
+    for fila in filas:
+        fila['antiguedad'] = ahora - fila['mas_antigua'] if fila['mas_antigua'] else None
+        resumen.append(fila)
+    return resumen
+
+
+def purgar(dias=7):
+    """Elimina tareas terminadas hace más de `dias` días"""
+    limite = timezone.now() - timedelta(days=dias)
+    borradas, _ = Tarea.objects.filter(estado__in=['completada', 'fallida'], fecha_fin__lt=limite).delete()
+    return borradas
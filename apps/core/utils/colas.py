@@ -0,0 +1,53 @@
+"""
+Utilidades para colas guardadas en la base de datos.
+"""
+
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F
+
+
+def reclamar(disponibles, limite, marcar, cas=('estado', 'fecha_inicio')):
+    """
+    Marca con `marcar` hasta `limite` filas de `disponibles` y devuelve sus ids.
+
+    Con SELECT ... FOR UPDATE SKIP LOCKED cada worker se salta las filas que
+    otro está reclamando. Sin soporte (SQLite) se hace compare-and-swap: la
+    actualización solo gana si los campos `cas` siguen como se leyeron.
+    """
+    if limite <= 0:
+        return []
+    modelo = disponibles.model
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                disponibles.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limite]
+            )
+            modelo.objects.filter(pk__in=ids).update(**marcar)
+        return ids
+
+    ids = []
+    for pk, *valores in disponibles.values_list('pk', *cas)[:limite * 2]:
+        if modelo.objects.filter(pk=pk, **dict(zip(cas, valores))).update(**marcar):
+            ids.append(pk)
+            if len(ids) == limite:
+                break
+    return ids
+
+
+@contextmanager
+def exclusivo(nombre):
+    """
+    Transacción que solo un proceso a la vez puede tener abierta para `nombre`.
+
+    Actualiza (sin cambiarla) la fila `nombre` de Contador: en PostgreSQL eso
+    la bloquea hasta el commit y en SQLite toma el bloqueo de escritura.
+    """
+    from apps.core.models import Contador
+
+    Contador.objects.get_or_create(nombre=nombre)
+    with transaction.atomic():
+        Contador.objects.filter(nombre=nombre).update(valor=F('valor'))
+        yield
@@ -16,3 +16,13 @@ class InvalidRUCException(LlamkayException):
 class APIConnectionException(LlamkayException):
     """Error de API"""
     pass
+
+
+class DocumentNotFoundException(LlamkayException):
+    """Documento no encontrado en RENIEC / SUNAT"""
+    pass
+
+
+class ServiceUnavailableException(APIConnectionException):
+    """Servicio externo suspendido temporalmente (circuito abierto)"""
+    pass
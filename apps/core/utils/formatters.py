@@ -28,3 +28,15 @@ def formatear_telefono(telefono):
     if len(tel) != 9:
         return telefono
     return f"{tel[:3]} {tel[3:6]} {tel[6:]}"
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con espacios simples: 'José  Ñahui' -> 'jose nahui'"""
+    if not texto:
+        return ''
+    import unicodedata
+    sin_tildes = ''.join(
+        c for c in unicodedata.normalize('NFKD', str(texto))
+        if not unicodedata.combining(c)
+    )
+    return ' '.join(sin_tildes.lower().split())
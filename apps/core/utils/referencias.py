@@ -0,0 +1,244 @@
+"""
+Caché de tablas de referencia (ubigeo, categorías, habilidades).
+
+Lectura en dos niveles: un LRU en memoria del proceso sobre la caché
+compartida. Cada tabla tiene en la caché compartida un token de versión
+aleatorio que las señales post_save/post_delete reemplazan (ver
+CoreConfig.ready); al cambiar la versión, cada proceso vuelve a leer la tabla
+una sola vez. No es un contador: si la caché se vacía, la versión nueva no
+coincide con la que un proceso aún tenga en su LRU.
+
+Departamentos, provincias y distritos no se cachean aquí: salen del árbol de
+apps.users.services.ubigeo, que ya tiene su propia versión e invalidación.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from types import MappingProxyType
+
+from django import forms
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.choices import BaseChoiceIterator
+
+# nombre: (modelo, campos, orden)
+REFERENCIAS = {
+    'categorias': (
+        'users.CategoriaTrabajo',
+        ('id_categoria', 'nombre', 'slug', 'id_padre', 'icono', 'activa'),
+        ('orden', 'nombre'),
+    ),
+    'habilidades': ('users.Habilidad', ('id_habilidad', 'nombre', 'categoria', 'activa'), ('nombre',)),
+}
+# nombre: modelo (ver apps.users.services.ubigeo.NIVELES)
+UBIGEO = {
+    'departamentos': 'users.Departamento',
+    'provincias': 'users.Provincia',
+    'distritos': 'users.Distrito',
+}
+
+CACHE_TTL = 60 * 60 * 24
+LRU_MAX = 32
+# Segundos durante los que un proceso confía en la versión ya leída
+VERIFICAR_CADA = 2
+
+_lru = OrderedDict()
+# get + move_to_end y popitem no son atómicos entre hilos
+_lru_lock = threading.Lock()
+_versiones = {'leidas': {}, 'momento': 0.0}
+
+
+def _clave_version(nombre):
+    return f'referencias:version:{nombre}'
+
+
+def modelo_de(nombre):
+    return apps.get_model(UBIGEO[nombre] if nombre in UBIGEO else REFERENCIAS[nombre][0])
+
+
+def campo_pk(nombre):
+    return modelo_de(nombre)._meta.pk.attname
+
+
+def _ubigeo():
+    from apps.users.services import ubigeo
+    return ubigeo
+
+
+def _nueva_version():
+    return uuid.uuid4().hex[:16]
+
+
+def invalidar(nombre):
+    """Nueva versión de la tabla para todos los procesos"""
+    cache.set(_clave_version(nombre), _nueva_version(), None)
+    _versiones['momento'] = 0.0
+
+
+def _version(nombre):
+    ahora = time.monotonic()
+    if ahora - _versiones['momento'] > VERIFICAR_CADA:
+        claves = {_clave_version(n): n for n in REFERENCIAS}
+        leidas = cache.get_many(list(claves))
+        for clave in claves.keys() - leidas.keys():
+            # Primera vez o caché vaciada: si otro proceso la creó primero, se usa la suya
+            nueva = _nueva_version()
+            leidas[clave] = nueva if cache.add(clave, nueva, None) else (cache.get(clave) or nueva)
+        _versiones['leidas'] = {n: leidas[clave] for clave, n in claves.items()}
+        _versiones['momento'] = ahora
+    return _versiones['leidas'][nombre]
+
+
+def _entrada(nombre):
+    version = _version(nombre)
+    clave = (nombre, version)
+    with _lru_lock:
+        entrada = _lru.get(clave)
+        if entrada is not None:
+            _lru.move_to_end(clave)
+            return entrada
+
+    etiqueta, campos, orden = REFERENCIAS[nombre]
+    clave_compartida = f'referencias:{nombre}:{version}'
+    filas = cache.get(clave_compartida)
+    if filas is None:
+        modelo = apps.get_model(etiqueta)
+        # Las FK se leen como <campo>_id para no hacer JOIN
+        columnas = [
+            f'{campo}_id' if modelo._meta.get_field(campo).is_relation else campo
+            for campo in campos
+        ]
+        filas = [dict(zip(campos, valores)) for valores in modelo.objects.order_by(*orden).values_list(*columnas)]
+        cache.set(clave_compartida, filas, CACHE_TTL)
+
+    filas = tuple(MappingProxyType(fila) for fila in filas)
+    campo_id = campos[0]
+    entrada = {
+        'filas': filas,
+        'por_id': MappingProxyType({fila[campo_id]: fila for fila in filas}),
+        'hijos': {},
+    }
+    with _lru_lock:
+        _lru[clave] = entrada
+        while len(_lru) > LRU_MAX:
+            _lru.popitem(last=False)
+    return entrada
+
+
+def obtener(nombre):
+    """Todas las filas de la tabla (tupla de mapeos de solo lectura)"""
+    if nombre in UBIGEO:
+        return _ubigeo().tablas()[nombre]['filas']
+    return _entrada(nombre)['filas']
+
+
+def por_id(nombre, id_):
+    if nombre in UBIGEO:
+        return _ubigeo().tablas()[nombre]['por_id'].get(id_)
+    return _entrada(nombre)['por_id'].get(id_)
+
+
+def nombre_de(nombre, id_):
+    fila = por_id(nombre, id_)
+    return fila['nombre'] if fila else None
+
+
+def hijos(nombre, campo_padre, id_padre):
+    """Filas cuyo campo_padre es id_padre (p.ej. provincias de un departamento)"""
+    if nombre in UBIGEO:
+        return _ubigeo().hijos_de(nombre, id_padre)
+    indices = _entrada(nombre)['hijos']
+    indice = indices.get(campo_padre)
+    if indice is None:
+        indice = {}
+        for fila in _entrada(nombre)['filas']:
+            indice.setdefault(fila[campo_padre], []).append(fila)
+        indice = indices[campo_padre] = {k: tuple(v) for k, v in indice.items()}
+    return indice.get(id_padre, ())
+
+
+# ==================== CAMPOS DE FORMULARIO ====================
+
+class _OpcionesReferencia(BaseChoiceIterator):
+    def __init__(self, field):
+        self.field = field
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for fila in self.field.filas():
+            yield (fila[self.field.campo_id], fila['nombre'])
+
+    def __len__(self):
+        return len(self.field.filas()) + (self.field.empty_label is not None)
+
+
+class ReferenciaChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField que arma las opciones y valida desde la caché de
+    referencias. Devuelve una instancia sin consultar la base de datos
+    (basta con la clave primaria para asignar la FK).
+    """
+
+    def __init__(self, referencia, *args, **kwargs):
+        self.referencia = referencia
+        self.campo_id = campo_pk(referencia)
+        self.padre = None
+        kwargs.setdefault('queryset', modelo_de(referencia).objects.none())
+        super().__init__(*args, **kwargs)
+
+    def filtrar(self, **padre):
+        """Limita las opciones a los hijos de un padre: filtrar(id_departamento=15)"""
+        self.padre = next(iter(padre.items())) if padre else None
+        self.widget.choices = self.choices
+
+    def filas(self):
+        if self.padre is None:
+            return obtener(self.referencia)
+        return hijos(self.referencia, *self.padre)
+
+    def _get_choices(self):
+        return _OpcionesReferencia(self)
+
+    choices = property(_get_choices, forms.ChoiceField.choices.fset)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, modelo_de(self.referencia)):
+            value = value.pk
+        try:
+            fila = por_id(self.referencia, int(value))
+        except (TypeError, ValueError):
+            fila = None
+        if fila is None or (self.padre and fila[self.padre[0]] != self.padre[1]):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+        modelo = modelo_de(self.referencia)
+        return modelo(**{
+            (f'{campo}_id' if modelo._meta.get_field(campo).is_relation else campo): valor
+            for campo, valor in fila.items()
+        })
+
+
+def usar_referencias(form, campos):
+    """
+    Reemplaza campos FK autogenerados de un ModelForm por ReferenciaChoiceField,
+    conservando etiqueta, obligatoriedad y atributos del widget.
+
+    campos: {'id_departamento': 'departamentos', ...}
+    """
+    for nombre_campo, referencia in campos.items():
+        original = form.fields.get(nombre_campo)
+        if original is None:
+            continue
+        form.fields[nombre_campo] = ReferenciaChoiceField(
+            referencia,
+            required=original.required,
+            label=original.label,
+            help_text=original.help_text,
+            widget=forms.Select(attrs=original.widget.attrs),
+        )
@@ -0,0 +1,56 @@
+"""
+Números consecutivos sin contar filas.
+
+En PostgreSQL se usa una SEQUENCE (nextval no bloquea ni se repite entre
+transacciones). En las demás bases, una fila de Contador que se incrementa
+con UPDATE dentro de una transacción: el UPDATE bloquea la fila (o la base,
+en SQLite) hasta leer el nuevo valor.
+"""
+
+from django.db import IntegrityError, ProgrammingError, connection, transaction
+from django.db.models import F
+
+from apps.core.models import Contador
+
+
+def siguiente(nombre, inicial=1):
+    """
+    Siguiente valor del contador `nombre`.
+
+    `inicial` (número o función) es el primer valor, y solo se evalúa la
+    primera vez que se usa el contador.
+    """
+    if connection.vendor == 'postgresql':
+        return _siguiente_secuencia(nombre, inicial)
+    return _siguiente_fila(nombre, inicial)
+
+
+def _inicial(inicial):
+    return int(inicial() if callable(inicial) else inicial)
+
+
+def _siguiente_secuencia(nombre, inicial):
+    secuencia = connection.ops.quote_name(f'secuencia_{nombre}')
+    with connection.cursor() as cursor:
+        try:
+            with transaction.atomic():
+                cursor.execute(f"SELECT nextval('{secuencia}')")
+                return cursor.fetchone()[0]
+        except ProgrammingError:
+            # La secuencia todavía no existe
+            pass
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {secuencia} START WITH {_inicial(inicial)}")
+        cursor.execute(f"SELECT nextval('{secuencia}')")
+        return cursor.fetchone()[0]
+
+
+def _siguiente_fila(nombre, inicial):
+    with transaction.atomic():
+        if not Contador.objects.filter(nombre=nombre).update(valor=F('valor') + 1):
+            try:
+                with transaction.atomic():
+                    Contador.objects.create(nombre=nombre, valor=_inicial(inicial))
+            except IntegrityError:
+                # Otro proceso lo creó primero
+                Contador.objects.filter(nombre=nombre).update(valor=F('valor') + 1)
+        return Contador.objects.filter(nombre=nombre).values_list('valor', flat=True).get()
@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class JobsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.jobs'
-    verbose_name = 'Gestión de Trabajos'
\ No newline at end of file
+    verbose_name = 'Gestión de Trabajos'
+
+    def ready(self):
+        import apps.jobs.signals  # noqa: F401
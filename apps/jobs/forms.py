@@ -2,6 +2,14 @@ from django import forms
 from django.core.exceptions import ValidationError
 import re
 from .models import OfertaUsuario, OfertaEmpresa
+from apps.core.utils.referencias import usar_referencias
+
+CAMPOS_REFERENCIA = {
+    'id_categoria': 'categorias',
+    'id_departamento': 'departamentos',
+    'id_provincia': 'provincias',
+    'id_distrito': 'distritos',
+}
 
 
 class OfertaUsuarioForm(forms.ModelForm):
@@ -72,29 +80,26 @@ class OfertaUsuarioForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Importar aquí para evitar circular imports
-        from apps.users.models import Provincia, Distrito, Comunidad
+        from apps.users.models import Comunidad
 
-        # Inicializar querysets vacíos para ubicación
-        self.fields['id_provincia'].queryset = Provincia.objects.none()
-        self.fields['id_distrito'].queryset = Distrito.objects.none()
+        # Ubicación y categoría se resuelven desde la caché de referencias
+        usar_referencias(self, CAMPOS_REFERENCIA)
         self.fields['id_comunidad'].queryset = Comunidad.objects.none()
+        self.fields['id_provincia'].filtrar(id_departamento=None)
+        self.fields['id_distrito'].filtrar(id_provincia=None)
 
         # Si hay datos en POST, cargar las opciones correspondientes
         if 'id_departamento' in self.data:
             try:
                 departamento_id = int(self.data.get('id_departamento'))
-                self.fields['id_provincia'].queryset = Provincia.objects.filter(
-                    id_departamento=departamento_id
-                )
+                self.fields['id_provincia'].filtrar(id_departamento=departamento_id)
             except (ValueError, TypeError):
                 pass
 
         if 'id_provincia' in self.data:
             try:
                 provincia_id = int(self.data.get('id_provincia'))
-                self.fields['id_distrito'].queryset = Distrito.objects.filter(
-                    id_provincia=provincia_id
-                )
+                self.fields['id_distrito'].filtrar(id_provincia=provincia_id)
             except (ValueError, TypeError):
                 pass
 
@@ -109,17 +114,13 @@ class OfertaUsuarioForm(forms.ModelForm):
         
         # Si estamos editando, cargar las opciones basadas en la instancia
         elif self.instance.pk:
-            if self.instance.id_departamento:
-                self.fields['id_provincia'].queryset = Provincia.objects.filter(
-                    id_departamento=self.instance.id_departamento
-                )
-            if self.instance.id_provincia:
-                self.fields['id_distrito'].queryset = Distrito.objects.filter(
-                    id_provincia=self.instance.id_provincia
-                )
-            if self.instance.id_distrito:
+            if self.instance.id_departamento_id:
+                self.fields['id_provincia'].filtrar(id_departamento=self.instance.id_departamento_id)
+            if self.instance.id_provincia_id:
+                self.fields['id_distrito'].filtrar(id_provincia=self.instance.id_provincia_id)
+            if self.instance.id_distrito_id:
                 self.fields['id_comunidad'].queryset = Comunidad.objects.filter(
-                    id_distrito=self.instance.id_distrito
+                    id_distrito=self.instance.id_distrito_id
                 )
 
 
@@ -202,29 +203,26 @@ class OfertaEmpresaForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Importar aquí para evitar circular imports
-        from apps.users.models import Provincia, Distrito, Comunidad
+        from apps.users.models import Comunidad
 
-        # Inicializar querysets vacíos
-        self.fields['id_provincia'].queryset = Provincia.objects.none()
-        self.fields['id_distrito'].queryset = Distrito.objects.none()
+        # Ubicación y categoría se resuelven desde la caché de referencias
+        usar_referencias(self, CAMPOS_REFERENCIA)
         self.fields['id_comunidad'].queryset = Comunidad.objects.none()
+        self.fields['id_provincia'].filtrar(id_departamento=None)
+        self.fields['id_distrito'].filtrar(id_provincia=None)
 
         # Cargar opciones según datos POST
         if 'id_departamento' in self.data:
             try:
                 departamento_id = int(self.data.get('id_departamento'))
-                self.fields['id_provincia'].queryset = Provincia.objects.filter(
-                    id_departamento=departamento_id
-                )
+                self.fields['id_provincia'].filtrar(id_departamento=departamento_id)
             except (ValueError, TypeError):
                 pass
 
         if 'id_provincia' in self.data:
             try:
                 provincia_id = int(self.data.get('id_provincia'))
-                self.fields['id_distrito'].queryset = Distrito.objects.filter(
-                    id_provincia=provincia_id
-                )
+                self.fields['id_distrito'].filtrar(id_provincia=provincia_id)
             except (ValueError, TypeError):
                 pass
 
@@ -239,15 +237,11 @@ class OfertaEmpresaForm(forms.ModelForm):
         
         # Si estamos editando, cargar las opciones basadas en la instancia
         elif self.instance.pk:
-            if self.instance.id_departamento:
-                self.fields['id_provincia'].queryset = Provincia.objects.filter(
-                    id_departamento=self.instance.id_departamento
-                )
-            if self.instance.id_provincia:
-                self.fields['id_distrito'].queryset = Distrito.objects.filter(
-                    id_provincia=self.instance.id_provincia
-                )
-            if self.instance.id_distrito:
+            if self.instance.id_departamento_id:
+                self.fields['id_provincia'].filtrar(id_departamento=self.instance.id_departamento_id)
+            if self.instance.id_provincia_id:
+                self.fields['id_distrito'].filtrar(id_provincia=self.instance.id_provincia_id)
+            if self.instance.id_distrito_id:
                 self.fields['id_comunidad'].queryset = Comunidad.objects.filter(
-                    id_distrito=self.instance.id_distrito
-                )
\ No newline at end of file
+                    id_distrito=self.instance.id_distrito_id
+                )
@@ -0,0 +1,48 @@
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.jobs.models import Contrato, OfertaUsuario, OfertaEmpresa
+from apps.users.models import Usuario
+from apps.users.services.ranking import refrescar_score
+
+
+def _ajustar_trabajos_completados(id_trabajador, delta):
+    Usuario.objects.filter(id_usuario=id_trabajador).update(
+        trabajos_completados=F('trabajos_completados') + delta
+    )
+    refrescar_score([id_trabajador])
+
+
+@receiver(pre_save, sender=Contrato)
+def recordar_estado_contrato(sender, instance, **kwargs):
+    """Guarda el estado previo para detectar la transición a 'completado'"""
+    instance._estado_anterior = None
+    if instance.pk:
+        instance._estado_anterior = Contrato.objects.filter(pk=instance.pk).values_list(
+            'estado', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Contrato)
+def contar_trabajo_completado(sender, instance, **kwargs):
+    """Mantiene Usuario.trabajos_completados (y su puntaje) al completar o reabrir un contrato"""
+    antes = getattr(instance, '_estado_anterior', None) == 'completado'
+    ahora = instance.estado == 'completado'
+    if antes != ahora:
+        _ajustar_trabajos_completados(instance.id_trabajador_id, 1 if ahora else -1)
+
+
+@receiver(post_delete, sender=Contrato)
+def descontar_trabajo_completado(sender, instance, **kwargs):
+    if instance.estado == 'completado':
+        _ajustar_trabajos_completados(instance.id_trabajador_id, -1)
+
+
+@receiver(post_save, sender=OfertaUsuario)
+@receiver(post_save, sender=OfertaEmpresa)
+def miniaturas_foto_oferta(sender, instance, **kwargs):
+    """Genera en segundo plano las miniaturas de la foto de la oferta"""
+    if instance.foto:
+        from apps.users.services.miniaturas import solicitar
+        solicitar(instance.foto)
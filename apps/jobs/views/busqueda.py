@@ -3,7 +3,9 @@ from django.db.models import Q
 from django.http import JsonResponse
 
 from apps.jobs.models import OfertaUsuario, OfertaEmpresa, GuardarTrabajo
-from apps.users.models import Departamento, Provincia, Distrito, Comunidad, Usuario
+from apps.users.models import Provincia, Distrito, Comunidad
+from apps.core.utils import referencias
+from apps.users.middleware import obtener_usuario
 
 
 def buscar_trabajos(request):
@@ -134,7 +136,7 @@ def buscar_trabajos(request):
     trabajos_guardados_ids = set()
     if request.user.is_authenticated:
         try:
-            usuario = Usuario.objects.get(user=request.user)
+            usuario = obtener_usuario(request)
             guardados = GuardarTrabajo.objects.filter(id_usuario=usuario)
             
             for g in guardados:
@@ -146,7 +148,7 @@ def buscar_trabajos(request):
             pass
     
     # Datos para filtros
-    departamentos = Departamento.objects.all().order_by('nombre')
+    departamentos = referencias.obtener('departamentos')
     
     context = {
         'trabajos': trabajos,
@@ -197,7 +199,7 @@ def detalle_trabajo(request, tipo, trabajo_id):
     if request.user.is_authenticated:
         try:
             from apps.jobs.models import Postulacion
-            usuario = Usuario.objects.get(user=request.user)
+            usuario = obtener_usuario(request)
             
             if tipo == 'usuario':
                 ya_postulo = Postulacion.objects.filter(
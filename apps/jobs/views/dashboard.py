@@ -8,13 +8,14 @@ from apps.jobs.models import (
     GuardarTrabajo, Contrato
 )
 from apps.users.models import Usuario
+from apps.users.middleware import obtener_usuario
 
 
 @login_required
 def dashboard_trabajador(request):
     """Dashboard principal para trabajadores"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         # Verificar que sea trabajador
         if usuario.tipo_usuario not in ['trabajador', 'ambos']:
@@ -6,13 +6,14 @@ from django.views.decorators.http import require_POST
 
 from apps.jobs.models import OfertaUsuario, OfertaEmpresa, GuardarTrabajo
 from apps.users.models import Usuario
+from apps.users.middleware import obtener_usuario
 
 
 @login_required
 def trabajos_guardados(request):
     """Lista de trabajos guardados por el usuario"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         guardados = GuardarTrabajo.objects.filter(
             id_usuario=usuario
@@ -66,7 +67,7 @@ def trabajos_guardados(request):
 def guardar_trabajo(request, tipo, oferta_id):
     """Guardar/Marcar trabajo como favorito"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         if tipo == 'usuario':
             oferta = get_object_or_404(OfertaUsuario, id=oferta_id)
@@ -134,7 +135,7 @@ def guardar_trabajo(request, tipo, oferta_id):
 def quitar_guardado(request, guardado_id):
     """Quitar trabajo de guardados"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         guardado = get_object_or_404(
             GuardarTrabajo,
@@ -161,7 +162,7 @@ def quitar_guardado(request, guardado_id):
 def agregar_nota_guardado(request, guardado_id):
     """Agregar nota personal a trabajo guardado"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         guardado = get_object_or_404(
             GuardarTrabajo,
@@ -6,7 +6,10 @@ from django.views.decorators.http import require_POST
 from django.db.models import Q
 
 from apps.jobs.models import OfertaUsuario, OfertaEmpresa, GuardarTrabajo
-from apps.users.models import Usuario, Departamento, Provincia, Distrito, Comunidad
+from apps.users.models import Usuario
+from apps.core.utils import referencias
+from apps.users.services import ubigeo
+from apps.users.middleware import obtener_usuario
 
 
 def all_trabajos(request):
@@ -115,7 +118,7 @@ def all_trabajos(request):
     trabajos_guardados_ids = set()
     if request.user.is_authenticated:
         try:
-            usuario = Usuario.objects.get(user=request.user)
+            usuario = obtener_usuario(request)
             guardados = GuardarTrabajo.objects.filter(id_usuario=usuario)
             
             for g in guardados:
@@ -126,7 +129,7 @@ def all_trabajos(request):
         except:
             pass
     
-    departamentos = Departamento.objects.all().order_by('nombre')
+    departamentos = referencias.obtener('departamentos')
     
     context = {
         'trabajos': trabajos,
@@ -154,7 +157,7 @@ def filtrar_trabajos(request):
 def registro_individual(request):
     """Registrar oferta individual (empleador)"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         if usuario.tipo_usuario not in ['empleador', 'ambos']:
             messages.error(request, "No tienes permiso para publicar ofertas.")
@@ -187,7 +190,7 @@ def registro_individual(request):
 def registro_empresa(request):
     """Registrar oferta de empresa"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         if usuario.tipo_usuario != 'empresa':
             messages.error(request, "Solo empresas pueden publicar este tipo de ofertas.")
@@ -220,7 +223,7 @@ def registro_empresa(request):
 def mis_trabajos(request):
     """Ver trabajos publicados por el empleador"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         ofertas_usuario = OfertaUsuario.objects.filter(
             id_empleador=usuario
@@ -246,7 +249,7 @@ def mis_trabajos(request):
 def mis_trabajos_ajax(request):
     """Cargar trabajos con AJAX"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         ofertas_usuario = OfertaUsuario.objects.filter(
             id_empleador=usuario
@@ -269,7 +272,7 @@ def mis_trabajos_ajax(request):
 def editar_trabajo(request, oferta_id):
     """Editar una oferta de trabajo"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         # Intentar obtener como OfertaUsuario
         oferta = OfertaUsuario.objects.filter(
@@ -323,7 +326,7 @@ def editar_trabajo(request, oferta_id):
 def eliminar_trabajo(request, oferta_id):
     """Eliminar (soft delete) una oferta"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         from django.utils import timezone
         
         # Intentar como OfertaUsuario
@@ -364,41 +367,14 @@ def eliminar_trabajo(request, oferta_id):
 # AJAX para ubicación
 def cargar_provincias(request):
     """Cargar provincias por departamento"""
-    id_departamento = request.GET.get('id_departamento')
-    
-    if not id_departamento:
-        return JsonResponse([], safe=False)
-    
-    provincias = Provincia.objects.filter(
-        id_departamento=id_departamento
-    ).values('id_provincia', 'nombre').order_by('nombre')
-    
-    return JsonResponse(list(provincias), safe=False)
+    return ubigeo.responder_provincias(request)
 
 
 def cargar_distritos(request):
     """Cargar distritos por provincia"""
-    id_provincia = request.GET.get('id_provincia')
-    
-    if not id_provincia:
-        return JsonResponse([], safe=False)
-    
-    distritos = Distrito.objects.filter(
-        id_provincia=id_provincia
-    ).values('id_distrito', 'nombre').order_by('nombre')
-    
-    return JsonResponse(list(distritos), safe=False)
+    return ubigeo.responder_distritos(request)
 
 
 def cargar_comunidades(request):
     """Cargar comunidades por distrito"""
-    id_distrito = request.GET.get('id_distrito')
-    
-    if not id_distrito:
-        return JsonResponse([], safe=False)
-    
-    comunidades = Comunidad.objects.filter(
-        id_distrito=id_distrito
-    ).values('id_comunidad', 'nombre').order_by('nombre')
-    
-    return JsonResponse(list(comunidades), safe=False)
\ No newline at end of file
+    return ubigeo.responder_comunidades(request)
\ No newline at end of file
@@ -9,13 +9,14 @@ from apps.jobs.models import (
     OfertaUsuario, OfertaEmpresa, Postulacion
 )
 from apps.users.models import Usuario
+from apps.users.middleware import obtener_usuario
 
 
 @login_required
 def postular_trabajo(request, tipo, oferta_id):
     """Postular a una oferta de trabajo"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         # Verificar que el usuario sea trabajador
         if usuario.tipo_usuario not in ['trabajador', 'ambos']:
@@ -120,7 +121,7 @@ def postular_trabajo(request, tipo, oferta_id):
 def mis_postulaciones(request):
     """Ver todas las postulaciones del trabajador"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         postulaciones = Postulacion.objects.filter(
             id_trabajador=usuario
@@ -172,7 +173,7 @@ def mis_postulaciones(request):
 def retirar_postulacion(request, postulacion_id):
     """Retirar una postulación"""
     try:
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
         
         postulacion = get_object_or_404(
             Postulacion,
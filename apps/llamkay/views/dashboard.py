@@ -17,8 +17,9 @@ def dashboard(request):
     try:
         # Obtener el Usuario personalizado desde el User de Django
         from apps.users.models import Usuario, Profile, UsuarioHabilidad
+        from apps.users.middleware import obtener_usuario
         
-        usuario = Usuario.objects.select_related('profile').get(user=request.user)
+        usuario = obtener_usuario(request)
         profile, _ = Profile.objects.get_or_create(
             user=request.user,
             defaults={'id_usuario': usuario}
@@ -34,6 +35,7 @@ def dashboard(request):
         # ==================== MENSAJES NO LEÍDOS ====================
         try:
             from apps.chats.models import Conversacion, Mensaje
+            from apps.chats.utils import anotar_no_leidos, mensajes_no_leidos as no_leidos_de
             
             # Obtener conversaciones del usuario
             conversaciones = Conversacion.objects.filter(
@@ -42,14 +44,11 @@ def dashboard(request):
             ).select_related('id_usuario_1', 'id_usuario_2').order_by('-ultimo_mensaje_at')
             
             mensajes_no_leidos = 0
-            for conv in conversaciones[:5]:
+            for conv in anotar_no_leidos(conversaciones, usuario)[:5]:
                 otro_usuario = conv.obtener_otro_usuario(usuario)
                 
-                # Contar mensajes no leídos en esta conversación
-                no_leidos = Mensaje.objects.filter(
-                    id_conversacion=conv,
-                    leido=False
-                ).exclude(id_remitente=usuario).count()
+                # No leídos = mensajes por encima de la marca de lectura
+                no_leidos = conv.no_leidos
                 
                 mensajes_no_leidos += no_leidos
                 
@@ -148,10 +147,9 @@ def dashboard(request):
                     })
                 
                 # Nuevos mensajes
-                mensajes_nuevos = Mensaje.objects.filter(
-                    id_conversacion__in=conversaciones,
-                    leido=False
-                ).exclude(id_remitente=usuario).select_related('id_remitente').order_by('-fecha_envio')[:2]
+                mensajes_nuevos = no_leidos_de(usuario).filter(
+                    id_conversacion__activa=True
+                ).select_related('id_remitente').order_by('-fecha_envio')[:2]
                 
                 for msg in mensajes_nuevos:
                     actividades_recientes.append({
@@ -0,0 +1,37 @@
+"""
+Backend de autenticación por correo.
+
+Busca el User por UPPER(email), que usa el índice único auth_user_email_upper_uniq
+creado en post_migrate (ver signals.py), y trae el Usuario en la misma
+consulta para que el login guarde sus datos básicos en la sesión.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models.functions import Upper
+
+
+class EmailBackend(ModelBackend):
+    """authenticate(request, email=..., password=...)"""
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        UserModel = get_user_model()
+        user = (
+            UserModel._default_manager
+            .select_related('perfil')
+            .alias(email_upper=Upper('email'))
+            .filter(email_upper=email.strip().upper())
+            .order_by('-is_active', 'pk')
+            .first()
+        )
+        if user is None:
+            # Mismo tiempo de respuesta exista o no el correo
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -11,7 +11,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
-from .models import Usuario
+from .middleware import usuario_basico
 
 
 def rol_requerido(roles_permitidos):
@@ -30,26 +30,25 @@ def rol_requerido(roles_permitidos):
         @wraps(view_func)
         @login_required
         def _wrapped_view(request, *args, **kwargs):
-            try:
-                usuario = Usuario.objects.get(user=request.user)
-                
-                # Verificar si el tipo de usuario está en los roles permitidos
-                if usuario.tipo_usuario in roles_permitidos:
-                    return view_func(request, *args, **kwargs)
-                else:
-                    messages.error(
-                        request,
-                        f'No tienes permisos para acceder a esta sección. '
-                        f'Se requiere rol: {", ".join(roles_permitidos)}'
-                    )
-                    return redirect('users:dashboard')
-                    
-            except Usuario.DoesNotExist:
+            # id y tipo salen de la sesión; la vista reutiliza request.usuario
+            tipo_usuario = usuario_basico(request).get('tipo_usuario')
+            if tipo_usuario is None:
                 messages.error(
                     request,
                     'Tu perfil de usuario no está configurado correctamente.'
                 )
                 return redirect('users:dashboard')
+
+            # Verificar si el tipo de usuario está en los roles permitidos
+            if tipo_usuario in roles_permitidos:
+                return view_func(request, *args, **kwargs)
+
+            messages.error(
+                request,
+                f'No tienes permisos para acceder a esta sección. '
+                f'Se requiere rol: {", ".join(roles_permitidos)}'
+            )
+            return redirect('users:dashboard')
                 
         return _wrapped_view
     return decorator
@@ -1,6 +1,6 @@
 # usuarios/forms.py
 from django import forms
-from apps.users.models import Departamento, Provincia, Distrito
+from apps.core.utils.referencias import ReferenciaChoiceField
 from apps.jobs.models import Calificacion
 from apps.users.widgets import MultiFileInput  
 
@@ -122,16 +122,10 @@ class RegisterFormStep1(forms.Form):
 class RegisterFormStep2(forms.Form):
     direccion = forms.CharField(max_length=255, required=True)
 
-    # Solo se usa el queryset en el servidor (para validación y guardado), no para mostrar opciones en HTML
-    departamento = forms.ModelChoiceField(
-        queryset=Departamento.objects.all(), required=True, empty_label=None
-    )
-    provincia = forms.ModelChoiceField(
-        queryset=Provincia.objects.all(), required=True, empty_label=None
-    )
-    distrito = forms.ModelChoiceField(
-        queryset=Distrito.objects.all(), required=True, empty_label=None
-    )
+    # Se valida contra la caché de referencias; las opciones se cargan por AJAX en el HTML
+    departamento = ReferenciaChoiceField('departamentos', required=True, empty_label=None)
+    provincia = ReferenciaChoiceField('provincias', required=True, empty_label=None)
+    distrito = ReferenciaChoiceField('distritos', required=True, empty_label=None)
 
 
 class RegisterFormStep3(forms.Form):
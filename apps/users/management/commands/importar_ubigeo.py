@@ -0,0 +1,268 @@
+"""
+Importa departamentos, provincias, distritos y comunidades desde un CSV o JSON
+(p.ej. los datasets de ubigeo y centros poblados del INEI).
+
+Cada fila describe un distrito o una comunidad con toda su jerarquía:
+
+    ubigeo,departamento,provincia,distrito,comunidad,latitud,longitud
+    080101,CUSCO,CUSCO,CUSCO,,,
+    080108,CUSCO,CUSCO,WANCHAQ,SANTA ROSA,-13.5226,-71.9673
+
+El archivo se lee por lotes; cada lote se inserta o actualiza con
+bulk_create(update_conflicts=True) sobre las claves únicas de cada tabla, y
+los ids de los padres salen de mapas en memoria. Volver a importar el mismo
+archivo no duplica filas.
+
+Uso:
+    python manage.py importar_ubigeo ubigeo_inei.csv
+    python manage.py importar_ubigeo centros_poblados.jsonl --lote 5000
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.users.models import Departamento, Provincia, Distrito, Comunidad
+from apps.users.services.ubigeo import invalidar_ubigeo
+
+# Nombres de columna aceptados para cada campo
+COLUMNAS = {
+    'ubigeo': ('ubigeo', 'codigo', 'cod_ubigeo', 'idubigeo'),
+    'departamento': ('departamento', 'nombdep', 'dep'),
+    'provincia': ('provincia', 'nombprov', 'prov'),
+    'distrito': ('distrito', 'nombdist', 'dist'),
+    'comunidad': ('comunidad', 'centro_poblado', 'nomccpp', 'nombre_ccpp'),
+    'latitud': ('latitud', 'lat', 'y'),
+    'longitud': ('longitud', 'lon', 'lng', 'x'),
+}
+SIETE_DECIMALES = Decimal('0.0000001')
+
+
+# ==================== LECTURA ====================
+
+def _filas_csv(archivo, delimitador):
+    yield from csv.DictReader(archivo, delimiter=delimitador)
+
+
+def _filas_json(archivo, tamano=1 << 16):
+    """Objetos de un arreglo JSON o de JSON Lines, sin cargar todo el archivo"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    fin = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,[]')
+        if buffer:
+            try:
+                objeto, posicion = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if fin:
+                    raise
+            else:
+                buffer = buffer[posicion:]
+                yield objeto
+                continue
+        if fin:
+            return
+        bloque = archivo.read(tamano)
+        fin = not bloque
+        buffer += bloque
+
+
+def _normalizar(fila):
+    """Fila del archivo -> dict con los campos de COLUMNAS (None si faltan)"""
+    fila = {str(k).strip().lower(): v for k, v in fila.items() if k is not None}
+    datos = {}
+    for campo, alias in COLUMNAS.items():
+        valor = next((fila[a] for a in alias if fila.get(a) not in (None, '')), None)
+        datos[campo] = str(valor).strip() if valor is not None else None
+    return datos
+
+
+def _coordenada(valor):
+    if not valor:
+        return None
+    return Decimal(valor.replace(',', '.')).quantize(SIETE_DECIMALES)
+
+
+# ==================== ESCRITURA ====================
+
+class Importador:
+    """
+    Carga por lotes con mapas en memoria (id_padre, nombre) -> (id, código)
+    de los niveles padre; los departamentos usan id_padre None.
+    """
+
+    NIVELES = (
+        # modelo, campo padre, dígitos del ubigeo que forman su código
+        (Departamento, None, 2),
+        (Provincia, 'id_departamento', 4),
+        (Distrito, 'id_provincia', 6),
+    )
+
+    def __init__(self):
+        self.mapas = []
+        for modelo, campo_padre, _ in self.NIVELES:
+            filas = modelo.objects.values_list(modelo._meta.pk.attname, 'nombre', 'codigo', *filter(None, [campo_padre]))
+            self.mapas.append({
+                (padre[0] if padre else None, nombre): (pk, codigo)
+                for pk, nombre, codigo, *padre in filas
+            })
+        self.escritos = dict.fromkeys(['departamentos', 'provincias', 'distritos', 'comunidades'], 0)
+
+    def _nivel(self, indice, filas):
+        """
+        Inserta o actualiza solo los registros nuevos o con otro código.
+        filas: {(id_padre, nombre): codigo}
+        """
+        modelo, campo_padre, _ = self.NIVELES[indice]
+        mapa = self.mapas[indice]
+        cambios = {
+            clave: codigo for clave, codigo in filas.items()
+            if clave not in mapa or (codigo and mapa[clave][1] != codigo)
+        }
+        if not cambios:
+            return 0
+
+        padre = f'{campo_padre}_id' if campo_padre else None
+        objetos = [
+            modelo(nombre=nombre, codigo=codigo, **({padre: id_padre} if padre else {}))
+            for (id_padre, nombre), codigo in cambios.items()
+        ]
+        modelo.objects.bulk_create(
+            objetos,
+            update_conflicts=True,
+            unique_fields=[campo_padre, 'nombre'] if campo_padre else ['nombre'],
+            update_fields=['codigo', 'updated_at'],
+        )
+
+        def clave(obj):
+            return (getattr(obj, padre) if padre else None, obj.nombre)
+
+        if any(obj.pk is None for obj in objetos):
+            # La base no devolvió los ids del upsert: leerlos de vuelta
+            objetos = [
+                obj for obj in modelo.objects.filter(nombre__in={nombre for _, nombre in cambios})
+                if clave(obj) in cambios
+            ]
+        for obj in objetos:
+            mapa[clave(obj)] = (obj.pk, cambios[clave(obj)])
+        return len(cambios)
+
+    def lote(self, filas):
+        """Escribe un lote de filas normalizadas, de los departamentos a las comunidades"""
+        ids = [[None] * len(filas)]
+        for indice, (modelo, _, digitos) in enumerate(self.NIVELES):
+            campo = ('departamento', 'provincia', 'distrito')[indice]
+            claves = [(padre, fila[campo]) for padre, fila in zip(ids[-1], filas)]
+            self.escritos[campo + 's'] += self._nivel(indice, {
+                clave: fila['ubigeo'][:digitos] if fila['ubigeo'] else None
+                for clave, fila in zip(claves, filas)
+            })
+            ids.append([self.mapas[indice][clave][0] for clave in claves])
+
+        comunidades = {}
+        for id_distrito, fila in zip(ids[-1], filas):
+            if fila['comunidad']:
+                comunidades[(id_distrito, fila['comunidad'])] = Comunidad(
+                    id_distrito_id=id_distrito,
+                    nombre=fila['comunidad'],
+                    latitud=fila['latitud'],
+                    longitud=fila['longitud'],
+                )
+        Comunidad.objects.bulk_create(
+            comunidades.values(),
+            update_conflicts=True,
+            unique_fields=['id_distrito', 'nombre'],
+            update_fields=['latitud', 'longitud', 'updated_at'],
+        )
+        self.escritos['comunidades'] += len(comunidades)
+
+
+class Command(BaseCommand):
+    help = 'Importa el ubigeo (departamentos, provincias, distritos y comunidades) desde CSV o JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV, JSON (arreglo) o JSON Lines')
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'json'],
+            help='Por defecto según la extensión (.csv / .json / .jsonl)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Filas por lote (una transacción y un bulk_create por tabla)'
+        )
+        parser.add_argument(
+            '--delimitador',
+            default=',',
+            help='Separador de columnas del CSV'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Codificación del archivo (los CSV del INEI suelen venir en latin-1)'
+        )
+
+    def _filas(self, archivo, formato, delimitador, omitidas):
+        filas = _filas_csv(archivo, delimitador) if formato == 'csv' else _filas_json(archivo)
+        for numero, fila in enumerate(filas, start=1):
+            datos = _normalizar(fila)
+            try:
+                if not (datos['departamento'] and datos['provincia'] and datos['distrito']):
+                    raise ValueError('faltan departamento, provincia o distrito')
+                if datos['ubigeo']:
+                    datos['ubigeo'] = datos['ubigeo'].zfill(6)
+                datos['latitud'] = _coordenada(datos['latitud'])
+                datos['longitud'] = _coordenada(datos['longitud'])
+            except (ValueError, InvalidOperation) as e:
+                omitidas.append(numero)
+                if self.verbosity > 1:
+                    self.stderr.write(f'Fila {numero} omitida: {e}')
+                continue
+            yield datos
+
+    def handle(self, *args, **options):
+        ruta = Path(options['archivo'])
+        if not ruta.is_file():
+            raise CommandError(f'No existe el archivo {ruta}')
+        formato = options['formato'] or ('csv' if ruta.suffix.lower() in ('.csv', '.txt') else 'json')
+        tamano_lote = max(1, options['lote'])
+        self.verbosity = options['verbosity']
+
+        importador = Importador()
+        omitidas = []
+        total = 0
+        inicio = time.monotonic()
+        try:
+            with open(ruta, newline='', encoding=options['encoding']) as archivo:
+                filas = self._filas(archivo, formato, options['delimitador'], omitidas)
+                while lote := list(islice(filas, tamano_lote)):
+                    with transaction.atomic():
+                        importador.lote(lote)
+                    total += len(lote)
+                    if self.verbosity > 0:
+                        segundos = time.monotonic() - inicio
+                        self.stdout.write(f'{total} filas ({total / segundos:.0f} filas/s)')
+        except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {e}')
+        finally:
+            # bulk_create no envía post_save: invalidar el árbol de ubigeo
+            invalidar_ubigeo()
+
+        segundos = time.monotonic() - inicio
+        escritos = ', '.join(f'{n} {nombre}' for nombre, n in importador.escritos.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} filas importadas en {segundos:.1f}s ({total / max(segundos, 1e-6):.0f} filas/s): {escritos}'
+        ))
+        if omitidas:
+            self.stdout.write(self.style.WARNING(
+                f'{len(omitidas)} filas omitidas (primeras: {", ".join(map(str, omitidas[:10]))})'
+            ))
@@ -0,0 +1,51 @@
+"""
+Rellena Usuario.nombre_normalizado de las filas creadas antes de existir la
+columna o modificadas con update() directo (save() ya lo mantiene al día).
+Se corre una vez después de migrar.
+
+Uso:
+    python manage.py normalizar_nombres
+    python manage.py normalizar_nombres --todos
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.users.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Rellena el nombre normalizado que usa la búsqueda del directorio'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Recalcular todos los usuarios, no solo los que no lo tienen'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Usuarios por bulk_update'
+        )
+
+    def handle(self, *args, **options):
+        usuarios = Usuario.objects.only('id_usuario', 'nombres', 'apellidos', 'username', 'nombre_normalizado')
+        if not options['todos']:
+            usuarios = usuarios.filter(nombre_normalizado='')
+
+        lote, total = [], 0
+        for usuario in usuarios.iterator(chunk_size=options['lote']):
+            normalizado = Usuario.normalizar_nombre(usuario.nombres, usuario.apellidos, usuario.username)
+            if normalizado != usuario.nombre_normalizado:
+                usuario.nombre_normalizado = normalizado
+                lote.append(usuario)
+            if len(lote) >= options['lote']:
+                Usuario.objects.bulk_update(lote, ['nombre_normalizado'])
+                total += len(lote)
+                lote = []
+        if lote:
+            Usuario.objects.bulk_update(lote, ['nombre_normalizado'])
+            total += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f'{total} usuarios actualizados'))
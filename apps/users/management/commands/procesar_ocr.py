@@ -0,0 +1,113 @@
+"""
+Worker de OCR: procesa la cola TrabajoOCR en un pool de procesos.
+
+Uso:
+    python manage.py procesar_ocr
+    python manage.py procesar_ocr --procesos 4
+    python manage.py procesar_ocr --una-vez
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.users.services import ocr
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos OCR pendientes (un modelo EasyOCR por proceso)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=settings.OCR_MAX_CONCURRENTES,
+            help='Procesos OCR en este worker (el tope global es OCR_MAX_CONCURRENTES)'
+        )
+        parser.add_argument(
+            '--espera',
+            type=float,
+            default=2.0,
+            help='Segundos entre consultas a la cola cuando está vacía'
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Terminar cuando la cola quede vacía'
+        )
+
+    def handle(self, *args, **options):
+        procesos = max(1, options['procesos'])
+        espera = options['espera']
+
+        # Los procesos hijos no deben heredar conexiones abiertas
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=procesos,
+            initializer=ocr.iniciar_proceso,
+            initargs=(settings.OCR_IDIOMAS,),
+        )
+        self.stdout.write(f'Worker OCR iniciado con {procesos} proceso(s)')
+
+        en_curso = {}
+        procesados = 0
+        try:
+            while True:
+                libres = procesos - len(en_curso)
+                if libres:
+                    for trabajo in ocr.reclamar(libres):
+                        # Otro trabajo ya leyó el mismo archivo
+                        resultado = ocr.resultado_de(trabajo.sha256)
+                        if resultado is not None:
+                            ocr.completar(trabajo, resultado.texto)
+                            procesados += 1
+                            continue
+
+                        archivos = ExitStack()
+                        try:
+                            ruta = archivos.enter_context(ocr.ruta_local(trabajo.archivo))
+                        except OSError as e:
+                            archivos.close()
+                            ocr.fallar(trabajo, e)
+                            continue
+                        try:
+                            futuro = pool.submit(ocr.extraer_texto, ruta)
+                        except BrokenProcessPool as e:
+                            archivos.close()
+                            ocr.fallar(trabajo, e)
+                            raise
+                        en_curso[futuro] = (trabajo, archivos)
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(espera)
+                    continue
+
+                terminados, _ = wait(en_curso, timeout=espera, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    trabajo, archivos = en_curso.pop(futuro)
+                    archivos.close()
+                    try:
+                        ocr.completar(trabajo, futuro.result())
+                    except Exception as e:
+                        self.stderr.write(f'OCR #{trabajo.id} falló: {e}')
+                        ocr.fallar(trabajo, e)
+                    procesados += 1
+        except KeyboardInterrupt:
+            self.stdout.write('Deteniendo worker OCR...')
+        except BrokenProcessPool as e:
+            # Un proceso murió (p.ej. no se pudo cargar el modelo): devolver los trabajos a la cola
+            for trabajo, archivos in en_curso.values():
+                archivos.close()
+                ocr.fallar(trabajo, e)
+            raise CommandError(f'El pool de OCR se detuvo: {e}')
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(f'{procesados} trabajo(s) OCR procesados'))
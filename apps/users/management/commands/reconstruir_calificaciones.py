@@ -0,0 +1,31 @@
+"""
+Recalcula desde cero los agregados de calificaciones de Usuario
+(total, suma, histograma de estrellas y aspectos detallados), el promedio y
+score_confianza. Se corre también una vez después de migrar una base
+existente, para que el ranking no parta de score_confianza=0.
+
+Uso:
+    python manage.py reconstruir_calificaciones
+    python manage.py reconstruir_calificaciones --usuario 15 --usuario 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.users.services.calificaciones import reconstruir_estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los agregados de calificaciones de los usuarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=int,
+            action='append',
+            default=None,
+            help='id_usuario a reparar (se puede repetir); por defecto todos'
+        )
+
+    def handle(self, *args, **options):
+        total = reconstruir_estadisticas(options['usuario'])
+        self.stdout.write(self.style.SUCCESS(f'{total} usuarios con calificaciones recalculados'))
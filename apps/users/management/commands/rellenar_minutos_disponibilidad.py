@@ -0,0 +1,50 @@
+"""
+Calcula minuto_inicio/minuto_fin de los horarios de Disponibilidad creados
+antes de existir esas columnas (save() ya los mantiene al día). Se corre una
+vez después de migrar.
+
+Uso:
+    python manage.py rellenar_minutos_disponibilidad
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.users.models import Disponibilidad
+from apps.users.services.disponibilidad import invalidar_arbol
+
+
+class Command(BaseCommand):
+    help = 'Rellena los minutos de la semana de los horarios de disponibilidad'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Horarios por bulk_update'
+        )
+
+    def handle(self, *args, **options):
+        # minuto_fin es 0 solo en filas sin calcular: un horario siempre termina después del minuto 0
+        pendientes = Disponibilidad.objects.filter(minuto_fin=0).only(
+            'id', 'dia_semana', 'hora_inicio', 'hora_fin'
+        )
+
+        lote, total = [], 0
+        for horario in pendientes.iterator(chunk_size=options['lote']):
+            horario.minuto_inicio, horario.minuto_fin = Disponibilidad.minutos_semana(
+                horario.dia_semana, horario.hora_inicio, horario.hora_fin
+            )
+            lote.append(horario)
+            if len(lote) >= options['lote']:
+                Disponibilidad.objects.bulk_update(lote, ['minuto_inicio', 'minuto_fin'])
+                total += len(lote)
+                lote = []
+        if lote:
+            Disponibilidad.objects.bulk_update(lote, ['minuto_inicio', 'minuto_fin'])
+            total += len(lote)
+
+        if total:
+            # bulk_update no envía post_save
+            invalidar_arbol()
+        self.stdout.write(self.style.SUCCESS(f'{total} horarios actualizados'))
@@ -0,0 +1,125 @@
+"""
+Resolución del Usuario del request.
+
+usuario_middleware agrega:
+- request.usuario: Usuario del usuario autenticado (con profile e id_comunidad),
+  consultado la primera vez que se usa y como máximo una vez por request.
+- request.usuario_basico: {'id_usuario', 'tipo_usuario', 'username'} guardado
+  unos minutos en la sesión, para chequeos de rol sin consultar la base.
+
+Ambos son falsos (None / {}) si no hay sesión o el usuario no tiene Usuario.
+"""
+
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject
+
+from apps.users.models import Usuario
+
+CLAVE_SESION = '_usuario_basico'
+CAMPOS_BASICOS = ('id_usuario', 'tipo_usuario', 'username')
+
+
+def _usuario(request):
+    """Consulta el Usuario una sola vez por request"""
+    if not hasattr(request, '_usuario'):
+        request._usuario = _resolver(request)
+    return request._usuario
+
+
+def _resolver(request):
+    if not request.user.is_authenticated:
+        return None
+    usuario = (
+        Usuario.objects
+        .select_related('profile', 'id_comunidad')
+        .filter(user_id=request.user.pk)
+        .first()
+    )
+    if usuario is not None:
+        recordar_usuario(request, usuario)
+    return usuario
+
+
+def recordar_usuario(request, usuario):
+    """
+    Fija el Usuario del request (p.ej. el que ya trajo el login) y guarda
+    sus datos básicos en la sesión para las siguientes peticiones.
+    """
+    request._usuario = usuario
+    # request.user.perfil y usuario.user quedan resueltos sin otra consulta
+    Usuario.user.field.remote_field.set_cached_value(request.user, usuario)
+    Usuario.user.field.set_cached_value(usuario, request.user)
+    _guardar_basico(request, {campo: getattr(usuario, campo) for campo in CAMPOS_BASICOS})
+
+
+def _guardar_basico(request, basico):
+    if not settings.USUARIO_SESION_TTL or not hasattr(request, 'session'):
+        return
+    # Solo escribir si cambió o venció: escribir marca la sesión y la guarda en cada request
+    guardado = request.session.get(CLAVE_SESION)
+    if (
+        guardado
+        and guardado.get('user_id') == request.user.pk
+        and guardado.get('expira', 0) > time.time()
+        and all(guardado.get(campo) == basico[campo] for campo in CAMPOS_BASICOS)
+    ):
+        return
+    request.session[CLAVE_SESION] = {
+        **basico,
+        'user_id': request.user.pk,
+        'expira': time.time() + settings.USUARIO_SESION_TTL,
+    }
+
+
+def _resolver_basico(request):
+    if not request.user.is_authenticated:
+        return {}
+    guardado = getattr(request, 'session', {}).get(CLAVE_SESION)
+    if guardado and guardado['user_id'] == request.user.pk and guardado['expira'] > time.time():
+        return {campo: guardado[campo] for campo in CAMPOS_BASICOS}
+
+    usuario = _usuario(request)
+    if usuario is None:
+        return {}
+    return {campo: getattr(usuario, campo) for campo in CAMPOS_BASICOS}
+
+
+def obtener_usuario(request):
+    """
+    Usuario del request; lanza Usuario.DoesNotExist si no existe
+    (reemplazo directo de Usuario.objects.get(user=request.user)).
+    """
+    usuario = _usuario(request)
+    if usuario is None:
+        raise Usuario.DoesNotExist('El usuario autenticado no tiene Usuario asociado')
+    return usuario
+
+
+def usuario_basico(request):
+    """request.usuario_basico, también cuando el middleware no está instalado"""
+    if not hasattr(request, 'usuario_basico'):
+        request.usuario_basico = SimpleLazyObject(lambda: _resolver_basico(request))
+    return request.usuario_basico
+
+
+def _adjuntar(request):
+    request.usuario = SimpleLazyObject(lambda: _usuario(request))
+    request.usuario_basico = SimpleLazyObject(lambda: _resolver_basico(request))
+
+
+@sync_and_async_middleware
+def usuario_middleware(get_response):
+    """Solo adjunta objetos perezosos: no obliga a ASGI a ejecutar la cadena en modo síncrono"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            _adjuntar(request)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            _adjuntar(request)
+            return get_response(request)
+    return middleware
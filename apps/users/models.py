@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+
+from apps.core.utils.formatters import normalizar_texto
 
 # ==================== UBICACIÓN ====================
 class Departamento(models.Model):
@@ -128,6 +131,8 @@ class Usuario(models.Model):
     # Información Personal
     nombres = models.CharField(max_length=100)
     apellidos = models.CharField(max_length=100)
+    # "nombres apellidos username" normalizado, para el buscador del directorio
+    nombre_normalizado = models.CharField(max_length=400, blank=True, default='', editable=False)
     dni = models.CharField(max_length=20, unique=True, null=True, blank=True)
     telefono = models.CharField(max_length=20, null=True, blank=True)
     fecha_nacimiento = models.DateField(null=True, blank=True)
@@ -168,6 +173,23 @@ class Usuario(models.Model):
     total_calificaciones = models.IntegerField(default=0)
     trabajos_completados = models.IntegerField(default=0)
     
+    # Agregados de calificaciones activas (mantenidos con deltas, ver services/calificaciones.py)
+    suma_calificaciones = models.IntegerField(default=0)
+    estrellas_1 = models.IntegerField(default=0)
+    estrellas_2 = models.IntegerField(default=0)
+    estrellas_3 = models.IntegerField(default=0)
+    estrellas_4 = models.IntegerField(default=0)
+    estrellas_5 = models.IntegerField(default=0)
+    suma_puntualidad = models.IntegerField(default=0)
+    total_puntualidad = models.IntegerField(default=0)
+    suma_calidad_trabajo = models.IntegerField(default=0)
+    total_calidad_trabajo = models.IntegerField(default=0)
+    suma_comunicacion = models.IntegerField(default=0)
+    total_comunicacion = models.IntegerField(default=0)
+    
+    # Puntaje de ranking precalculado (ver services/ranking.py)
+    score_confianza = models.FloatField(default=0)
+    
     # Auditoría
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -181,12 +203,55 @@ class Usuario(models.Model):
             models.Index(fields=['tipo_usuario']),
             models.Index(fields=['latitud', 'longitud']),
             models.Index(fields=['estado_verificacion']),
-            models.Index(fields=['habilitado'])
+            models.Index(fields=['habilitado']),
+            models.Index(
+                fields=['tipo_usuario', 'habilitado', '-score_confianza'],
+                name='usuario_tipo_hab_score_idx'
+            ),
+            # Búsqueda del directorio con contains (solo PostgreSQL, extensión pg_trgm)
+            GinIndex(
+                fields=['nombre_normalizado'],
+                opclasses=['gin_trgm_ops'],
+                name='usuario_nombre_norm_trgm_idx'
+            ),
         ]
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos}"
 
+    @staticmethod
+    def normalizar_nombre(nombres, apellidos, username):
+        return normalizar_texto(f"{nombres or ''} {apellidos or ''} {username or ''}")
+
+    # Columnas que solo se escriben con UPDATE ... F() (ver services/calificaciones.py,
+    # services/ranking.py y jobs/signals.py); un save() completo de una instancia
+    # leída antes volvería a escribir valores viejos
+    CAMPOS_DERIVADOS = (
+        'rating_promedio', 'total_calificaciones', 'trabajos_completados', 'suma_calificaciones',
+        'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+        'suma_puntualidad', 'total_puntualidad', 'suma_calidad_trabajo', 'total_calidad_trabajo',
+        'suma_comunicacion', 'total_comunicacion', 'score_confianza',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        usuario = super().from_db(db, field_names, values)
+        # Para saber sin otra consulta si cambió la verificación (ver signals.refrescar_score_usuario)
+        usuario._verificacion_db = usuario.__dict__.get('estado_verificacion')
+        return usuario
+
+    def save(self, *args, **kwargs):
+        self.nombre_normalizado = self.normalizar_nombre(self.nombres, self.apellidos, self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'nombres', 'apellidos', 'username'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'nombre_normalizado'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_DERIVADOS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -432,6 +497,15 @@ class Verificacion(models.Model):
         db_column='id_revisado_por'
     )
 
+    # Texto extraído del archivo (compartido entre archivos idénticos)
+    id_resultado_ocr = models.ForeignKey(
+        'ResultadoOCR',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='id_resultado_ocr'
+    )
+
     class Meta:
         db_table = 'verificacion'
         indexes = [
@@ -459,6 +533,15 @@ class Certificacion(models.Model):
     fecha_verificacion = models.DateTimeField(null=True, blank=True)
     fecha_subida = models.DateTimeField(auto_now_add=True)
 
+    # Texto extraído del archivo (compartido entre archivos idénticos)
+    id_resultado_ocr = models.ForeignKey(
+        'ResultadoOCR',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='id_resultado_ocr'
+    )
+
     class Meta:
         db_table = 'certificacion'
         indexes = [
@@ -507,10 +590,111 @@ class Disponibilidad(models.Model):
     hora_inicio = models.TimeField()
     hora_fin = models.TimeField()
     activa = models.BooleanField(default=True)
+    
+    # Minuto de la semana [inicio, fin) para consultas de solapamiento por rango.
+    # Un horario que cruza la medianoche termina después de 24h del día (fin > inicio).
+    minuto_inicio = models.IntegerField(default=0, editable=False)
+    minuto_fin = models.IntegerField(default=0, editable=False)
+
+    MINUTOS_DIA = 24 * 60
+    MINUTOS_SEMANA = 7 * MINUTOS_DIA
 
     class Meta:
         db_table = 'disponibilidad'
         unique_together = [['id_trabajador', 'dia_semana', 'hora_inicio', 'hora_fin']]
         indexes = [
-            models.Index(fields=['id_trabajador', 'dia_semana', 'activa'])
-        ]
\ No newline at end of file
+            models.Index(fields=['id_trabajador', 'dia_semana', 'activa']),
+            models.Index(fields=['activa', 'minuto_inicio', 'minuto_fin']),
+        ]
+
+    @classmethod
+    def minutos_semana(cls, dia_semana, hora_inicio, hora_fin):
+        """(inicio, fin) en minutos desde el domingo 00:00"""
+        inicio = dia_semana * cls.MINUTOS_DIA + hora_inicio.hour * 60 + hora_inicio.minute
+        fin = dia_semana * cls.MINUTOS_DIA + hora_fin.hour * 60 + hora_fin.minute
+        if fin <= inicio:
+            fin += cls.MINUTOS_DIA
+        return inicio, fin
+
+    def save(self, *args, **kwargs):
+        self.minuto_inicio, self.minuto_fin = self.minutos_semana(
+            self.dia_semana, self.hora_inicio, self.hora_fin
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'dia_semana', 'hora_inicio', 'hora_fin'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'minuto_inicio', 'minuto_fin'}
+        super().save(*args, **kwargs)
+
+
+# ==================== OCR ====================
+
+class ResultadoOCR(models.Model):
+    """Texto extraído de un archivo, identificado por el SHA-256 de su contenido"""
+    id = models.AutoField(primary_key=True)
+    sha256 = models.CharField(max_length=64, unique=True)
+    texto = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'resultado_ocr'
+
+    def __str__(self):
+        return self.sha256[:12]
+
+
+class TrabajoOCR(models.Model):
+    """Extracción de texto pendiente o terminada (cola procesada por `procesar_ocr`)"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    id_usuario = models.ForeignKey(
+        'Usuario',
+        on_delete=models.CASCADE,
+        db_column='id_usuario'
+    )
+    id_certificacion = models.ForeignKey(
+        'Certificacion',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_column='id_certificacion'
+    )
+    id_verificacion = models.ForeignKey(
+        'Verificacion',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_column='id_verificacion'
+    )
+
+    archivo = models.CharField(max_length=500)  # Ruta en default_storage
+    sha256 = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    id_resultado = models.ForeignKey(
+        'ResultadoOCR',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_column='id_resultado'
+    )
+    error = models.TextField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajo_ocr'
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"OCR #{self.id} ({self.estado})"
+
@@ -0,0 +1,3 @@
+"""
+Servicios de la app users: lógica de consulta reutilizable entre vistas de distintas apps
+"""
@@ -0,0 +1,185 @@
+"""
+Búsqueda de trabajadores por habilidades, ubicación y disponibilidad.
+
+Cada habilidad tiene una lista de ids de usuario ordenada (posting list)
+guardada en caché. Una búsqueda con varias habilidades intersecta esas listas
+en memoria en lugar de encadenar JOINs, junto con la lista de trabajadores
+libres en el horario (services/disponibilidad.py); solo los candidatos
+resultantes se consultan en la base de datos para filtrar por distancia.
+"""
+
+import math
+from bisect import bisect_left
+from datetime import time
+
+from django.core.cache import cache
+from django.db.models import F
+
+from apps.users.models import Usuario, UsuarioHabilidad
+from apps.users.services.disponibilidad import disponibles
+from apps.users.services import miniaturas
+
+POSTINGS_TTL = 60 * 60 * 6
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = 111.32
+TIPOS_TRABAJADOR = ('trabajador', 'ambos')
+RESULTADOS_MAX = 50
+
+
+def _clave_habilidad(id_habilidad):
+    return f'trabajadores:habilidad:{id_habilidad}'
+
+
+def invalidar_habilidad(id_habilidad):
+    """Descartar la posting list de una habilidad (al agregar o quitar un usuario)"""
+    cache.delete(_clave_habilidad(id_habilidad))
+
+
+def listas_por_habilidad(ids_habilidades):
+    """
+    Posting lists (ids de usuario ordenados) de varias habilidades.
+    Lee la caché en un solo viaje y construye las que falten con una consulta.
+
+    Returns:
+        dict: {id_habilidad: [id_usuario, ...]}
+    """
+    claves = {_clave_habilidad(id_habilidad): id_habilidad for id_habilidad in ids_habilidades}
+    en_cache = cache.get_many(list(claves))
+    listas = {claves[clave]: ids for clave, ids in en_cache.items()}
+
+    faltantes = [id_habilidad for id_habilidad in ids_habilidades if id_habilidad not in listas]
+    if faltantes:
+        nuevas = {id_habilidad: [] for id_habilidad in faltantes}
+        filas = UsuarioHabilidad.objects.filter(id_habilidad__in=faltantes).order_by(
+            'id_habilidad', 'id_usuario'
+        ).values_list('id_habilidad', 'id_usuario')
+        for id_habilidad, id_usuario in filas:
+            nuevas[id_habilidad].append(id_usuario)
+        cache.set_many({_clave_habilidad(k): v for k, v in nuevas.items()}, POSTINGS_TTL)
+        listas.update(nuevas)
+
+    return listas
+
+
+def _intersectar(a, b):
+    """Intersección de dos listas ordenadas sin duplicados"""
+    if len(a) > len(b):
+        a, b = b, a
+    resultado = []
+    # Si una lista es mucho más corta conviene buscar sus elementos con bisección
+    if len(a) * 8 < len(b):
+        for valor in a:
+            posicion = bisect_left(b, valor)
+            if posicion < len(b) and b[posicion] == valor:
+                resultado.append(valor)
+        return resultado
+
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            resultado.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return resultado
+
+
+def interseccion_ordenada(listas):
+    """Intersecta varias listas ordenadas empezando por la más corta"""
+    if not listas:
+        return []
+    listas = sorted(listas, key=len)
+    resultado = listas[0]
+    for lista in listas[1:]:
+        if not resultado:
+            break
+        resultado = _intersectar(resultado, lista)
+    return resultado
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia haversine en kilómetros"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+
+def buscar_trabajadores(habilidades=None, latitud=None, longitud=None,
+                        dia_semana=None, hora_inicio=None, hora_fin=None,
+                        limite=20):
+    """
+    Trabajadores que tienen todas las habilidades, cuyo radio de trabajo
+    incluye el punto indicado y con una disponibilidad que cubre el horario.
+
+    Args:
+        habilidades: ids de Habilidad (deben tenerse todas)
+        latitud, longitud: punto del trabajo; si se omite no se filtra por distancia
+        dia_semana: 0=Domingo ... 6=Sábado
+        hora_inicio, hora_fin: time; rango que un horario debe cubrir
+                               (sin horas basta con estar disponible ese día)
+
+    Returns:
+        list[dict]: ordenados por score_confianza (derivado del rating)
+    """
+    trabajadores = Usuario.objects.filter(
+        tipo_usuario__in=TIPOS_TRABAJADOR,
+        habilitado=True,
+        deleted_at__isnull=True,
+    )
+
+    # Listas ordenadas de candidatos: una por habilidad y otra por horario
+    listas = []
+    if habilidades:
+        listas.extend(listas_por_habilidad(list(dict.fromkeys(habilidades))).values())
+    if dia_semana is not None and hora_inicio is not None and hora_fin is not None:
+        listas.append(disponibles(dia_semana, hora_inicio, hora_fin))
+    elif dia_semana is not None:
+        listas.append(disponibles(dia_semana, time(0), time(0), cubre=False))
+
+    if listas:
+        candidatos = interseccion_ordenada(listas)
+        if not candidatos:
+            return []
+        trabajadores = trabajadores.filter(id_usuario__in=candidatos)
+
+    if latitud is not None and longitud is not None:
+        # Prefiltro grueso en SQL: latitud dentro del radio de cada trabajador
+        trabajadores = trabajadores.filter(
+            latitud__isnull=False,
+            longitud__isnull=False,
+            latitud__gte=latitud - F('radio_km') / KM_POR_GRADO,
+            latitud__lte=latitud + F('radio_km') / KM_POR_GRADO,
+        )
+
+    filas = trabajadores.order_by('-score_confianza', 'id_usuario').values(
+        'id_usuario', 'nombres', 'apellidos', 'username', 'rating_promedio',
+        'total_calificaciones', 'score_confianza', 'latitud', 'longitud', 'radio_km',
+        foto=F('profile__foto_url'),
+    )
+
+    resultados = []
+    for fila in filas.iterator(chunk_size=500):
+        distancia = None
+        if latitud is not None and longitud is not None:
+            distancia = distancia_km(latitud, longitud, float(fila['latitud']), float(fila['longitud']))
+            if distancia > fila['radio_km']:
+                continue
+        resultados.append({
+            'id_usuario': fila['id_usuario'],
+            'nombre_completo': f"{fila['nombres']} {fila['apellidos']}".strip() or fila['username'],
+            'rating_promedio': float(fila['rating_promedio']),
+            'total_calificaciones': fila['total_calificaciones'],
+            'score_confianza': round(fila['score_confianza'], 3),
+            'distancia_km': round(distancia, 1) if distancia is not None else None,
+            'foto_url': miniaturas.url(fila['foto'], 'chico'),
+        })
+        if len(resultados) >= limite:
+            break
+
+    return resultados
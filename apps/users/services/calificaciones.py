@@ -0,0 +1,180 @@
+"""
+Agregados de calificaciones en Usuario.
+
+Cada alta, edición o desactivación de una Calificacion aplica solo la
+diferencia (delta) sobre las columnas del receptor con expresiones F(), sin
+recorrer su historial. ``reconstruir_estadisticas`` recalcula todo desde cero.
+``resumen_calificaciones`` arma el resumen de la página de calificaciones.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, When, Value, F, Q, Count, Sum, Avg, FloatField, DecimalField
+)
+from django.db.models.functions import Cast
+
+from apps.users.models import Usuario
+from apps.users.services.ranking import SCORE_CONFIANZA
+
+ASPECTOS = ('puntualidad', 'calidad_trabajo', 'comunicacion')
+CAMPOS_SNAPSHOT = ('activa', 'puntuacion') + ASPECTOS
+
+CAMPOS_AGREGADOS = (
+    'total_calificaciones', 'suma_calificaciones',
+    'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+) + tuple(f'{prefijo}_{aspecto}' for aspecto in ASPECTOS for prefijo in ('suma', 'total'))
+
+RESUMEN_TTL = 60 * 60
+
+PROMEDIO = Case(
+    When(
+        total_calificaciones__gt=0,
+        then=Cast(
+            Cast('suma_calificaciones', FloatField()) / F('total_calificaciones'),
+            DecimalField(max_digits=3, decimal_places=2)
+        )
+    ),
+    default=Value(0),
+    output_field=DecimalField(max_digits=3, decimal_places=2),
+)
+
+
+def _clave_resumen(id_usuario):
+    return f'calificaciones:resumen:{id_usuario}'
+
+
+def invalidar_resumen(*ids_usuarios):
+    """Descartar el resumen cacheado de los receptores indicados"""
+    cache.delete_many([_clave_resumen(id_usuario) for id_usuario in ids_usuarios])
+
+
+def resumen_calificaciones(usuario):
+    """
+    Total, promedio, histograma de estrellas y promedios por aspecto
+    de las calificaciones activas recibidas, en una sola consulta.
+
+    Returns:
+        dict: total, promedio, estrellas {1..5}, promedio_puntualidad,
+              promedio_calidad, promedio_comunicacion
+    """
+    from apps.jobs.models import Calificacion
+
+    clave = _clave_resumen(usuario.id_usuario)
+    resumen = cache.get(clave)
+    if resumen is not None:
+        return resumen
+
+    agregados = {
+        'total': Count('id_calificacion'),
+        'promedio': Avg('puntuacion'),
+        'promedio_puntualidad': Avg('puntualidad'),
+        'promedio_calidad': Avg('calidad_trabajo'),
+        'promedio_comunicacion': Avg('comunicacion'),
+    }
+    for estrella in range(1, 6):
+        agregados[f'estrellas_{estrella}'] = Count('id_calificacion', filter=Q(puntuacion=estrella))
+
+    fila = Calificacion.objects.filter(id_receptor=usuario, activa=True).aggregate(**agregados)
+
+    resumen = {
+        'total': fila['total'],
+        'promedio': round(fila['promedio'], 2) if fila['promedio'] else 0,
+        'estrellas': {estrella: fila[f'estrellas_{estrella}'] for estrella in range(1, 6)},
+    }
+    for campo in ('promedio_puntualidad', 'promedio_calidad', 'promedio_comunicacion'):
+        resumen[campo] = round(fila[campo], 1) if fila[campo] else None
+
+    cache.set(clave, resumen, RESUMEN_TTL)
+    return resumen
+
+
+def snapshot(calificacion):
+    """Valores de una calificación que afectan a los agregados"""
+    if calificacion is None:
+        return None
+    return {campo: getattr(calificacion, campo) for campo in CAMPOS_SNAPSHOT}
+
+
+def _aporte(datos):
+    """Contribución de una calificación a cada columna agregada"""
+    if not datos or not datos['activa']:
+        return {}
+    aporte = {
+        'total_calificaciones': 1,
+        'suma_calificaciones': datos['puntuacion'],
+        f"estrellas_{datos['puntuacion']}": 1,
+    }
+    for aspecto in ASPECTOS:
+        if datos[aspecto] is not None:
+            aporte[f'suma_{aspecto}'] = datos[aspecto]
+            aporte[f'total_{aspecto}'] = 1
+    return aporte
+
+
+def registrar_cambio_calificacion(id_receptor, antes=None, despues=None):
+    """
+    Aplicar a los agregados del receptor el cambio de una calificación.
+
+    Args:
+        id_receptor: id_usuario que recibe la calificación
+        antes: snapshot() previo al cambio (None si es nueva)
+        despues: snapshot() posterior al cambio (None si se eliminó)
+    """
+    deltas = _aporte(despues)
+    for campo, valor in _aporte(antes).items():
+        deltas[campo] = deltas.get(campo, 0) - valor
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        usuarios = Usuario.objects.filter(id_usuario=id_receptor)
+        usuarios.update(**{campo: F(campo) + valor for campo, valor in deltas.items()})
+        # El promedio y el puntaje se derivan de los contadores ya actualizados
+        usuarios.update(rating_promedio=PROMEDIO, score_confianza=SCORE_CONFIANZA)
+        transaction.on_commit(lambda: invalidar_resumen(id_receptor))
+
+
+def reconstruir_estadisticas(ids_usuarios=None):
+    """
+    Recalcular todos los agregados desde las calificaciones activas.
+
+    Returns:
+        int: usuarios con al menos una calificación activa
+    """
+    from apps.jobs.models import Calificacion
+
+    calificaciones = Calificacion.objects.filter(activa=True)
+    usuarios = Usuario.objects.all()
+    if ids_usuarios is not None:
+        calificaciones = calificaciones.filter(id_receptor__in=ids_usuarios)
+        usuarios = usuarios.filter(id_usuario__in=ids_usuarios)
+
+    agregados = {
+        'total_calificaciones': Count('id_calificacion'),
+        'suma_calificaciones': Sum('puntuacion'),
+    }
+    for estrella in range(1, 6):
+        agregados[f'estrellas_{estrella}'] = Count('id_calificacion', filter=Q(puntuacion=estrella))
+    for aspecto in ASPECTOS:
+        agregados[f'suma_{aspecto}'] = Sum(aspecto)
+        agregados[f'total_{aspecto}'] = Count(aspecto)
+
+    filas = calificaciones.values('id_receptor').annotate(**agregados).order_by()
+
+    with transaction.atomic():
+        usuarios.update(**{campo: 0 for campo in CAMPOS_AGREGADOS}, rating_promedio=0)
+        cambios = []
+        for fila in filas:
+            usuario = Usuario(id_usuario=fila.pop('id_receptor'))
+            for campo, valor in fila.items():
+                setattr(usuario, campo, valor or 0)
+            cambios.append(usuario)
+        Usuario.objects.bulk_update(cambios, CAMPOS_AGREGADOS, batch_size=1000)
+        usuarios.filter(total_calificaciones__gt=0).update(rating_promedio=PROMEDIO)
+        usuarios.update(score_confianza=SCORE_CONFIANZA)
+
+    ids = ids_usuarios if ids_usuarios is not None else usuarios.values_list('id_usuario', flat=True)
+    invalidar_resumen(*ids)
+    return len(cambios)
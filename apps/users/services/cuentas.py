@@ -0,0 +1,38 @@
+"""
+Creación de cuentas (auth.User) con username automático.
+
+Los usernames son `user<N>` / `empresa<N>`, con N tomado de un contador de la
+base (apps.core.utils.secuencias) en lugar de contar los usuarios existentes.
+Si N choca con un username antiguo se reintenta con el siguiente.
+"""
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from apps.core.utils import secuencias
+
+CONTADOR = 'username'
+REINTENTOS = 5
+
+
+def _inicial():
+    # Solo la primera vez: continúa después de los usernames generados con COUNT(*)
+    return (User.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0) + 1
+
+
+def siguiente_username(prefijo='user'):
+    return f'{prefijo}{secuencias.siguiente(CONTADOR, _inicial)}'
+
+
+def crear_user(prefijo='user', **datos):
+    """User.objects.create_user con un username libre"""
+    for _ in range(REINTENTOS):
+        username = siguiente_username(prefijo)
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(username=username, **datos)
+        except IntegrityError:
+            if not User.objects.filter(username=username).exists():
+                raise
+    raise IntegrityError(f'No se encontró un username libre tras {REINTENTOS} intentos')
@@ -0,0 +1,99 @@
+"""
+Directorio de usuarios: búsqueda por nombre sobre la columna normalizada.
+
+En PostgreSQL la columna tiene un índice trigram (pg_trgm), por lo que los
+filtros ``contains`` no recorren toda la tabla. Devuelve proyecciones ligeras
+(diccionarios) en lugar de instancias completas del modelo.
+"""
+
+from django.db.models import Case, When, Value, IntegerField, F
+
+from apps.core.utils.formatters import normalizar_texto
+from apps.users.models import Usuario
+from apps.users.services import miniaturas
+
+USUARIOS_POR_PAGINA = 30
+
+CAMPOS_DIRECTORIO = (
+    'id_usuario', 'username', 'nombres', 'apellidos', 'tipo_usuario',
+    'rating_promedio', 'total_calificaciones', 'estado_verificacion',
+)
+
+
+def _foto_url(nombre_archivo):
+    return miniaturas.url(nombre_archivo, 'chico')
+
+
+def buscar_directorio(termino='', pagina=1, por_pagina=USUARIOS_POR_PAGINA,
+                      excluir_id=None, tipo=None, solo_habilitados=False,
+                      prioridad_ids=None, orden=None, anotaciones=None):
+    """
+    Buscar usuarios por nombre, apellido o username.
+
+    Args:
+        termino: texto libre; cada palabra debe aparecer en el nombre normalizado
+        pagina: número de página (desde 1)
+        excluir_id: id_usuario a omitir (normalmente el usuario actual)
+        tipo: filtra por tipo_usuario
+        solo_habilitados: omite usuarios deshabilitados o eliminados
+        prioridad_ids: ids que se listan primero (p.ej. con conversación abierta)
+        orden: campos o expresiones de orden adicionales antes del nombre
+        anotaciones: expresiones a anotar para usarlas en `orden` (p.ej. un Subquery)
+
+    Returns:
+        dict: {'resultados': [dict], 'pagina': int, 'hay_anterior': bool, 'hay_siguiente': bool}
+    """
+    try:
+        pagina = max(int(pagina or 1), 1)
+    except (TypeError, ValueError):
+        pagina = 1
+    usuarios = Usuario.objects.all()
+
+    if excluir_id is not None:
+        usuarios = usuarios.exclude(id_usuario=excluir_id)
+    if solo_habilitados:
+        usuarios = usuarios.filter(habilitado=True, deleted_at__isnull=True)
+    if tipo:
+        usuarios = usuarios.filter(tipo_usuario=tipo)
+
+    for palabra in normalizar_texto(termino).split():
+        usuarios = usuarios.filter(nombre_normalizado__contains=palabra)
+
+    if anotaciones:
+        usuarios = usuarios.annotate(**anotaciones)
+
+    orden_final = []
+    if prioridad_ids:
+        usuarios = usuarios.annotate(prioridad=Case(
+            When(id_usuario__in=prioridad_ids, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+        orden_final.append('prioridad')
+    orden_final.extend(orden or [])
+    orden_final.extend(['nombre_normalizado', 'id_usuario'])
+
+    # La foto se trae en la misma consulta (LEFT JOIN con profile)
+    inicio = (pagina - 1) * por_pagina
+    filas = list(
+        usuarios.order_by(*orden_final)
+        .values(*CAMPOS_DIRECTORIO, foto=F('profile__foto_url'))[inicio:inicio + por_pagina + 1]
+    )
+
+    hay_siguiente = len(filas) > por_pagina
+    resultados = filas[:por_pagina]
+    for fila in resultados:
+        fila['foto_url'] = _foto_url(fila.pop('foto'))
+        fila.pop('prioridad', None)
+        fila['nombre_completo'] = (
+            f"{fila['nombres']} {fila['apellidos']}"
+            if fila['nombres'] and fila['apellidos'] else fila['username']
+        )
+
+    return {
+        'resultados': resultados,
+        'pagina': pagina,
+        'hay_anterior': pagina > 1,
+        'hay_siguiente': hay_siguiente,
+    }
+
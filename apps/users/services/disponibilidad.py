@@ -0,0 +1,163 @@
+"""
+Búsqueda de trabajadores libres en un horario.
+
+Los horarios de Disponibilidad se guardan como intervalos [inicio, fin) en
+minutos de la semana (ver Disponibilidad.minutos_semana), así "libre el martes
+14:00-18:00" es una consulta de rango sobre el índice (activa, minuto_inicio,
+minuto_fin). Para el camino caliente (búsqueda de trabajadores) se mantiene
+además un árbol de intervalos en memoria, reconstruido solo cuando cambia la
+versión guardada en la caché compartida.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from apps.users.models import Disponibilidad
+
+CLAVE_VERSION = 'disponibilidad:version'
+ARBOL_MAX_HORARIOS = getattr(settings, 'DISPONIBILIDAD_ARBOL_MAX', 200000)
+
+
+def rango_consulta(dia_semana, hora_inicio, hora_fin):
+    return Disponibilidad.minutos_semana(dia_semana, hora_inicio, hora_fin)
+
+
+def _condicion(inicio, fin, cubre):
+    """Q para un intervalo de consulta, también desplazado una semana (horarios sábado->domingo)"""
+    condicion = Q()
+    for desplazamiento in (0, Disponibilidad.MINUTOS_SEMANA):
+        a, b = inicio + desplazamiento, fin + desplazamiento
+        if cubre:
+            condicion |= Q(minuto_inicio__lte=a, minuto_fin__gte=b)
+        else:
+            condicion |= Q(minuto_inicio__lt=b, minuto_fin__gt=a)
+    return condicion
+
+
+def disponibles_sql(dia_semana, hora_inicio, hora_fin, cubre=True):
+    """
+    Ids de trabajadores libres en el horario, resuelto en SQL.
+
+    Args:
+        cubre: True exige que un horario cubra todo el rango;
+               False basta con que se solape
+
+    Returns:
+        QuerySet de id_trabajador (sirve como subconsulta)
+    """
+    inicio, fin = rango_consulta(dia_semana, hora_inicio, hora_fin)
+    return Disponibilidad.objects.filter(
+        _condicion(inicio, fin, cubre), activa=True
+    ).values('id_trabajador').distinct()
+
+
+# ==================== ÁRBOL DE INTERVALOS ====================
+
+class ArbolIntervalos:
+    """
+    Árbol de intervalos centrado e inmutable.
+    Cada nodo guarda los intervalos que contienen su centro, ordenados por
+    inicio y por fin, para responder solapamientos en O(log n + k).
+    """
+
+    __slots__ = ('centro', 'por_inicio', 'por_fin', 'izquierdo', 'derecho')
+
+    def __init__(self, intervalos):
+        puntos = sorted(p for inicio, fin, _ in intervalos for p in (inicio, fin))
+        self.centro = puntos[(len(puntos) - 1) // 2]
+        izquierda, derecha, aqui = [], [], []
+        for intervalo in intervalos:
+            if intervalo[1] <= self.centro:
+                izquierda.append(intervalo)
+            elif intervalo[0] > self.centro:
+                derecha.append(intervalo)
+            else:
+                aqui.append(intervalo)
+        self.por_inicio = sorted(aqui, key=lambda i: i[0])
+        self.por_fin = sorted(aqui, key=lambda i: i[1], reverse=True)
+        self.izquierdo = ArbolIntervalos(izquierda) if izquierda else None
+        self.derecho = ArbolIntervalos(derecha) if derecha else None
+
+    def solapados(self, inicio, fin, resultado):
+        """Agrega a `resultado` los intervalos que se solapan con [inicio, fin)"""
+        nodo = self
+        pendientes = []
+        while nodo is not None:
+            if fin <= nodo.centro:
+                # Solo pueden solaparse los que empiezan antes de fin
+                for intervalo in nodo.por_inicio:
+                    if intervalo[0] >= fin:
+                        break
+                    resultado.append(intervalo)
+                siguiente = nodo.izquierdo
+            elif inicio > nodo.centro:
+                # Solo pueden solaparse los que terminan después de inicio
+                for intervalo in nodo.por_fin:
+                    if intervalo[1] <= inicio:
+                        break
+                    resultado.append(intervalo)
+                siguiente = nodo.derecho
+            else:
+                # El rango contiene el centro: todos los del nodo se solapan
+                resultado.extend(nodo.por_inicio)
+                if nodo.derecho is not None:
+                    pendientes.append(nodo.derecho)
+                siguiente = nodo.izquierdo
+            nodo = siguiente if siguiente is not None else (pendientes.pop() if pendientes else None)
+        return resultado
+
+
+_arbol_local = {'version': None, 'arbol': None, 'vacio': False}
+
+
+def _version():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = 1
+        cache.add(CLAVE_VERSION, version, None)
+    return version
+
+
+def invalidar_arbol():
+    """Invalida la copia en memoria de todos los procesos"""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 2, None)
+
+
+def arbol_disponibilidad():
+    """Árbol de horarios activos del proceso; None si no hay horarios o son demasiados"""
+    version = _version()
+    if _arbol_local['version'] != version:
+        intervalos = list(
+            Disponibilidad.objects.filter(activa=True)
+            .values_list('minuto_inicio', 'minuto_fin', 'id_trabajador')[:ARBOL_MAX_HORARIOS + 1]
+        )
+        arbol = None
+        if intervalos and len(intervalos) <= ARBOL_MAX_HORARIOS:
+            arbol = ArbolIntervalos(intervalos)
+        _arbol_local.update(version=version, arbol=arbol, vacio=not intervalos)
+    return _arbol_local['arbol']
+
+
+def disponibles(dia_semana, hora_inicio, hora_fin, cubre=True):
+    """
+    Ids ordenados de trabajadores libres en el horario.
+    Usa el árbol en memoria y, si no está disponible, la consulta SQL.
+    """
+    inicio, fin = rango_consulta(dia_semana, hora_inicio, hora_fin)
+    arbol = arbol_disponibilidad()
+    if arbol is None:
+        if _arbol_local['vacio']:
+            return []
+        return sorted(disponibles_sql(dia_semana, hora_inicio, hora_fin, cubre).values_list('id_trabajador', flat=True))
+
+    encontrados = []
+    for desplazamiento in (0, Disponibilidad.MINUTOS_SEMANA):
+        a, b = inicio + desplazamiento, fin + desplazamiento
+        for intervalo in arbol.solapados(a, b, []):
+            if not cubre or (intervalo[0] <= a and intervalo[1] >= b):
+                encontrados.append(intervalo[2])
+    return sorted(set(encontrados))
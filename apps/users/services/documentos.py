@@ -0,0 +1,331 @@
+"""
+Consulta de DNI (RENIEC) y RUC (SUNAT).
+
+Un único cliente para toda la aplicación:
+- requests.Session compartida (conexiones HTTPS reutilizadas)
+- caché por número de documento; los "no encontrado" duran menos
+- circuito que deja de llamar al proveedor tras varias fallas seguidas
+
+Las variantes async (aconsultar_dni / aconsultar_ruc) usan httpx y no
+ocupan un hilo mientras esperan al proveedor; las consultas simultáneas
+del mismo número comparten una sola llamada.
+
+El proveedor se elige con settings.DOCUMENTOS_BACKEND; en pruebas se usa
+StubBackend, que responde con datos locales.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from apps.core.utils.exceptions import (
+    APIConnectionException,
+    DocumentNotFoundException,
+    InvalidDNIException,
+    InvalidRUCException,
+    ServiceUnavailableException,
+)
+
+logger = logging.getLogger(__name__)
+
+CLAVE_FALLAS = 'documentos:fallas'
+CLAVE_ABIERTO = 'documentos:abierto'
+NO_ENCONTRADO = {'no_encontrado': True}
+
+
+# ==================== PROVEEDORES ====================
+
+_sesion = None
+_sesion_lock = threading.Lock()
+
+
+def sesion():
+    """Session HTTP compartida por el proceso"""
+    global _sesion
+    if _sesion is None:
+        with _sesion_lock:
+            if _sesion is None:
+                nueva = requests.Session()
+                nueva.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+                nueva.headers.update({'Accept': 'application/json'})
+                _sesion = nueva
+    return _sesion
+
+
+# Un AsyncClient por event loop (sus conexiones no se pueden compartir entre loops)
+_clientes_async = weakref.WeakKeyDictionary()
+
+
+def cliente_async():
+    """httpx.AsyncClient compartido dentro del event loop actual"""
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None or cliente.is_closed:
+        connect, read = settings.DOCUMENTOS_TIMEOUT
+        cliente = httpx.AsyncClient(
+            headers={'Accept': 'application/json'},
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        _clientes_async[loop] = cliente
+    return cliente
+
+
+class ApiPeruBackend:
+    """apis.net.pe (v2)"""
+
+    def _get(self, recurso, numero):
+        try:
+            response = sesion().get(
+                f'{settings.APIPERU_URL}/{recurso}',
+                params={'numero': numero},
+                headers={'Authorization': f'Bearer {settings.APIPERU_TOKEN}'},
+                timeout=settings.DOCUMENTOS_TIMEOUT,
+            )
+        except requests.exceptions.Timeout as e:
+            raise APIConnectionException('Tiempo de espera agotado') from e
+        except requests.exceptions.RequestException as e:
+            raise APIConnectionException(f'Error de conexión: {e}') from e
+        return self._leer(response)
+
+    async def _aget(self, recurso, numero):
+        try:
+            response = await cliente_async().get(
+                f'{settings.APIPERU_URL}/{recurso}',
+                params={'numero': numero},
+                headers={'Authorization': f'Bearer {settings.APIPERU_TOKEN}'},
+            )
+        except httpx.TimeoutException as e:
+            raise APIConnectionException('Tiempo de espera agotado') from e
+        except httpx.HTTPError as e:
+            raise APIConnectionException(f'Error de conexión: {e}') from e
+        return self._leer(response)
+
+    def _leer(self, response):
+        if response.status_code == 404:
+            return None
+        if response.status_code == 401:
+            raise APIConnectionException('Token de API inválido. Contacta al administrador.')
+        if response.status_code != 200:
+            raise APIConnectionException(f'Error del proveedor (Código: {response.status_code})')
+        return response.json()
+
+    def consultar_dni(self, dni):
+        return self._dni(self._get('reniec/dni', dni), dni)
+
+    async def aconsultar_dni(self, dni):
+        return self._dni(await self._aget('reniec/dni', dni), dni)
+
+    def _dni(self, data, dni):
+        if data is None:
+            return None
+        return {
+            'dni': data.get('numeroDocumento', dni),
+            'nombres': data.get('nombres', ''),
+            'apellido_paterno': data.get('apellidoPaterno', ''),
+            'apellido_materno': data.get('apellidoMaterno', ''),
+        }
+
+    def consultar_ruc(self, ruc):
+        return self._ruc(self._get('sunat/ruc', ruc), ruc)
+
+    async def aconsultar_ruc(self, ruc):
+        return self._ruc(await self._aget('sunat/ruc', ruc), ruc)
+
+    def _ruc(self, data, ruc):
+        if data is None:
+            return None
+        return {
+            'ruc': data.get('numeroDocumento', ruc),
+            'razon_social': data.get('razonSocial', ''),
+            'nombre_comercial': data.get('nombreComercial', ''),
+            'direccion': data.get('direccion', ''),
+            'estado': data.get('estado', ''),
+            'condicion': data.get('condicion', ''),
+            'departamento': data.get('departamento', ''),
+            'provincia': data.get('provincia', ''),
+            'distrito': data.get('distrito', ''),
+        }
+
+
+class StubBackend:
+    """Datos ficticios para desarrollo y pruebas (sin red)"""
+
+    DNIS = {
+        '72768256': {'nombres': 'JUAN CARLOS', 'apellido_paterno': 'PEREZ', 'apellido_materno': 'GARCIA'},
+        '12345678': {'nombres': 'MARIA', 'apellido_paterno': 'LOPEZ', 'apellido_materno': 'TORRES'},
+    }
+    RUCS = {
+        '20123456789': {'razon_social': 'EMPRESA DE PRUEBA S.A.C.', 'estado': 'ACTIVO', 'condicion': 'HABIDO'},
+    }
+
+    def consultar_dni(self, dni):
+        data = self.DNIS.get(dni)
+        return {'dni': dni, **data} if data else None
+
+    def consultar_ruc(self, ruc):
+        data = self.RUCS.get(ruc)
+        return {'ruc': ruc, **data} if data else None
+
+    async def aconsultar_dni(self, dni):
+        return self.consultar_dni(dni)
+
+    async def aconsultar_ruc(self, ruc):
+        return self.consultar_ruc(ruc)
+
+
+def proveedor():
+    return import_string(settings.DOCUMENTOS_BACKEND)()
+
+
+# ==================== CIRCUITO ====================
+
+def circuito_abierto():
+    return cache.get(CLAVE_ABIERTO) is not None
+
+
+def _registrar_falla():
+    try:
+        fallas = cache.incr(CLAVE_FALLAS)
+    except ValueError:
+        cache.set(CLAVE_FALLAS, 1, settings.DOCUMENTOS_PAUSA * 4)
+        fallas = 1
+    if fallas >= settings.DOCUMENTOS_FALLAS_MAX:
+        cache.set(CLAVE_ABIERTO, 1, settings.DOCUMENTOS_PAUSA)
+        logger.warning('Consulta de documentos suspendida %ss tras %s fallas', settings.DOCUMENTOS_PAUSA, fallas)
+
+
+def _registrar_exito():
+    cache.delete_many([CLAVE_FALLAS, CLAVE_ABIERTO])
+
+
+async def _aregistrar_falla():
+    try:
+        fallas = await cache.aincr(CLAVE_FALLAS)
+    except ValueError:
+        await cache.aset(CLAVE_FALLAS, 1, settings.DOCUMENTOS_PAUSA * 4)
+        fallas = 1
+    if fallas >= settings.DOCUMENTOS_FALLAS_MAX:
+        await cache.aset(CLAVE_ABIERTO, 1, settings.DOCUMENTOS_PAUSA)
+        logger.warning('Consulta de documentos suspendida %ss tras %s fallas', settings.DOCUMENTOS_PAUSA, fallas)
+
+
+async def _aregistrar_exito():
+    await cache.adelete_many([CLAVE_FALLAS, CLAVE_ABIERTO])
+
+
+# ==================== CONSULTAS ====================
+
+def _consultar(tipo, numero):
+    clave = f'documentos:{tipo}:{numero}'
+    guardado = cache.get(clave)
+    if guardado is not None:
+        if guardado == NO_ENCONTRADO:
+            raise DocumentNotFoundException(numero)
+        return guardado
+
+    if circuito_abierto():
+        raise ServiceUnavailableException('Servicio de consulta no disponible, intenta en unos segundos')
+
+    try:
+        data = getattr(proveedor(), f'consultar_{tipo}')(numero)
+    except APIConnectionException as e:
+        logger.warning('Consulta %s %s falló: %s', tipo.upper(), numero, e)
+        _registrar_falla()
+        raise
+    _registrar_exito()
+
+    if data is None:
+        cache.set(clave, NO_ENCONTRADO, settings.DOCUMENTOS_CACHE_TTL_NO_ENCONTRADO)
+        raise DocumentNotFoundException(numero)
+    cache.set(clave, data, settings.DOCUMENTOS_CACHE_TTL)
+    return data
+
+
+def consultar_dni(dni):
+    """Datos de RENIEC para un DNI de 8 dígitos"""
+    dni = (dni or '').strip()
+    if len(dni) != 8 or not dni.isdigit():
+        raise InvalidDNIException('El DNI debe tener 8 dígitos numéricos')
+    data = dict(_consultar('dni', dni))
+    data['nombre_completo'] = f"{data['nombres']} {data['apellido_paterno']} {data['apellido_materno']}"
+    return data
+
+
+def consultar_ruc(ruc):
+    """Datos de SUNAT para un RUC de 11 dígitos"""
+    ruc = (ruc or '').strip()
+    if len(ruc) != 11 or not ruc.isdigit():
+        raise InvalidRUCException('El RUC debe tener 11 dígitos numéricos')
+    return dict(_consultar('ruc', ruc))
+
+
+# ==================== CONSULTAS ASYNC ====================
+
+# Consultas en curso por event loop: (tipo, numero) -> Future
+_en_vuelo = weakref.WeakKeyDictionary()
+
+
+async def _aconsultar_proveedor(tipo, numero):
+    clave = f'documentos:{tipo}:{numero}'
+    try:
+        data = await getattr(proveedor(), f'aconsultar_{tipo}')(numero)
+    except APIConnectionException as e:
+        logger.warning('Consulta %s %s falló: %s', tipo.upper(), numero, e)
+        await _aregistrar_falla()
+        raise
+    await _aregistrar_exito()
+
+    if data is None:
+        await cache.aset(clave, NO_ENCONTRADO, settings.DOCUMENTOS_CACHE_TTL_NO_ENCONTRADO)
+    else:
+        await cache.aset(clave, data, settings.DOCUMENTOS_CACHE_TTL)
+    return data
+
+
+async def _aconsultar(tipo, numero):
+    guardado = await cache.aget(f'documentos:{tipo}:{numero}')
+    if guardado is None:
+        if await cache.aget(CLAVE_ABIERTO) is not None:
+            raise ServiceUnavailableException('Servicio de consulta no disponible, intenta en unos segundos')
+
+        en_vuelo = _en_vuelo.setdefault(asyncio.get_running_loop(), {})
+        tarea = en_vuelo.get((tipo, numero))
+        if tarea is None:
+            tarea = asyncio.ensure_future(_aconsultar_proveedor(tipo, numero))
+            en_vuelo[(tipo, numero)] = tarea
+            tarea.add_done_callback(lambda _: en_vuelo.pop((tipo, numero), None))
+        # shield: si un cliente se desconecta no se cancela la consulta de los demás
+        guardado = await asyncio.shield(tarea)
+        if guardado is None:
+            guardado = NO_ENCONTRADO
+
+    if guardado == NO_ENCONTRADO:
+        raise DocumentNotFoundException(numero)
+    return guardado
+
+
+async def aconsultar_dni(dni):
+    """Versión async de consultar_dni"""
+    dni = (dni or '').strip()
+    if len(dni) != 8 or not dni.isdigit():
+        raise InvalidDNIException('El DNI debe tener 8 dígitos numéricos')
+    data = dict(await _aconsultar('dni', dni))
+    data['nombre_completo'] = f"{data['nombres']} {data['apellido_paterno']} {data['apellido_materno']}"
+    return data
+
+
+async def aconsultar_ruc(ruc):
+    """Versión async de consultar_ruc"""
+    ruc = (ruc or '').strip()
+    if len(ruc) != 11 or not ruc.isdigit():
+        raise InvalidRUCException('El RUC debe tener 11 dígitos numéricos')
+    return dict(await _aconsultar('ruc', ruc))
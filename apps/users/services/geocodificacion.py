@@ -0,0 +1,143 @@
+"""
+Geocodificación inversa: coordenadas -> comunidad, distrito, provincia y departamento.
+
+Las comunidades con latitud/longitud se cargan en un KD-tree en memoria de
+cada proceso la primera vez que se consulta. Los puntos se guardan como
+vectores unitarios 3D, así la distancia euclidiana ordena igual que la
+distancia sobre la esfera y no hay deformación cerca de los polos ni del
+antimeridiano. El árbol se reconstruye cuando cambia la versión de ubigeo
+(ver services.ubigeo.invalidar_ubigeo).
+"""
+
+import math
+import threading
+import time
+
+from apps.users.models import Comunidad
+from apps.users.services.ubigeo import version_ubigeo
+
+RADIO_TIERRA_KM = 6371.0088
+DISTANCIA_MAX_KM = 50
+# Segundos durante los que un proceso confía en la versión ya leída
+VERIFICAR_CADA = 5
+
+_estado = {'version': None, 'arbol': None, 'verificado': 0.0}
+_lock = threading.Lock()
+
+
+def _vector(latitud, longitud):
+    lat, lon = math.radians(latitud), math.radians(longitud)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _km(distancia2):
+    """Distancia euclidiana al cuadrado entre vectores unitarios -> km sobre la esfera"""
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(distancia2) / 2))
+
+
+class ArbolKD:
+    """
+    KD-tree implícito sobre listas: el nodo del tramo [lo, hi) es el punto
+    del medio, con los menores a la izquierda y los mayores a la derecha.
+    """
+
+    def __init__(self, puntos, datos):
+        orden = list(range(len(puntos)))
+        self.ejes = [0] * len(puntos)
+
+        pendientes = [(0, len(orden))]
+        while pendientes:
+            lo, hi = pendientes.pop()
+            if hi - lo <= 1:
+                continue
+            tramo = orden[lo:hi]
+            # Partir por el eje con más dispersión
+            eje = max(range(3), key=lambda e: max(puntos[i][e] for i in tramo) - min(puntos[i][e] for i in tramo))
+            tramo.sort(key=lambda i: puntos[i][eje])
+            orden[lo:hi] = tramo
+            medio = (lo + hi) // 2
+            self.ejes[medio] = eje
+            pendientes.extend([(lo, medio), (medio + 1, hi)])
+
+        self.puntos = [puntos[i] for i in orden]
+        self.datos = [datos[i] for i in orden]
+
+    def __len__(self):
+        return len(self.puntos)
+
+    def cercano(self, punto):
+        """(dato, distancia²) del punto más cercano, o (None, inf) si el árbol está vacío"""
+        mejor, mejor_d2 = -1, math.inf
+        pendientes = [(0, len(self.puntos), 0.0)]
+        while pendientes:
+            lo, hi, cota = pendientes.pop()
+            if lo >= hi or cota >= mejor_d2:
+                continue
+            medio = (lo + hi) // 2
+            p = self.puntos[medio]
+            d2 = (p[0] - punto[0]) ** 2 + (p[1] - punto[1]) ** 2 + (p[2] - punto[2]) ** 2
+            if d2 < mejor_d2:
+                mejor, mejor_d2 = medio, d2
+
+            diferencia = punto[self.ejes[medio]] - p[self.ejes[medio]]
+            izquierda, derecha = (lo, medio), (medio + 1, hi)
+            cerca, lejos = (izquierda, derecha) if diferencia < 0 else (derecha, izquierda)
+            # El lado lejano solo se visita si puede tener algo más cerca que lo ya encontrado
+            pendientes.append((*lejos, diferencia * diferencia))
+            pendientes.append((*cerca, 0.0))
+
+        return (self.datos[mejor] if mejor >= 0 else None), mejor_d2
+
+
+def _construir():
+    puntos, datos = [], []
+    filas = Comunidad.objects.filter(latitud__isnull=False, longitud__isnull=False).values_list(
+        'id_comunidad', 'nombre', 'latitud', 'longitud', 'id_distrito',
+        'id_distrito__id_provincia', 'id_distrito__id_provincia__id_departamento',
+    )
+    for id_comunidad, nombre, latitud, longitud, id_distrito, id_provincia, id_departamento in filas.iterator(2000):
+        puntos.append(_vector(float(latitud), float(longitud)))
+        datos.append((id_comunidad, nombre, id_distrito, id_provincia, id_departamento))
+    return ArbolKD(puntos, datos)
+
+
+def arbol():
+    """KD-tree de la versión de ubigeo vigente (se construye una vez por proceso y versión)"""
+    ahora = time.monotonic()
+    if _estado['arbol'] is not None and ahora - _estado['verificado'] < VERIFICAR_CADA:
+        return _estado['arbol']
+
+    version = version_ubigeo()
+    if _estado['version'] != version or _estado['arbol'] is None:
+        with _lock:
+            if _estado['version'] != version or _estado['arbol'] is None:
+                _estado['arbol'] = _construir()
+                _estado['version'] = version
+    _estado['verificado'] = ahora
+    return _estado['arbol']
+
+
+def ubicacion_cercana(latitud, longitud, max_km=DISTANCIA_MAX_KM):
+    """
+    Comunidad más cercana a las coordenadas con su distrito, provincia y
+    departamento, o None si no hay ninguna a menos de `max_km`.
+    """
+    if not (-90 <= latitud <= 90 and -180 <= longitud <= 180):
+        raise ValueError('Coordenadas fuera de rango')
+
+    dato, distancia2 = arbol().cercano(_vector(latitud, longitud))
+    if dato is None:
+        return None
+    distancia_km = _km(distancia2)
+    if distancia_km > max_km:
+        return None
+
+    id_comunidad, nombre, id_distrito, id_provincia, id_departamento = dato
+    return {
+        'id_departamento': id_departamento,
+        'id_provincia': id_provincia,
+        'id_distrito': id_distrito,
+        'id_comunidad': id_comunidad,
+        'comunidad': nombre,
+        'distancia_km': round(distancia_km, 2),
+    }
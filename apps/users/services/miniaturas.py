@@ -0,0 +1,147 @@
+"""
+Miniaturas de las imágenes subidas (fotos de perfil y de ofertas).
+
+Cada imagen se reduce a los tamaños de MINIATURAS_TAMANOS y se guarda en WebP
+y JPEG como miniaturas/<tamaño>/<ruta original>.<webp|jpg> (la ruta original
+conserva su extensión). La generación corre en la cola de tareas
+(apps.users.tareas.generar_miniaturas): se encola al subir la imagen (ver
+signals.py) o la primera vez que una plantilla la pide. Mientras no estén
+listas se sirve la imagen original.
+
+Que las miniaturas existen se recuerda en la caché, para no consultar el
+storage en cada request.
+"""
+
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# extensión: formato de Pillow
+FORMATOS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+LISTA = 'lista'
+INVALIDA = 'invalida'
+
+
+def _nombre(archivo):
+    """FieldFile, ruta en el storage o None -> ruta en el storage"""
+    return getattr(archivo, 'name', archivo) or None
+
+
+def _externa(nombre):
+    """Las fotos de ofertas pueden ser URLs en lugar de archivos subidos"""
+    return '://' in nombre or nombre.startswith('/')
+
+
+def _clave(nombre):
+    return f'miniaturas:{hashlib.sha1(nombre.encode()).hexdigest()}'
+
+
+def ruta(nombre, tamano, formato='jpg'):
+    # Con la extensión original: a.png y a.jpg son subidas distintas
+    return f'miniaturas/{tamano}/{nombre}.{formato}'
+
+
+def estado(nombre):
+    """LISTA, INVALIDA (no es una imagen) o None si aún no se generaron"""
+    return cache.get(_clave(nombre))
+
+
+def solicitar(nombre):
+    """Encola la generación (una sola vez aunque se pida varias veces)"""
+    from apps.users.tareas import generar_miniaturas
+
+    if _externa(nombre):
+        return
+    if estado(nombre) is None and cache.add(f'{_clave(nombre)}:generando', 1, settings.MINIATURAS_GENERANDO_TTL):
+        generar_miniaturas.encolar(nombre)
+
+
+def urls(archivo, tamano):
+    """
+    {'webp': url, 'jpg': url} de la miniatura, o {'original': url} mientras
+    no exista (y en ese caso se encola). None si no hay imagen.
+    """
+    nombre = _nombre(archivo)
+    if not nombre:
+        return None
+    if _externa(nombre):
+        return {'original': nombre}
+    actual = estado(nombre)
+    if actual == LISTA:
+        return {formato: default_storage.url(ruta(nombre, tamano, formato)) for formato in FORMATOS}
+    if actual is None:
+        solicitar(nombre)
+    return {'original': default_storage.url(nombre)}
+
+
+def url(archivo, tamano, formato='jpg'):
+    """URL de un solo formato (JPEG por defecto, lo entiende cualquier navegador)"""
+    opciones = urls(archivo, tamano)
+    if opciones is None:
+        return None
+    return opciones.get(formato, opciones.get('original'))
+
+
+def _preparar(imagen, formato):
+    from PIL import Image
+
+    if formato == 'JPEG':
+        # JPEG no tiene transparencia: fondo blanco
+        if imagen.mode in ('RGBA', 'LA', 'P'):
+            imagen = imagen.convert('RGBA')
+            fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+            fondo.paste(imagen, mask=imagen.getchannel('A'))
+            return fondo
+        return imagen.convert('RGB')
+    return imagen if imagen.mode in ('RGB', 'RGBA') else imagen.convert('RGBA')
+
+
+def generar(nombre):
+    """Crea las miniaturas que falten de `nombre`; devuelve cuántos archivos escribió"""
+    from PIL import Image, ImageOps
+
+    tamanos = sorted(settings.MINIATURAS_TAMANOS.items(), key=lambda t: t[1], reverse=True)
+    try:
+        pendientes = {
+            (tamano, formato)
+            for tamano, _ in tamanos for formato in FORMATOS
+            if not default_storage.exists(ruta(nombre, tamano, formato))
+        }
+        if pendientes:
+            try:
+                with default_storage.open(nombre, 'rb') as archivo:
+                    imagen = Image.open(archivo)
+                    # Los JPEG grandes se decodifican ya reducidos
+                    imagen.draft('RGB', (tamanos[0][1], tamanos[0][1]))
+                    imagen = ImageOps.exif_transpose(imagen)
+                    imagen.load()
+            except (OSError, ValueError, Image.DecompressionBombError):
+                # Archivo ausente, truncado ("image file is truncated") o que no es
+                # una imagen: reintentar solo vuelve a fallar y a encolar la tarea
+                cache.set(_clave(nombre), INVALIDA, settings.MINIATURAS_CACHE_TTL)
+                return 0
+
+            # De mayor a menor, cada tamaño se reduce desde el anterior
+            for tamano, lado in tamanos:
+                imagen = imagen.copy()
+                imagen.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+                for formato, formato_pil in FORMATOS.items():
+                    if (tamano, formato) not in pendientes:
+                        continue
+                    contenido = BytesIO()
+                    _preparar(imagen, formato_pil).save(
+                        contenido, formato_pil, quality=settings.MINIATURAS_CALIDAD, optimize=True
+                    )
+                    destino = ruta(nombre, tamano, formato)
+                    if default_storage.exists(destino):
+                        default_storage.delete(destino)
+                    default_storage.save(destino, ContentFile(contenido.getvalue()))
+
+        cache.set(_clave(nombre), LISTA, settings.MINIATURAS_CACHE_TTL)
+        return len(pendientes)
+    finally:
+        cache.delete(f'{_clave(nombre)}:generando')
@@ -0,0 +1,274 @@
+"""
+OCR de certificaciones y documentos de verificación (EasyOCR).
+
+Los archivos subidos no se procesan en la petición: se encolan como
+TrabajoOCR y el comando `procesar_ocr` los reparte en un pool de procesos.
+Cada proceso carga el modelo de EasyOCR una sola vez (lector()).
+
+Los resultados se guardan en ResultadoOCR por SHA-256 del contenido: un
+archivo ya leído (p.ej. el mismo DNI subido otra vez) no vuelve a pasar
+por el OCR.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from tempfile import NamedTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.core.utils import colas
+from apps.users.models import Certificacion, ResultadoOCR, TrabajoOCR, Verificacion
+
+_lector = None
+_lector_lock = threading.Lock()
+
+
+# ==================== LECTOR ====================
+
+def lector(idiomas=None):
+    """Reader de EasyOCR compartido por el proceso (se crea en el primer uso)"""
+    global _lector
+    if _lector is None:
+        with _lector_lock:
+            if _lector is None:
+                import easyocr
+                _lector = easyocr.Reader(idiomas or settings.OCR_IDIOMAS, gpu=False)
+    return _lector
+
+
+def iniciar_proceso(idiomas):
+    """Initializer del pool: carga el modelo antes de recibir trabajos"""
+    lector(idiomas)
+
+
+def extraer_texto(ruta):
+    """Texto de una imagen o PDF en disco. Soporta: PDF, JPG, PNG, JPEG."""
+    if os.path.splitext(ruta)[1].lower() == '.pdf':
+        return " ".join(texto for texto in paginas_pdf(ruta) if texto)
+    return " ".join(linea[1] for linea in lector().readtext(ruta))
+
+
+# ==================== PDF ====================
+
+def paginas_pdf(ruta):
+    """
+    Genera el texto de cada página, de una en una.
+
+    Las páginas con capa de texto se leen con PyPDF2 sin OCR; el resto se
+    rasteriza individualmente, así en memoria hay como máximo una página.
+    """
+    from PyPDF2 import PdfReader
+    from PyPDF2.errors import PyPdfError
+
+    try:
+        paginas = PdfReader(ruta).pages
+        total = len(paginas)
+    except (PyPdfError, ValueError, OSError):
+        # PDF que PyPDF2 no entiende: se rasterizan todas las páginas
+        from pdf2image import pdfinfo_from_path
+        paginas = None
+        total = pdfinfo_from_path(ruta)['Pages']
+
+    for numero in range(1, total + 1):
+        pagina = paginas[numero - 1] if paginas is not None else None
+        texto = _texto_embebido(pagina)
+        if len(texto) >= settings.OCR_PDF_MIN_TEXTO:
+            yield texto
+        else:
+            yield _ocr_pagina(ruta, numero, _dpi_pagina(pagina))
+
+
+def _texto_embebido(pagina):
+    if pagina is None:
+        return ''
+    try:
+        return (pagina.extract_text() or '').strip()
+    except Exception:
+        return ''
+
+
+def _dpi_pagina(pagina):
+    """DPI para que el lado mayor de la página mida ~OCR_PDF_LADO_PX píxeles"""
+    dpi_min, dpi_max = settings.OCR_PDF_DPI
+    if pagina is None:
+        return dpi_min
+    try:
+        pulgadas = max(float(pagina.mediabox.width), float(pagina.mediabox.height)) / 72
+    except (TypeError, ValueError):
+        return dpi_min
+    if pulgadas <= 0:
+        return dpi_min
+    return int(min(dpi_max, max(dpi_min, settings.OCR_PDF_LADO_PX / pulgadas)))
+
+
+def _ocr_pagina(ruta, numero, dpi):
+    import numpy as np
+    from pdf2image import convert_from_path
+
+    imagen, = convert_from_path(ruta, dpi=dpi, first_page=numero, last_page=numero, grayscale=True)
+    try:
+        # EasyOCR acepta el arreglo directamente: sin JPEG temporal
+        return " ".join(linea[1] for linea in lector().readtext(np.asarray(imagen)))
+    finally:
+        imagen.close()
+
+
+# ==================== ARCHIVOS ====================
+
+@contextmanager
+def ruta_local(archivo):
+    """Ruta en disco de un archivo de default_storage (copia temporal si es remoto)"""
+    try:
+        ruta = default_storage.path(archivo)
+    except NotImplementedError:
+        ruta = None
+    if ruta is not None:
+        yield ruta
+        return
+
+    with NamedTemporaryFile(delete=False, suffix=os.path.splitext(archivo)[1]) as temporal:
+        with default_storage.open(archivo, 'rb') as origen:
+            shutil.copyfileobj(origen, temporal)
+    try:
+        yield temporal.name
+    finally:
+        os.remove(temporal.name)
+
+
+# ==================== RESULTADOS ====================
+
+class ArchivoConHash(File):
+    """Envuelve un archivo subido y calcula su SHA-256 mientras se leen los chunks"""
+
+    def __init__(self, archivo):
+        super().__init__(archivo, name=archivo.name)
+        self._hash = hashlib.sha256()
+        self._leidos = 0
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self._hash.update(chunk)
+            self._leidos += len(chunk)
+            yield chunk
+
+    @property
+    def sha256(self):
+        if self._leidos < self.size:
+            # El storage no leyó por chunks(): se recorre el archivo una vez más
+            self._hash, self._leidos = hashlib.sha256(), 0
+            self.file.seek(0)
+            for _ in self.chunks():
+                pass
+        return self._hash.hexdigest()
+
+
+def resultado_de(sha256):
+    return ResultadoOCR.objects.filter(sha256=sha256).first()
+
+
+def guardar_resultado(sha256, texto):
+    resultado, _ = ResultadoOCR.objects.get_or_create(sha256=sha256, defaults={'texto': texto})
+    return resultado
+
+
+# ==================== COLA ====================
+
+def guardar_archivo(carpeta, archivo):
+    """Guarda un archivo subido; devuelve (ruta en default_storage, sha256)"""
+    contenido = ArchivoConHash(archivo)
+    ruta = default_storage.save(f'{carpeta}/{archivo.name}', contenido)
+    return ruta, contenido.sha256
+
+
+def encolar(usuario, archivo, sha256, certificacion=None, verificacion=None):
+    return TrabajoOCR.objects.create(
+        id_usuario=usuario,
+        archivo=archivo,
+        sha256=sha256,
+        id_certificacion=certificacion,
+        id_verificacion=verificacion,
+    )
+
+
+def leer_documento(usuario, archivo, sha256, certificacion=None, verificacion=None):
+    """
+    Asocia el texto del archivo a la certificación/verificación.
+    Devuelve (resultado, None) si ya se conocía o (None, trabajo) si se encoló.
+    """
+    resultado = resultado_de(sha256)
+    if resultado is None:
+        return None, encolar(usuario, archivo, sha256, certificacion, verificacion)
+
+    if certificacion is not None:
+        Certificacion.objects.filter(id=certificacion.id).update(id_resultado_ocr=resultado)
+    if verificacion is not None:
+        Verificacion.objects.filter(id_verificacion=verificacion.id_verificacion).update(id_resultado_ocr=resultado)
+    return resultado, None
+
+
+def reclamar(limite):
+    """
+    Marca como 'procesando' hasta `limite` trabajos y los devuelve,
+    respetando OCR_MAX_CONCURRENTES entre todos los workers.
+    """
+    ahora = timezone.now()
+    vencido = ahora - timedelta(seconds=settings.OCR_TIEMPO_MAX)
+    # Contar y reclamar dentro del mismo bloqueo: si no, varios workers leen
+    # el mismo número de ocupados y juntos superan el tope
+    with colas.exclusivo('ocr'):
+        # Los 'procesando' vencidos son de un worker que murió; si ya agotaron
+        # los intentos (p.ej. un PDF que tumba el proceso) no se reintentan más
+        TrabajoOCR.objects.filter(
+            estado='procesando', fecha_inicio__lt=vencido, intentos__gte=settings.OCR_REINTENTOS
+        ).update(estado='error', error='El worker se detuvo procesando el archivo', fecha_fin=ahora)
+
+        ocupados = TrabajoOCR.objects.filter(estado='procesando', fecha_inicio__gte=vencido).count()
+        limite = min(limite, settings.OCR_MAX_CONCURRENTES - ocupados)
+        if limite <= 0:
+            return []
+
+        disponibles = TrabajoOCR.objects.filter(
+            Q(estado='pendiente') | Q(estado='procesando', fecha_inicio__lt=vencido)
+        ).order_by('fecha_creacion')
+        ids = colas.reclamar(
+            disponibles, limite,
+            {'estado': 'procesando', 'fecha_inicio': ahora, 'intentos': F('intentos') + 1},
+        )
+    return list(TrabajoOCR.objects.filter(id__in=ids).order_by('fecha_creacion'))
+
+
+def completar(trabajo, texto):
+    """Guarda el resultado y completa también los pendientes con el mismo archivo"""
+    with transaction.atomic():
+        resultado = guardar_resultado(trabajo.sha256, texto)
+        trabajos = TrabajoOCR.objects.filter(
+            Q(id=trabajo.id) | Q(sha256=trabajo.sha256, estado='pendiente')
+        )
+        Certificacion.objects.filter(
+            id__in=trabajos.values('id_certificacion')
+        ).update(id_resultado_ocr=resultado)
+        Verificacion.objects.filter(
+            id_verificacion__in=trabajos.values('id_verificacion')
+        ).update(id_resultado_ocr=resultado)
+        trabajos.update(
+            estado='completado', id_resultado=resultado, error=None, fecha_fin=timezone.now()
+        )
+
+
+def fallar(trabajo, error):
+    """Devuelve el trabajo a la cola o lo marca como error si agotó los intentos"""
+    agotado = trabajo.intentos >= settings.OCR_REINTENTOS
+    TrabajoOCR.objects.filter(id=trabajo.id).update(
+        estado='error' if agotado else 'pendiente',
+        error=str(error),
+        fecha_fin=timezone.now() if agotado else None,
+    )
@@ -0,0 +1,130 @@
+"""
+Portafolio en PDF generado en segundo plano y guardado por contenido.
+
+El archivo se guarda como portafolios/<usuario>/<huella>.pdf, donde la
+huella es el SHA-256 de los datos que aparecen en el portafolio. Mientras los
+datos no cambien se sirve el mismo archivo; la caché apunta al último PDF y
+las señales de Usuario, Profile, Certificacion y TrabajosRealizados la
+invalidan. Si la generación falla no se reintenta con los mismos datos hasta
+PORTAFOLIO_ERROR_TTL.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from apps.users.models import Usuario, Profile, Certificacion, TrabajosRealizados
+
+CAMPOS_USUARIO = (
+    'nombres', 'apellidos', 'email', 'telefono', 'dni', 'direccion', 'tipo_usuario',
+    'estado_verificacion', 'rating_promedio', 'total_calificaciones', 'trabajos_completados',
+)
+# Columnas de auditoría que cambian sin cambiar el portafolio
+IGNORAR = {'updated_at', 'fecha_registro'}
+
+
+def _clave(usuario_id):
+    return f'portafolio:{usuario_id}'
+
+
+def _ruta(usuario_id, huella_):
+    return f'portafolios/{usuario_id}/{huella_}.pdf'
+
+
+def huella(usuario_id):
+    """SHA-256 de los datos que se muestran en el portafolio"""
+    datos = [
+        list(Usuario.objects.filter(id_usuario=usuario_id).values(*CAMPOS_USUARIO)),
+        list(Profile.objects.filter(id_usuario=usuario_id).values()),
+        list(Certificacion.objects.filter(id_usuario=usuario_id).order_by('id').values()),
+        list(TrabajosRealizados.objects.filter(id_usuario=usuario_id).order_by('id').values()),
+    ]
+    for filas in datos:
+        for fila in filas:
+            for campo in IGNORAR & fila.keys():
+                del fila[campo]
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def invalidar(usuario_id):
+    cache.delete_many([_clave(usuario_id), f'{_clave(usuario_id)}:error'])
+
+
+def fallo(usuario_id):
+    """True si la última generación con los datos actuales falló"""
+    fallida = cache.get(f'{_clave(usuario_id)}:error')
+    return fallida is not None and fallida == huella(usuario_id)
+
+
+def pdf_listo(usuario_id):
+    """Ruta del PDF vigente o None si hay que generarlo"""
+    ruta = cache.get(_clave(usuario_id))
+    if ruta is not None:
+        return ruta
+
+    ruta = _ruta(usuario_id, huella(usuario_id))
+    if default_storage.exists(ruta):
+        cache.set(_clave(usuario_id), ruta, settings.PORTAFOLIO_CACHE_TTL)
+        return ruta
+    return None
+
+
+def solicitar(usuario_id):
+    """Encola la generación (una sola vez aunque se pida varias veces)"""
+    from apps.users.tareas import generar_portafolio
+
+    if fallo(usuario_id):
+        return
+    if cache.add(f'{_clave(usuario_id)}:generando', 1, settings.PORTAFOLIO_GENERANDO_TTL):
+        generar_portafolio.encolar(usuario_id)
+
+
+def generar(usuario_id):
+    """Renderiza el PDF y lo guarda; devuelve su ruta"""
+    from io import BytesIO
+    from xhtml2pdf import pisa
+    from django.template.loader import get_template
+
+    huella_ = huella(usuario_id)
+    try:
+        ruta = _ruta(usuario_id, huella_)
+        if not default_storage.exists(ruta):
+            usuario_db = Usuario.objects.get(id_usuario=usuario_id)
+            html = get_template('users/profile/portafolio_pdf.html').render({
+                'usuario': usuario_db,
+                'profile': Profile.objects.filter(id_usuario=usuario_id).first(),
+                'certificaciones': Certificacion.objects.filter(id_usuario=usuario_id),
+                'trabajos': TrabajosRealizados.objects.filter(id_usuario=usuario_id),
+            })
+
+            pdf = BytesIO()
+            if pisa.CreatePDF(BytesIO(html.encode('utf-8')), dest=pdf).err:
+                raise RuntimeError('Error al generar PDF')
+            default_storage.save(ruta, ContentFile(pdf.getvalue()))
+            _borrar_anteriores(usuario_id, ruta)
+
+        cache.set(_clave(usuario_id), ruta, settings.PORTAFOLIO_CACHE_TTL)
+        cache.delete(f'{_clave(usuario_id)}:error')
+        return ruta
+    except Exception:
+        # No volver a encolar con los mismos datos hasta que expire (o cambien)
+        cache.set(f'{_clave(usuario_id)}:error', huella_, settings.PORTAFOLIO_ERROR_TTL)
+        raise
+    finally:
+        cache.delete(f'{_clave(usuario_id)}:generando')
+
+
+def _borrar_anteriores(usuario_id, vigente):
+    carpeta = f'portafolios/{usuario_id}'
+    try:
+        _, archivos = default_storage.listdir(carpeta)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for nombre in archivos:
+        ruta = f'{carpeta}/{nombre}'
+        if ruta != vigente:
+            default_storage.delete(ruta)
@@ -0,0 +1,43 @@
+"""
+Puntaje de confianza precalculado para ordenar trabajadores.
+
+score_confianza = promedio bayesiano de las calificaciones
+                  + bono por identidad verificada
+                  + bono por trabajos completados (con tope)
+
+El promedio bayesiano parte de PRIOR_MEDIA con el peso de PRIOR_PESO
+calificaciones, así un único 5 no supera a un 4.8 con cientos de reseñas.
+Se calcula en SQL para poder refrescarlo con un solo UPDATE.
+"""
+
+from django.conf import settings
+from django.db.models import Case, When, Value, F, FloatField
+from django.db.models.functions import Cast, Least
+
+from apps.users.models import Usuario
+
+PRIOR_MEDIA = getattr(settings, 'RANKING_PRIOR_MEDIA', 3.5)
+PRIOR_PESO = getattr(settings, 'RANKING_PRIOR_PESO', 5)
+BONO_VERIFICADO = 0.3
+BONO_TRABAJOS_MAX = 0.4
+TRABAJOS_TOPE = 50
+
+SCORE_CONFIANZA = (
+    (Value(PRIOR_MEDIA * PRIOR_PESO) + Cast('suma_calificaciones', FloatField()))
+    / (Value(float(PRIOR_PESO)) + Cast('total_calificaciones', FloatField()))
+    + Case(
+        When(estado_verificacion='verificado', then=Value(BONO_VERIFICADO)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    + Cast(Least(F('trabajos_completados'), Value(TRABAJOS_TOPE)), FloatField())
+    * Value(BONO_TRABAJOS_MAX / TRABAJOS_TOPE)
+)
+
+
+def refrescar_score(ids_usuarios=None):
+    """Recalcular score_confianza de los usuarios indicados (o de todos)"""
+    usuarios = Usuario.objects.all()
+    if ids_usuarios is not None:
+        usuarios = usuarios.filter(id_usuario__in=ids_usuarios)
+    return usuarios.update(score_confianza=SCORE_CONFIANZA)
@@ -0,0 +1,271 @@
+"""
+Árbol de ubicaciones (Departamento -> Provincia -> Distrito) precalculado.
+
+El árbol se arma una vez por versión y se sirve desde una copia inmutable en
+memoria de cada proceso. La versión es un token aleatorio en la caché
+compartida que se reemplaza cuando cambia cualquier tabla de ubigeo (ver
+signals.py); así todos los procesos reconstruyen su copia solo cuando hace
+falta. No es un contador: si la caché se vacía, la versión nueva nunca
+coincide con una anterior que un proceso aún tenga en memoria. El bundle JSON
+se guarda además comprimido con gzip y con un ETag fuerte (hash del
+contenido) para servirlo tal cual al navegador.
+Las comunidades, más numerosas, se resuelven por distrito bajo demanda.
+
+El mismo árbol alimenta los campos de formulario de ubigeo
+(core.utils.referencias): tablas() da cada nivel con el id del padre e
+indexado por id.
+"""
+
+import gzip
+import hashlib
+import json
+import uuid
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+
+from apps.users.models import Departamento, Provincia, Distrito, Comunidad
+
+CLAVE_VERSION = 'ubigeo:version'
+CACHE_BUNDLE_TTL = 60 * 60 * 24
+MAX_AGE_NIVEL = 60 * 60
+# nivel: (campo id, campo padre)
+NIVELES = {
+    'departamentos': ('id_departamento', None),
+    'provincias': ('id_provincia', 'id_departamento'),
+    'distritos': ('id_distrito', 'id_provincia'),
+}
+
+# Árbol de la versión vigente; se reemplaza entero (nunca se modifica) para
+# que los demás hilos vean la versión anterior completa o la nueva completa
+_local = MappingProxyType({'version': None})
+# (versión, {id_distrito: comunidades}) llenado bajo demanda
+_comunidades = (None, {})
+
+
+def _nueva_version():
+    return uuid.uuid4().hex[:16]
+
+
+def version_ubigeo():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        nueva = _nueva_version()
+        # Si otro proceso la creó primero, se usa la suya
+        version = nueva if cache.add(CLAVE_VERSION, nueva, None) else (cache.get(CLAVE_VERSION) or nueva)
+    return version
+
+
+def invalidar_ubigeo():
+    """Obliga a todos los procesos a reconstruir el árbol"""
+    cache.set(CLAVE_VERSION, _nueva_version(), None)
+
+
+def _construir_bundle(version):
+    departamentos = list(Departamento.objects.order_by('nombre').values_list('id_departamento', 'nombre'))
+    provincias = {}
+    for id_provincia, id_departamento, nombre in Provincia.objects.order_by('nombre').values_list(
+        'id_provincia', 'id_departamento', 'nombre'
+    ):
+        provincias.setdefault(str(id_departamento), []).append([id_provincia, nombre])
+    distritos = {}
+    for id_distrito, id_provincia, nombre in Distrito.objects.order_by('nombre').values_list(
+        'id_distrito', 'id_provincia', 'nombre'
+    ):
+        distritos.setdefault(str(id_provincia), []).append([id_distrito, nombre])
+
+    return {
+        'version': version,
+        'departamentos': [list(d) for d in departamentos],
+        'provincias': provincias,
+        'distritos': distritos,
+    }
+
+
+def _congelar(pares, campo_id):
+    return tuple(MappingProxyType({campo_id: id_, 'nombre': nombre}) for id_, nombre in pares)
+
+
+def _tabla(grupos, nivel):
+    """{id_padre: [[id, nombre], ...]} -> filas con el id del padre, ordenadas por nombre, e índice por id"""
+    campo_id, campo_padre = NIVELES[nivel]
+    filas = tuple(sorted(
+        (
+            MappingProxyType({campo_id: id_, campo_padre: padre, 'nombre': nombre})
+            for padre, pares in grupos.items() for id_, nombre in pares
+        ),
+        key=lambda fila: fila['nombre'],
+    ))
+    return MappingProxyType({
+        'filas': filas,
+        'por_id': MappingProxyType({fila[campo_id]: fila for fila in filas}),
+    })
+
+
+def _cargar():
+    """Copia en memoria del árbol para la versión vigente"""
+    global _local
+    version = version_ubigeo()
+    datos = _local
+    if datos['version'] == version:
+        return datos
+
+    clave_bundle = f'ubigeo:bundle:{version}'
+    comprimido = cache.get(clave_bundle)
+    if comprimido is None:
+        bundle = _construir_bundle(version)
+        contenido = json.dumps(bundle, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        comprimido = gzip.compress(contenido, compresslevel=9, mtime=0)
+        cache.set(clave_bundle, comprimido, CACHE_BUNDLE_TTL)
+    else:
+        contenido = gzip.decompress(comprimido)
+        bundle = json.loads(contenido)
+
+    departamentos_ = _congelar(bundle['departamentos'], 'id_departamento')
+    provincias = {int(k): v for k, v in bundle['provincias'].items()}
+    distritos = {int(k): v for k, v in bundle['distritos'].items()}
+    datos = MappingProxyType(dict(
+        version=version,
+        json=contenido,
+        gzip=comprimido,
+        etag=f'"{hashlib.sha256(contenido).hexdigest()[:32]}"',
+        departamentos=departamentos_,
+        provincias=MappingProxyType({k: _congelar(v, 'id_provincia') for k, v in provincias.items()}),
+        distritos=MappingProxyType({k: _congelar(v, 'id_distrito') for k, v in distritos.items()}),
+        tablas=MappingProxyType({
+            'departamentos': MappingProxyType({
+                'filas': departamentos_,
+                'por_id': MappingProxyType({fila['id_departamento']: fila for fila in departamentos_}),
+            }),
+            'provincias': _tabla(provincias, 'provincias'),
+            'distritos': _tabla(distritos, 'distritos'),
+        }),
+    ))
+    _local = datos
+    return datos
+
+
+def departamentos():
+    return _cargar()['departamentos']
+
+
+def provincias_de(id_departamento):
+    return _cargar()['provincias'].get(id_departamento, ())
+
+
+def distritos_de(id_provincia):
+    return _cargar()['distritos'].get(id_provincia, ())
+
+
+def hijos_de(nivel, id_padre):
+    """Provincias de un departamento o distritos de una provincia"""
+    return {'provincias': provincias_de, 'distritos': distritos_de}[nivel](id_padre)
+
+
+def tablas():
+    """{nivel: {'filas': ..., 'por_id': ...}} con el id del padre en cada fila"""
+    return _cargar()['tablas']
+
+
+def comunidades_de(id_distrito):
+    """Comunidades de un distrito; se consultan una vez por versión y distrito"""
+    global _comunidades
+    datos = _cargar()
+    version, por_distrito = _comunidades
+    if version != datos['version']:
+        por_distrito = {}
+        _comunidades = (datos['version'], por_distrito)
+
+    comunidades = por_distrito.get(id_distrito)
+    if comunidades is None:
+        clave = f"ubigeo:comunidades:{datos['version']}:{id_distrito}"
+        pares = cache.get(clave)
+        if pares is None:
+            pares = list(Comunidad.objects.filter(id_distrito=id_distrito).order_by('nombre').values_list(
+                'id_comunidad', 'nombre'
+            ))
+            cache.set(clave, pares, CACHE_BUNDLE_TTL)
+        comunidades = _congelar(pares, 'id_comunidad')
+        por_distrito[id_distrito] = comunidades
+    return comunidades
+
+
+# ==================== RESPUESTAS HTTP ====================
+
+def _no_modificado(request, etag):
+    return etag in [e.strip() for e in request.headers.get('If-None-Match', '').split(',')]
+
+
+def _acepta_gzip(request):
+    """Accept-Encoding incluye gzip (o *) con q > 0"""
+    calidades = {}
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        codificacion, *parametros = [p.strip() for p in parte.split(';')]
+        calidad = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip().lower() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        calidades[codificacion.lower()] = calidad
+    return calidades.get('gzip', calidades.get('*', 0.0)) > 0
+
+
+def respuesta_bundle(request):
+    """Bundle completo, precomprimido, con ETag fuerte (el navegador revalida con If-None-Match)"""
+    datos = _cargar()
+    etag = datos['etag']
+
+    if _no_modificado(request, etag):
+        response = HttpResponseNotModified()
+    elif _acepta_gzip(request):
+        response = HttpResponse(datos['gzip'], content_type='application/json; charset=utf-8')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(datos['json'], content_type='application/json; charset=utf-8')
+
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = f'public, max-age={MAX_AGE_NIVEL}'
+    return response
+
+
+def respuesta_nivel(request, filas):
+    """Lista de un nivel (provincias, distritos o comunidades) con validación por ETag"""
+    etag = f'"{_cargar()["etag"][1:17]}-{hashlib.sha256(request.get_full_path().encode()).hexdigest()[:8]}"'
+    if _no_modificado(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            json.dumps([dict(fila) for fila in filas], ensure_ascii=False),
+            content_type='application/json'
+        )
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={MAX_AGE_NIVEL}'
+    return response
+
+
+def _parametro_id(request, *nombres):
+    for nombre in nombres:
+        valor = request.GET.get(nombre)
+        if valor and valor.isdigit():
+            return int(valor)
+    return None
+
+
+def responder_provincias(request):
+    id_departamento = _parametro_id(request, 'id_departamento', 'departamento_id')
+    return respuesta_nivel(request, provincias_de(id_departamento) if id_departamento else ())
+
+
+def responder_distritos(request):
+    id_provincia = _parametro_id(request, 'id_provincia', 'provincia_id')
+    return respuesta_nivel(request, distritos_de(id_provincia) if id_provincia else ())
+
+
+def responder_comunidades(request):
+    id_distrito = _parametro_id(request, 'id_distrito', 'distrito_id')
+    return respuesta_nivel(request, comunidades_de(id_distrito) if id_distrito else ())
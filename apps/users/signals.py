@@ -1,7 +1,18 @@
-from django.db.models.signals import post_save
+import logging
+
+from django.db import connections
+from django.db.models import Count
+from django.db.models.functions import Upper
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_migrate
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from apps.users.models import Usuario, Profile
+from apps.users.models import (
+    Usuario, Profile, UsuarioHabilidad, Disponibilidad,
+    Departamento, Provincia, Distrito, Comunidad,
+    Certificacion, TrabajosRealizados
+)
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=User)
 def crear_profile_usuario(sender, instance, created, **kwargs):
@@ -11,3 +22,110 @@ def crear_profile_usuario(sender, instance, created, **kwargs):
             Profile.objects.create(user=instance, usuario=usuario)
         except Usuario.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=Usuario)
+def refrescar_score_usuario(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Puntaje inicial del usuario nuevo y recálculo si cambió la verificación.
+    Calificaciones y trabajos completados lo refrescan donde se actualizan
+    (services/calificaciones.py, jobs/signals.py).
+    """
+    guardada = update_fields is None or 'estado_verificacion' in update_fields
+    cambio = guardada and instance.estado_verificacion != getattr(instance, '_verificacion_db', None)
+    if guardada:
+        instance._verificacion_db = instance.estado_verificacion
+    if created or cambio:
+        from apps.users.services.ranking import refrescar_score
+        refrescar_score([instance.id_usuario])
+
+
+@receiver([post_save, post_delete], sender=UsuarioHabilidad)
+def invalidar_lista_habilidad(sender, instance, **kwargs):
+    """La posting list cacheada de la habilidad ya no es válida"""
+    from apps.users.services.busqueda_trabajadores import invalidar_habilidad
+    invalidar_habilidad(instance.id_habilidad_id)
+
+
+@receiver([post_save, post_delete], sender=Disponibilidad)
+def invalidar_arbol_disponibilidad(sender, instance, **kwargs):
+    from apps.users.services.disponibilidad import invalidar_arbol
+    invalidar_arbol()
+
+
+@receiver([post_save, post_delete], sender=Departamento)
+@receiver([post_save, post_delete], sender=Provincia)
+@receiver([post_save, post_delete], sender=Distrito)
+@receiver([post_save, post_delete], sender=Comunidad)
+def invalidar_arbol_ubigeo(sender, **kwargs):
+    """Nueva versión del bundle de ubigeo para todos los procesos"""
+    from apps.users.services.ubigeo import invalidar_ubigeo
+    invalidar_ubigeo()
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=Certificacion)
+@receiver([post_save, post_delete], sender=TrabajosRealizados)
+def invalidar_portafolio(sender, instance, **kwargs):
+    """El PDF del portafolio se vuelve a generar con los datos nuevos"""
+    from apps.users.services.portafolio import invalidar
+    invalidar(instance.pk if sender is Usuario else instance.id_usuario_id)
+
+
+@receiver(post_save, sender=Profile)
+def miniaturas_foto_perfil(sender, instance, **kwargs):
+    """Genera en segundo plano las miniaturas de la foto subida"""
+    if instance.foto_url:
+        from apps.users.services.miniaturas import solicitar
+        solicitar(instance.foto_url.name)
+
+
+@receiver(pre_migrate)
+def extension_trigram(sender, using='default', **kwargs):
+    """
+    pg_trgm debe existir antes de la migración que crea el índice gin_trgm_ops
+    de Usuario.Meta.indexes; las migraciones se generan con makemigrations
+    (ver README) y no incluyen la extensión.
+    """
+    if sender.name != 'apps.users' or connections[using].vendor != 'postgresql':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+@receiver(post_migrate)
+def indexar_email_usuarios(sender, using='default', **kwargs):
+    """
+    Índice único UPPER(email) en auth_user: un correo por cuenta sin importar
+    mayúsculas, y búsqueda indexada para el login (apps.users.backends).
+    auth_user es de django.contrib.auth, por eso no se declara en un Meta.
+    """
+    if sender.name != 'apps.users':
+        return
+
+    connection = connections[using]
+    tabla = User._meta.db_table
+    if connection.vendor not in ('postgresql', 'sqlite') or tabla not in connection.introspection.table_names():
+        return
+
+    duplicados = list(
+        User.objects.using(using).exclude(email='')
+        .values(email_upper=Upper('email')).annotate(cuentas=Count('id')).filter(cuentas__gt=1)
+        .values_list('email_upper', flat=True)[:20]
+    )
+    with connection.cursor() as cursor:
+        if duplicados:
+            # Unir cuentas no se puede hacer solo: queda el índice simple hasta resolverlas
+            logger.warning(
+                'Correos repetidos (sin distinguir mayúsculas) en %s, no se crea el índice único: %s',
+                tabla, ', '.join(duplicados)
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS auth_user_email_upper_idx ON {tabla} (UPPER(email))")
+            return
+        cursor.execute("DROP INDEX IF EXISTS auth_user_email_upper_idx")
+        # Las cuentas sin correo (p.ej. createsuperuser) quedan fuera
+        cursor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS auth_user_email_upper_uniq "
+            f"ON {tabla} (UPPER(email)) WHERE email <> ''"
+        )
@@ -0,0 +1,17 @@
+"""
+Tareas en segundo plano de la app users (ver apps.core.tareas)
+"""
+
+from apps.core.tareas import tarea
+
+
+@tarea(cola='pdf', max_intentos=3)
+def generar_portafolio(usuario_id):
+    from apps.users.services import portafolio
+    return portafolio.generar(usuario_id)
+
+
+@tarea(cola='imagenes', max_intentos=3)
+def generar_miniaturas(nombre):
+    from apps.users.services import miniaturas
+    return miniaturas.generar(nombre)
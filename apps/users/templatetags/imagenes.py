@@ -0,0 +1,40 @@
+"""
+Miniaturas en plantillas (ver apps.users.services.miniaturas).
+
+    {% load imagenes %}
+    {% imagen_miniatura profile.foto_url 'chico' alt=usuario.nombres clase='avatar' %}
+    <img src="{{ oferta.foto|miniatura:'mediano' }}">
+"""
+
+from django import template
+from django.conf import settings
+from django.utils.html import format_html
+
+from apps.users.services import miniaturas
+
+register = template.Library()
+
+
+@register.filter
+def miniatura(archivo, tamano='mediano'):
+    """URL JPEG de la miniatura (o de la original mientras se genera)"""
+    return miniaturas.url(archivo, tamano) or ''
+
+
+@register.simple_tag
+def imagen_miniatura(archivo, tamano='mediano', alt='', clase=''):
+    """<picture> con WebP y respaldo JPEG; <img> con la original mientras se genera"""
+    opciones = miniaturas.urls(archivo, tamano)
+    if opciones is None:
+        return ''
+    lado = settings.MINIATURAS_TAMANOS[tamano]
+    if 'original' in opciones:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="max-width:{}px" loading="lazy" decoding="async">',
+            opciones['original'], alt, clase, lado,
+        )
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        opciones['webp'], opciones['jpg'], alt, clase,
+    )
@@ -1,3 +1,323 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest import mock, skipUnless
+
+from apps.core import tareas
+from apps.core.models import Tarea
+
+from apps.core.utils.exceptions import (
+    APIConnectionException,
+    DocumentNotFoundException,
+    InvalidDNIException,
+    ServiceUnavailableException,
+)
+from apps.users.models import Usuario, Profile, Certificacion
+from apps.users.services import documentos, portafolio
+from apps.users.services.documentos import StubBackend
+
+
+class ContadorBackend(StubBackend):
+    """Stub que cuenta las llamadas al proveedor"""
+    llamadas = 0
+
+    def consultar_dni(self, dni):
+        ContadorBackend.llamadas += 1
+        return super().consultar_dni(dni)
+
+
+class CaidoBackend(StubBackend):
+    """Proveedor que siempre falla"""
+    llamadas = 0
+
+    def consultar_dni(self, dni):
+        CaidoBackend.llamadas += 1
+        raise APIConnectionException('Tiempo de espera agotado')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'documentos-tests'}},
+    DOCUMENTOS_BACKEND='apps.users.tests.ContadorBackend',
+    DOCUMENTOS_FALLAS_MAX=3,
+)
+class ConsultaDocumentosTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ContadorBackend.llamadas = 0
+        CaidoBackend.llamadas = 0
+
+    def test_dni_valido_se_cachea(self):
+        data = documentos.consultar_dni('72768256')
+        self.assertEqual(data['nombre_completo'], 'JUAN CARLOS PEREZ GARCIA')
+        documentos.consultar_dni('72768256')
+        self.assertEqual(ContadorBackend.llamadas, 1)
+
+    def test_dni_no_encontrado_se_cachea(self):
+        for _ in range(2):
+            with self.assertRaises(DocumentNotFoundException):
+                documentos.consultar_dni('00000000')
+        self.assertEqual(ContadorBackend.llamadas, 1)
+
+    def test_dni_invalido_no_llama_al_proveedor(self):
+        with self.assertRaises(InvalidDNIException):
+            documentos.consultar_dni('1234')
+        self.assertEqual(ContadorBackend.llamadas, 0)
+
+    @override_settings(DOCUMENTOS_BACKEND='apps.users.tests.CaidoBackend')
+    def test_circuito_se_abre_tras_fallas(self):
+        for _ in range(3):
+            with self.assertRaises(APIConnectionException):
+                documentos.consultar_dni('72768256')
+        with self.assertRaises(ServiceUnavailableException):
+            documentos.consultar_dni('72768256')
+        self.assertEqual(CaidoBackend.llamadas, 3)
+
+    def test_vista_consultar_dni(self):
+        response = self.client.get('/users/api/consultar-dni/', {'dni': '12345678'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['apellido_paterno'], 'LOPEZ')
+
+        response = self.client.get('/users/api/consultar-dni/', {'dni': '12ab'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeApiPeruHandler(BaseHTTPRequestHandler):
+    """Imita apis.net.pe: responde lento y cuenta las llamadas"""
+    llamadas = 0
+    demora = 0.2
+
+    def do_GET(self):
+        FakeApiPeruHandler.llamadas += 1
+        time.sleep(self.demora)
+        url = urlparse(self.path)
+        numero = parse_qs(url.query).get('numero', [''])[0]
+        data = StubBackend.DNIS.get(numero) if url.path.endswith('/reniec/dni') else None
+        if data is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        cuerpo = json.dumps({
+            'numeroDocumento': numero,
+            'nombres': data['nombres'],
+            'apellidoPaterno': data['apellido_paterno'],
+            'apellidoMaterno': data['apellido_materno'],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConsultaDocumentosAsyncTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), FakeApiPeruHandler)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.ajustes = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'documentos-async-tests'}},
+            DOCUMENTOS_BACKEND='apps.users.services.documentos.ApiPeruBackend',
+            APIPERU_URL=f'http://127.0.0.1:{cls.servidor.server_port}/v2',
+        )
+        cls.ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        FakeApiPeruHandler.llamadas = 0
+
+    async def test_consultas_simultaneas_comparten_una_llamada(self):
+        resultados = await asyncio.gather(*[documentos.aconsultar_dni('72768256') for _ in range(5)])
+        self.assertEqual(FakeApiPeruHandler.llamadas, 1)
+        self.assertTrue(all(r['apellido_materno'] == 'GARCIA' for r in resultados))
+
+        await documentos.aconsultar_dni('72768256')
+        self.assertEqual(FakeApiPeruHandler.llamadas, 1)
+
+    async def test_no_encontrado(self):
+        for _ in range(2):
+            with self.assertRaises(DocumentNotFoundException):
+                await documentos.aconsultar_dni('00000000')
+        self.assertEqual(FakeApiPeruHandler.llamadas, 1)
+
+    async def test_vista_async(self):
+        response = await self.async_client.get('/users/api/consultar-dni/', {'dni': '12345678'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nombres'], 'MARIA')
+
+        response = await self.async_client.get('/users/api/consultar-dni/', {'dni': '99999999'})
+        self.assertEqual(response.status_code, 404)
+
+
+@skipUnless(importlib.util.find_spec('xhtml2pdf'), 'xhtml2pdf no está instalado')
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'portafolio-tests'}},
+)
+class PortafolioTests(TestCase):
+    """generar_portafolio de punta a punta: cola -> worker -> archivo"""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        user = User.objects.create_user(username='user1', email='ana@llamkay.pe', password='secreto123')
+        self.usuario = Usuario.objects.create(
+            user=user, username='user1', email='ana@llamkay.pe', nombres='Ana', apellidos='Quispe'
+        )
+        Profile.objects.create(user=user, id_usuario=self.usuario)
+        Certificacion.objects.create(id_usuario=self.usuario, titulo='Carpintería')
+        self.client.login(username='user1', password='secreto123')
+
+    def _trabajar(self):
+        for tarea_ in tareas.reclamar(10):
+            tareas.ejecutar(tarea_)
+
+    def test_genera_y_sirve_el_pdf(self):
+        response = self.client.get('/users/perfil/exportar/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 202)
+        self._trabajar()
+
+        self.assertEqual(Tarea.objects.get().estado, 'completada')
+        ruta = portafolio.pdf_listo(self.usuario.id_usuario)
+        self.assertIsNotNone(ruta)
+        with default_storage.open(ruta, 'rb') as archivo:
+            self.assertTrue(archivo.read().startswith(b'%PDF'))
+
+        response = self.client.get('/users/perfil/exportar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_cambio_en_usuario_invalida_el_pdf(self):
+        portafolio.generar(self.usuario.id_usuario)
+        self.assertIsNotNone(portafolio.pdf_listo(self.usuario.id_usuario))
+
+        self.usuario.telefono = '987654321'
+        self.usuario.save()
+        self.assertIsNone(portafolio.pdf_listo(self.usuario.id_usuario))
+
+    def test_fallo_se_informa_y_no_se_reencola(self):
+        with mock.patch('xhtml2pdf.pisa.CreatePDF', side_effect=RuntimeError('plantilla rota')):
+            self.client.get('/users/perfil/exportar/')
+            self._trabajar()
+
+        self.assertTrue(portafolio.fallo(self.usuario.id_usuario))
+        self.assertEqual(self.client.get('/users/perfil/exportar/estado/').json(), {'listo': False, 'error': True})
+        response = self.client.get('/users/perfil/exportar/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(), {'listo': False, 'error': True})
+        self.assertEqual(Tarea.objects.count(), 1)
+
+
+class CalificacionesTests(TestCase):
+    """Agregados de calificaciones en Usuario mantenidos con deltas"""
+
+    def setUp(self):
+        from apps.jobs.models import Contrato
+
+        cache.clear()
+        usuarios = []
+        for i in (1, 2):
+            user = User.objects.create_user(username=f'user{i}', email=f'u{i}@llamkay.pe', password='secreto123')
+            usuarios.append(Usuario.objects.create(user=user, username=f'user{i}', email=f'u{i}@llamkay.pe'))
+        self.autor, self.receptor = usuarios
+        Contrato.objects.create(
+            id_empleador=self.autor, id_trabajador=self.receptor,
+            titulo='Techado', precio_acordado=100, estado='completado'
+        )
+        self.client.login(username='user1', password='secreto123')
+
+    def _calificar(self, puntuacion):
+        self.client.post(f'/users/calificar/{self.receptor.id_usuario}/', {'puntuacion': puntuacion})
+
+    def test_desactivar_dos_veces_descuenta_una_vez(self):
+        from apps.jobs.models import Calificacion
+
+        self._calificar(4)
+        calificacion = Calificacion.objects.get()
+        url = f'/users/calificaciones/eliminar/{calificacion.id_calificacion}/'
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+        self.receptor.refresh_from_db()
+        self.assertEqual((self.receptor.total_calificaciones, self.receptor.suma_calificaciones), (0, 0))
+
+    def test_save_completo_no_pisa_los_agregados(self):
+        desactualizado = Usuario.objects.get(pk=self.receptor.pk)
+        self._calificar(5)
+        desactualizado.telefono = '987654321'
+        desactualizado.save()
+
+        self.receptor.refresh_from_db()
+        self.assertEqual(self.receptor.telefono, '987654321')
+        self.assertEqual(self.receptor.total_calificaciones, 1)
+        self.assertEqual(float(self.receptor.rating_promedio), 5.0)
+
+
+class CorreoUnicoTests(TestCase):
+    """Un correo por cuenta sin distinguir mayúsculas (índice auth_user_email_upper_uniq)"""
+
+    def setUp(self):
+        User.objects.create_user(username='user1', email='Ana@llamkay.pe', password='secreto123')
+
+    def test_validar_correo_ignora_mayusculas(self):
+        response = self.client.get('/users/validar-correo/', {'email': 'ana@LLAMKAY.pe'})
+        self.assertEqual(response.json(), {'exists': True})
+
+    def test_indice_rechaza_el_mismo_correo(self):
+        from django.db import IntegrityError, transaction
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='user2', email='ana@llamkay.pe', password='secreto123')
+        # Varias cuentas sin correo siguen permitidas
+        User.objects.create_user(username='user3', password='secreto123')
+        User.objects.create_user(username='user4', password='secreto123')
+
+
+class ScoreConfianzaTests(TestCase):
+    """score_confianza se recalcula solo cuando cambian sus insumos"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='user1', email='u1@llamkay.pe', password='secreto123')
+        Usuario.objects.create(user=user, username='user1', email='u1@llamkay.pe')
+        self.usuario = Usuario.objects.get(user=user)
+
+    def test_usuario_nuevo_tiene_puntaje_inicial(self):
+        self.assertGreater(self.usuario.score_confianza, 0)
+
+    def test_editar_perfil_no_recalcula(self):
+        self.usuario.telefono = '987654321'
+        with self.assertNumQueries(1):
+            self.usuario.save()
+
+    def test_verificacion_recalcula(self):
+        inicial = self.usuario.score_confianza
+        self.usuario.estado_verificacion = 'verificado'
+        self.usuario.save()
+        self.usuario.refresh_from_db()
+        self.assertGreater(self.usuario.score_confianza, inicial)
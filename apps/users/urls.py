@@ -25,13 +25,21 @@ urlpatterns = [
     path('validar-correo/', auth.validar_correo, name='validar_correo'),
     path('cargar-provincias/', api.cargar_provincias, name='cargar_provincias'),
     path('cargar-distritos/', api.cargar_distritos, name='cargar_distritos'),
+    path('cargar-comunidades/', api.cargar_comunidades, name='cargar_comunidades'),
+    path('ubigeo.json', api.ubigeo_bundle, name='ubigeo_bundle'),
+    path('api/ubicacion-cercana/', api.ubicacion_cercana, name='ubicacion_cercana'),
+    path('api/buscar-trabajadores/', api.buscar_trabajadores_api, name='buscar_trabajadores_api'),
+    path('api/ocr/<int:trabajo_id>/', verificacion.estado_ocr, name='estado_ocr'),
     
     # Perfil
     path('perfil/', perfil.perfil, name='perfil'),
     path('perfil/actualizar/', perfil.actualizar_perfil, name='actualizar_perfil'),
     path('perfil/exportar/', perfil.exportar_portafolio_pdf, name='exportar_portafolio'),
+    path('perfil/exportar/estado/', perfil.estado_portafolio, name='estado_portafolio'),
     
     # Calificaciones
     path('calificar/<int:usuario_id>/', calificacion.calificar_usuario, name='calificar_usuario'),
+    path('calificaciones/<int:usuario_id>/', calificacion.ver_calificaciones, name='ver_calificaciones'),
+    path('calificaciones/eliminar/<int:calificacion_id>/', calificacion.eliminar_calificacion, name='eliminar_calificacion'),
     path('buscar/', calificacion.buscar_usuarios, name='buscar_usuarios'),
 ]
\ No newline at end of file
@@ -1,109 +1,39 @@
-import requests
+from datetime import time
+from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
-from apps.users.models import Provincia, Distrito, Comunidad
-
-# -------------------------------------------------
-# 🔹 Token de API PERÚ
-# -------------------------------------------------
-APIPERU_TOKEN = "b6bcd92e240859cbaf2a08b008e357b250fbe17f7c950501bcdb1262e837140b"
-
+from apps.core.utils.exceptions import (
+    APIConnectionException,
+    DocumentNotFoundException,
+    InvalidDNIException,
+    InvalidRUCException,
+    ServiceUnavailableException,
+)
+from apps.users.services import documentos, geocodificacion, ubigeo
+from apps.users.services.busqueda_trabajadores import buscar_trabajadores, RESULTADOS_MAX
 
 # -------------------------------------------------
 # 🔹 Consultar DNI (RENIEC)
 # -------------------------------------------------
 @csrf_exempt
 @require_GET
-def consultar_dni_api(request):
-    dni = request.GET.get('dni', '').strip()
-    
-    print(f"🔍 === CONSULTA DNI INICIADA ===")
-    print(f"📋 DNI recibido: {dni}")
-    
-    # 🧪 MODO DE PRUEBA - Datos ficticios para desarrollo
-    # Descomenta esto si el token no funciona y quieres probar el frontend
-    """
-    DATOS_PRUEBA = {
-        '72768256': {'nombres': 'JUAN CARLOS', 'apellidoPaterno': 'PEREZ', 'apellidoMaterno': 'GARCIA'},
-        '12345678': {'nombres': 'MARIA', 'apellidoPaterno': 'LOPEZ', 'apellidoMaterno': 'TORRES'},
-    }
-    
-    if dni in DATOS_PRUEBA:
-        data = DATOS_PRUEBA[dni]
+async def consultar_dni_api(request):
+    try:
+        data = await documentos.aconsultar_dni(request.GET.get('dni', ''))
+    except InvalidDNIException as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except DocumentNotFoundException:
         return JsonResponse({
-            'success': True,
-            'dni': dni,
-            'nombres': data['nombres'],
-            'apellido_paterno': data['apellidoPaterno'],
-            'apellido_materno': data['apellidoMaterno'],
-            'nombre_completo': f"{data['nombres']} {data['apellidoPaterno']} {data['apellidoMaterno']}"
-        })
-    """
-
-    if not dni or len(dni) != 8:
-        print(f"❌ Error: DNI debe tener 8 dígitos")
-        return JsonResponse({'success': False, 'error': 'El DNI debe tener 8 dígitos'}, status=400)
-
-    if not dni.isdigit():
-        print(f"❌ Error: DNI debe contener solo números")
-        return JsonResponse({'success': False, 'error': 'El DNI debe contener solo números'}, status=400)
-
-    url = f"https://api.apis.net.pe/v2/reniec/dni?numero={dni}"
-    headers = {
-        "Authorization": f"Bearer {APIPERU_TOKEN}", 
-        "Accept": "application/json"
-    }
-    
-    print(f"🌐 URL de consulta: {url}")
-    print(f"🔐 Token (primeros 20 chars): {APIPERU_TOKEN[:20]}...")
+            'success': False,
+            'error': 'DNI no encontrado en la base de datos de RENIEC'
+        }, status=404)
+    except ServiceUnavailableException as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=503)
+    except APIConnectionException as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        print(f"📡 Status Code: {response.status_code}")
-        print(f"📦 Response Text: {response.text[:200]}...")  # Primeros 200 caracteres
-
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ Datos obtenidos: {data}")
-            
-            return JsonResponse({
-                'success': True,
-                'dni': data.get('numeroDocumento', ''),
-                'nombres': data.get('nombres', ''),
-                'apellido_paterno': data.get('apellidoPaterno', ''),
-                'apellido_materno': data.get('apellidoMaterno', ''),
-                'nombre_completo': f"{data.get('nombres', '')} {data.get('apellidoPaterno', '')} {data.get('apellidoMaterno', '')}"
-            })
-        elif response.status_code == 401:
-            print(f"❌ Error 401: Token inválido o sin autorización")
-            return JsonResponse({
-                'success': False, 
-                'error': 'Token de API inválido. Contacta al administrador.'
-            }, status=500)
-        elif response.status_code == 404:
-            print(f"⚠️ Error 404: DNI no encontrado en RENIEC")
-            return JsonResponse({
-                'success': False, 
-                'error': 'DNI no encontrado en la base de datos de RENIEC'
-            }, status=404)
-        else:
-            print(f"❌ Error HTTP {response.status_code}: {response.text}")
-            return JsonResponse({
-                'success': False, 
-                'error': f'Error al consultar DNI (Código: {response.status_code})'
-            }, status=response.status_code)
-
-    except requests.exceptions.Timeout:
-        print(f"⏱️ Error: Timeout al consultar API")
-        return JsonResponse({'success': False, 'error': 'Tiempo de espera agotado'}, status=500)
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error de requests: {str(e)}")
-        return JsonResponse({'success': False, 'error': f'Error de conexión: {str(e)}'}, status=500)
-    except Exception as e:
-        print(f"❌ Error inesperado: {str(e)}")
-        return JsonResponse({'success': False, 'error': f'Error inesperado: {str(e)}'}, status=500)
+    return JsonResponse({'success': True, **data})
 
 
 # -------------------------------------------------
@@ -111,92 +41,35 @@ def consultar_dni_api(request):
 # -------------------------------------------------
 @csrf_exempt
 @require_GET
-def consultar_ruc_api(request):
-    ruc = request.GET.get('ruc', '').strip()
-    
-    print(f"🔍 === CONSULTA RUC INICIADA ===")
-    print(f"📋 RUC recibido: {ruc}")
-
-    if not ruc or len(ruc) != 11:
-        print(f"❌ Error: RUC debe tener 11 dígitos")
-        return JsonResponse({'success': False, 'error': 'El RUC debe tener 11 dígitos'}, status=400)
-
-    if not ruc.isdigit():
-        print(f"❌ Error: RUC debe contener solo números")
-        return JsonResponse({'success': False, 'error': 'El RUC debe contener solo números'}, status=400)
-
-    url = f"https://api.apis.net.pe/v2/sunat/ruc?numero={ruc}"
-    headers = {
-        "Authorization": f"Bearer {APIPERU_TOKEN}", 
-        "Accept": "application/json"
-    }
-    
-    print(f"🌐 URL de consulta: {url}")
-
+async def consultar_ruc_api(request):
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        print(f"📡 Status Code: {response.status_code}")
-        print(f"📦 Response Text: {response.text[:200]}...")
-
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ Datos obtenidos: {data}")
-            
-            return JsonResponse({
-                'success': True,
-                'ruc': data.get('numeroDocumento', ''),
-                'razon_social': data.get('razonSocial', ''),
-                'nombre_comercial': data.get('nombreComercial', ''),
-                'direccion': data.get('direccion', ''),
-                'estado': data.get('estado', ''),
-                'condicion': data.get('condicion', ''),
-                'departamento': data.get('departamento', ''),
-                'provincia': data.get('provincia', ''),
-                'distrito': data.get('distrito', '')
-            })
-        elif response.status_code == 401:
-            print(f"❌ Error 401: Token inválido")
-            return JsonResponse({
-                'success': False, 
-                'error': 'Token de API inválido. Contacta al administrador.'
-            }, status=500)
-        elif response.status_code == 404:
-            print(f"⚠️ Error 404: RUC no encontrado")
-            return JsonResponse({
-                'success': False, 
-                'error': 'RUC no encontrado en SUNAT'
-            }, status=404)
-        else:
-            print(f"❌ Error HTTP {response.status_code}")
-            return JsonResponse({
-                'success': False, 
-                'error': f'Error al consultar RUC (Código: {response.status_code})'
-            }, status=response.status_code)
-
-    except requests.exceptions.Timeout:
-        print(f"⏱️ Error: Timeout")
-        return JsonResponse({'success': False, 'error': 'Tiempo de espera agotado'}, status=500)
-    except Exception as e:
-        print(f"❌ Error inesperado: {str(e)}")
+        data = await documentos.aconsultar_ruc(request.GET.get('ruc', ''))
+    except InvalidRUCException as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except DocumentNotFoundException:
+        return JsonResponse({'success': False, 'error': 'RUC no encontrado en SUNAT'}, status=404)
+    except ServiceUnavailableException as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=503)
+    except APIConnectionException as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+    return JsonResponse({'success': True, **data})
+
 
 # -------------------------------------------------
-# 🔹 Cargar Provincias por Departamento
+# 🔹 Árbol completo de ubigeo (bundle gzip + ETag)
 # -------------------------------------------------
 @require_GET
-def cargar_provincias(request):
-    id_departamento = request.GET.get('id_departamento')
-
-    if not id_departamento:
-        return JsonResponse([], safe=False)
+def ubigeo_bundle(request):
+    return ubigeo.respuesta_bundle(request)
 
-    provincias = Provincia.objects.filter(
-        id_departamento=id_departamento
-    ).values('id_provincia', 'nombre').order_by('nombre')
 
-    return JsonResponse(list(provincias), safe=False)
+# -------------------------------------------------
+# 🔹 Cargar Provincias por Departamento
+# -------------------------------------------------
+@require_GET
+def cargar_provincias(request):
+    return ubigeo.responder_provincias(request)
 
 
 # -------------------------------------------------
@@ -204,16 +77,7 @@ def cargar_provincias(request):
 # -------------------------------------------------
 @require_GET
 def cargar_distritos(request):
-    id_provincia = request.GET.get('id_provincia')
-
-    if not id_provincia:
-        return JsonResponse([], safe=False)
-
-    distritos = Distrito.objects.filter(
-        id_provincia=id_provincia
-    ).values('id_distrito', 'nombre').order_by('nombre')
-
-    return JsonResponse(list(distritos), safe=False)
+    return ubigeo.responder_distritos(request)
 
 
 # -------------------------------------------------
@@ -221,13 +85,59 @@ def cargar_distritos(request):
 # -------------------------------------------------
 @require_GET
 def cargar_comunidades(request):
-    id_distrito = request.GET.get('id_distrito')
+    return ubigeo.responder_comunidades(request)
 
-    if not id_distrito:
-        return JsonResponse([], safe=False)
 
-    comunidades = Comunidad.objects.filter(
-        id_distrito=id_distrito
-    ).values('id_comunidad', 'nombre').order_by('nombre')
+# -------------------------------------------------
+# 🔹 Ubicación más cercana a unas coordenadas (GPS)
+# -------------------------------------------------
+@require_GET
+def ubicacion_cercana(request):
+    """
+    Parámetros: lat  lon
+    Devuelve los ids de departamento, provincia, distrito y comunidad para
+    rellenar los selects en cascada.
+    """
+    try:
+        latitud = float(request.GET['lat'])
+        longitud = float(request.GET['lon'])
+        ubicacion = geocodificacion.ubicacion_cercana(latitud, longitud)
+    except (KeyError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Coordenadas inválidas'}, status=400)
+
+    if ubicacion is None:
+        return JsonResponse({'success': False, 'error': 'No hay comunidades cerca de esa ubicación'}, status=404)
+    return JsonResponse({'success': True, **ubicacion})
+
 
-    return JsonResponse(list(comunidades), safe=False)
\ No newline at end of file
+# -------------------------------------------------
+# 🔹 Buscar trabajadores por habilidad, ubicación y horario
+# -------------------------------------------------
+@login_required
+@require_GET
+def buscar_trabajadores_api(request):
+    """
+    Parámetros: habilidades=1,4  lat  lon  dia (0=Domingo..6)  desde=HH:MM  hasta=HH:MM  limite
+    """
+    try:
+        habilidades = [int(h) for h in request.GET.get('habilidades', '').split(',') if h.strip()]
+        lat = request.GET.get('lat')
+        lon = request.GET.get('lon')
+        dia = request.GET.get('dia')
+        desde = request.GET.get('desde')
+        hasta = request.GET.get('hasta')
+        limite = min(int(request.GET.get('limite', 20)), RESULTADOS_MAX)
+
+        resultados = buscar_trabajadores(
+            habilidades=habilidades,
+            latitud=float(lat) if lat else None,
+            longitud=float(lon) if lon else None,
+            dia_semana=int(dia) if dia else None,
+            hora_inicio=time.fromisoformat(desde) if desde else None,
+            hora_fin=time.fromisoformat(hasta) if hasta else None,
+            limite=limite,
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros inválidos'}, status=400)
+
+    return JsonResponse({'success': True, 'resultados': resultados})
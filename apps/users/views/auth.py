@@ -5,8 +5,11 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_protect
 from django.http import JsonResponse
+from django.db import IntegrityError
 
 from apps.users.models import Usuario, Profile
+from apps.users.services import cuentas
+from apps.users.middleware import recordar_usuario
 from apps.users.forms import (
     RegisterFormStep1, RegisterFormStep2, RegisterFormStep3,
     RegisterFormStep4, RegisterEmpresaForm
@@ -28,14 +31,14 @@ def login(request):
             return render(request, 'users/auth/login.html')
 
         try:
-            user_obj = User.objects.filter(email=email, is_active=True).first()
-            if not user_obj:
-                messages.error(request, "Correo o contraseña incorrecta.")
-                return render(request, 'users/auth/login.html')
-
-            user = authenticate(request, username=user_obj.username, password=password)
+            user = authenticate(request, email=email, password=password)
             if user:
                 django_login(request, user)
+                # El backend ya trajo el Usuario: sus datos básicos quedan en la sesión
+                # para los chequeos de rol (el Usuario completo se consulta por request)
+                usuario = getattr(user, 'perfil', None)
+                if usuario is not None:
+                    recordar_usuario(request, usuario)
                 messages.success(request, f'Bienvenido {user.first_name or user.username}!')
                 return redirect('llamkay:dashboard')
             else:
@@ -89,7 +92,7 @@ def register(request):
                     'tipo_usuario': tipo
                 })
 
-            if User.objects.filter(email=cd['email']).exists():
+            if User.objects.filter(email__iexact=cd['email']).exists():
                 form.add_error(None, 'Este correo ya está en uso.')
                 return render(request, 'users/register/step_1.html', {
                     'form': form, 
@@ -97,8 +100,8 @@ def register(request):
                 })
 
             try:
-                user = User.objects.create_user(
-                    username=f"{'empresa' if tipo == 'empresa' else 'user'}{User.objects.count() + 1}",
+                user = cuentas.crear_user(
+                    prefijo='empresa' if tipo == 'empresa' else 'user',
                     email=cd['email'],
                     first_name=cd.get('razon_social', cd.get('nombre', ''))[:30],
                     last_name='' if tipo == 'empresa' else cd.get('apellido', ''),
@@ -118,6 +121,9 @@ def register(request):
                 
                 return redirect('users:register_two')
 
+            except IntegrityError:
+                # Otro registro con el mismo correo se adelantó (índice único en auth_user)
+                form.add_error(None, 'Este correo ya está en uso.')
             except Exception as e:
                 form.add_error(None, f'Error: {str(e)}')
     else:
@@ -211,7 +217,7 @@ def register_four(request):
             tipo = request.session.get('tipo_usuario', 'trabajador')
 
             # Crear Usuario y Profile
-            from apps.users.models import Usuario, Profile, Departamento, Provincia, Distrito
+            from apps.users.models import Usuario, Profile
             
             usuario, _ = Usuario.objects.get_or_create(
                 user=user,
@@ -234,11 +240,11 @@ def register_four(request):
 
             # Guardar ubicación
             if dep_id := request.session.get('departamento_id'):
-                profile.id_departamento = Departamento.objects.get(id_departamento=dep_id)
+                profile.id_departamento_id = dep_id
             if prov_id := request.session.get('provincia_id'):
-                profile.id_provincia = Provincia.objects.get(id_provincia=prov_id)
+                profile.id_provincia_id = prov_id
             if dist_id := request.session.get('distrito_id'):
-                profile.id_distrito = Distrito.objects.get(id_distrito=dist_id)
+                profile.id_distrito_id = dist_id
 
             profile.save()
 
@@ -253,5 +259,5 @@ def register_four(request):
 def validar_correo(request):
     """API para validar si un correo ya existe"""
     email = request.GET.get('email')
-    existe = User.objects.filter(email=email).exists()
+    existe = bool(email) and User.objects.filter(email__iexact=email).exists()
     return JsonResponse({'exists': existe})
\ No newline at end of file
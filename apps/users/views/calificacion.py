@@ -3,17 +3,26 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.db.models import Q
+from django.core.paginator import Paginator
 
 from apps.users.models import Usuario
+from apps.users.services.directorio import buscar_directorio
+from apps.users.services.calificaciones import (
+    snapshot, registrar_cambio_calificacion, resumen_calificaciones
+)
 from apps.jobs.models import Contrato, Calificacion  # Importar desde jobs
+from apps.users.middleware import obtener_usuario
+
+CALIFICACIONES_POR_PAGINA = 20
 
 
 @login_required
 def calificar_usuario(request, usuario_id):
     """Vista para calificar a un usuario después de un contrato"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -99,33 +108,39 @@ def calificar_usuario(request, usuario_id):
             })
         
         if calificacion_existente:
-            # Actualizar calificación existente
-            calificacion_existente.puntuacion = puntuacion
-            calificacion_existente.comentario = comentario
-            calificacion_existente.puntualidad = puntualidad
-            calificacion_existente.calidad_trabajo = calidad_trabajo
-            calificacion_existente.comunicacion = comunicacion
-            calificacion_existente.editada = True
-            calificacion_existente.save()
+            # Actualizar calificación existente: la fila bloqueada hasta aplicar
+            # el delta, para que dos cambios simultáneos no partan del mismo antes
+            with transaction.atomic():
+                calificacion = Calificacion.objects.select_for_update().get(
+                    id_calificacion=calificacion_existente.id_calificacion
+                )
+                antes = snapshot(calificacion)
+                calificacion.puntuacion = puntuacion
+                calificacion.comentario = comentario
+                calificacion.puntualidad = puntualidad
+                calificacion.calidad_trabajo = calidad_trabajo
+                calificacion.comunicacion = comunicacion
+                calificacion.editada = True
+                calificacion.save()
+                registrar_cambio_calificacion(usuario_calificado.id_usuario, antes, snapshot(calificacion))
             messages.success(request, 'Calificación actualizada correctamente.')
         else:
             # Crear nueva calificación
-            Calificacion.objects.create(
-                id_contrato=contrato,
-                id_autor=usuario_actual,
-                id_receptor=usuario_calificado,
-                rol_autor=rol_autor,
-                puntuacion=puntuacion,
-                comentario=comentario,
-                puntualidad=puntualidad,
-                calidad_trabajo=calidad_trabajo,
-                comunicacion=comunicacion
-            )
+            with transaction.atomic():
+                calificacion = Calificacion.objects.create(
+                    id_contrato=contrato,
+                    id_autor=usuario_actual,
+                    id_receptor=usuario_calificado,
+                    rol_autor=rol_autor,
+                    puntuacion=puntuacion,
+                    comentario=comentario,
+                    puntualidad=puntualidad,
+                    calidad_trabajo=calidad_trabajo,
+                    comunicacion=comunicacion
+                )
+                registrar_cambio_calificacion(usuario_calificado.id_usuario, None, snapshot(calificacion))
             messages.success(request, 'Calificación enviada correctamente.')
         
-        # Actualizar estadísticas del usuario calificado
-        actualizar_estadisticas_usuario(usuario_calificado)
-        
         return redirect('users:ver_calificaciones', usuario_id=usuario_calificado.id_usuario)
     
     return render(request, 'users/calificar.html', {
@@ -146,46 +161,22 @@ def ver_calificaciones(request, usuario_id):
         activa=True
     ).select_related('id_autor', 'id_contrato').order_by('-fecha')
     
-    # Calcular estadísticas
-    total = calificaciones.count()
-    promedio = usuario.rating_promedio
-    
-    # Contar por estrellas
-    estrellas = {i: 0 for i in range(1, 6)}
-    for cal in calificaciones:
-        estrellas[cal.puntuacion] += 1
-    
-    # Calcular promedios de aspectos detallados
-    calificaciones_con_detalles = calificaciones.exclude(
-        puntualidad__isnull=True,
-        calidad_trabajo__isnull=True,
-        comunicacion__isnull=True
-    )
-    
-    promedio_puntualidad = None
-    promedio_calidad = None
-    promedio_comunicacion = None
+    # Estadísticas en una sola consulta (cacheadas por receptor)
+    resumen = resumen_calificaciones(usuario)
     
-    if calificaciones_con_detalles.exists():
-        from django.db.models import Avg
-        promedios = calificaciones_con_detalles.aggregate(
-            Avg('puntualidad'),
-            Avg('calidad_trabajo'),
-            Avg('comunicacion')
-        )
-        promedio_puntualidad = round(promedios['puntualidad__avg'], 1) if promedios['puntualidad__avg'] else None
-        promedio_calidad = round(promedios['calidad_trabajo__avg'], 1) if promedios['calidad_trabajo__avg'] else None
-        promedio_comunicacion = round(promedios['comunicacion__avg'], 1) if promedios['comunicacion__avg'] else None
+    # Solo se cargan las calificaciones de la página actual
+    pagina = Paginator(calificaciones, CALIFICACIONES_POR_PAGINA).get_page(request.GET.get('pagina'))
     
     context = {
         'usuario': usuario,
-        'calificaciones': calificaciones,
-        'total_calificaciones': total,
-        'promedio': promedio,
-        'estrellas': estrellas,
-        'promedio_puntualidad': promedio_puntualidad,
-        'promedio_calidad': promedio_calidad,
-        'promedio_comunicacion': promedio_comunicacion,
+        'calificaciones': pagina.object_list,
+        'page_obj': pagina,
+        'total_calificaciones': resumen['total'],
+        'promedio': resumen['promedio'],
+        'estrellas': resumen['estrellas'],
+        'promedio_puntualidad': resumen['promedio_puntualidad'],
+        'promedio_calidad': resumen['promedio_calidad'],
+        'promedio_comunicacion': resumen['promedio_comunicacion'],
     }
     
     return render(request, 'users/ver_calificaciones.html', context)
@@ -196,25 +187,29 @@ def ver_calificaciones(request, usuario_id):
 def eliminar_calificacion(request, calificacion_id):
     """Desactivar una calificación (solo el autor puede desactivarla)"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         return JsonResponse({'error': 'Usuario no encontrado'}, status=400)
     
     try:
-        calificacion = get_object_or_404(
-            Calificacion, 
-            id_calificacion=calificacion_id, 
-            id_autor=usuario_actual
-        )
-        
-        usuario_calificado = calificacion.id_receptor
-        
-        # Marcar como inactiva en lugar de eliminar
-        calificacion.activa = False
-        calificacion.save(update_fields=['activa'])
-        
-        # Actualizar estadísticas
-        actualizar_estadisticas_usuario(usuario_calificado)
+        with transaction.atomic():
+            # Solo una de dos desactivaciones simultáneas (doble clic) encuentra la fila activa
+            calificacion = Calificacion.objects.select_for_update().filter(
+                id_calificacion=calificacion_id,
+                id_autor=usuario_actual,
+                activa=True
+            ).first()
+            if calificacion is None:
+                return JsonResponse({'error': 'Calificación no encontrada'}, status=404)
+            
+            antes = snapshot(calificacion)
+            
+            # Marcar como inactiva en lugar de eliminar
+            calificacion.activa = False
+            calificacion.save(update_fields=['activa'])
+            
+            # Actualizar estadísticas
+            registrar_cambio_calificacion(calificacion.id_receptor_id, antes, snapshot(calificacion))
         
         return JsonResponse({
             'success': True, 
@@ -228,7 +223,7 @@ def eliminar_calificacion(request, calificacion_id):
 def mis_calificaciones(request):
     """Ver las calificaciones que el usuario ha dado y recibido"""
     try:
-        usuario_actual = request.user.perfil
+        usuario_actual = obtener_usuario(request)
     except Usuario.DoesNotExist:
         messages.error(request, 'Debes completar tu perfil primero.')
         return redirect('users:perfil')
@@ -259,44 +254,23 @@ def buscar_usuarios(request):
     query = request.GET.get('q', '').strip()
     tipo = request.GET.get('tipo', '')
     
-    usuarios = Usuario.objects.filter(
-        habilitado=True,
-        deleted_at__isnull=True
+    # Ordenar por puntaje de confianza precalculado (índice tipo_usuario, habilitado, -score)
+    directorio = buscar_directorio(
+        query,
+        pagina=request.GET.get('pagina'),
+        por_pagina=20,
+        tipo=tipo if tipo and tipo != 'todos' else None,
+        solo_habilitados=True,
+        orden=['-score_confianza'],
     )
     
-    if tipo and tipo != 'todos':
-        usuarios = usuarios.filter(tipo_usuario=tipo)
-    
-    if query:
-        usuarios = usuarios.filter(
-            Q(nombres__icontains=query) |
-            Q(apellidos__icontains=query) |
-            Q(username__icontains=query)
-        )
-    
-    # Ordenar por rating
-    usuarios = usuarios.order_by('-rating_promedio', '-total_calificaciones')[:20]
-    
     context = {
-        'usuarios': usuarios,
+        'usuarios': directorio['resultados'],
+        'pagina': directorio['pagina'],
+        'hay_anterior': directorio['hay_anterior'],
+        'hay_siguiente': directorio['hay_siguiente'],
         'query': query,
         'tipo': tipo,
     }
     
     return render(request, 'users/buscar_usuarios.html', context)
-
-
-def actualizar_estadisticas_usuario(usuario):
-    """Actualizar estadísticas de calificaciones de un usuario"""
-    calificaciones = Calificacion.objects.filter(
-        id_receptor=usuario,
-        activa=True
-    )
-    
-    total = calificaciones.count()
-    
-    if total > 0:
-        suma = sum(cal.puntuacion for cal in calificaciones)
-        promedio = suma / total
-        
-        usuario.total_calificaciones = total
\ No newline at end of file
@@ -1,7 +1,8 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.core.files.storage import default_storage
 from django.views.decorators.http import require_POST
 from django.db import transaction
 
@@ -11,12 +12,14 @@ from apps.users.models import (
 )
 
 from apps.jobs.models import Calificacion
+from apps.users.services import portafolio
+from apps.users.middleware import obtener_usuario, usuario_basico
 
 @login_required
 def perfil(request):
     """Vista principal del perfil del usuario"""
     try:
-        usuario_db = Usuario.objects.get(user=request.user)
+        usuario_db = obtener_usuario(request)
         profile, _ = Profile.objects.get_or_create(
             user=request.user, 
             id_usuario=usuario_db
@@ -51,7 +54,7 @@ def perfil(request):
 def actualizar_perfil(request):
     """Actualizar información del perfil"""
     try:
-        usuario_db = Usuario.objects.get(user=request.user)
+        usuario_db = obtener_usuario(request)
         profile, _ = Profile.objects.get_or_create(
             user=request.user, 
             id_usuario=usuario_db
@@ -100,39 +103,37 @@ def actualizar_perfil(request):
 
 @login_required
 def exportar_portafolio_pdf(request):
-    """Exportar portafolio como PDF"""
-    try:
-        from xhtml2pdf import pisa
-        from django.template.loader import get_template
-        from io import BytesIO
+    """Exportar portafolio como PDF (se genera en segundo plano)"""
+    usuario_id = usuario_basico(request).get('id_usuario')
+    if usuario_id is None:
+        return HttpResponse("Error: usuario no encontrado", status=404)
+
+    ruta = portafolio.pdf_listo(usuario_id)
+    if ruta is not None:
+        return FileResponse(
+            default_storage.open(ruta, 'rb'),
+            content_type='application/pdf',
+            filename='portafolio.pdf',
+        )
 
-        usuario_db = Usuario.objects.get(user=request.user)
-        profile = Profile.objects.get(user=request.user)
-        
-        certificaciones = Certificacion.objects.filter(id_usuario=usuario_db)
-        trabajos = TrabajosRealizados.objects.filter(id_usuario=usuario_db)
+    ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    if portafolio.fallo(usuario_id):
+        if ajax:
+            return JsonResponse({'listo': False, 'error': True}, status=500)
+        messages.error(request, "No se pudo generar tu portafolio. Inténtalo de nuevo en unos minutos.")
+        return redirect('users:perfil')
 
-        template = get_template('users/portafolio_pdf.html')
-        context = {
-            'usuario': usuario_db,
-            'profile': profile,
-            'certificaciones': certificaciones,
-            'trabajos': trabajos,
-        }
-        html = template.render(context)
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'inline; filename="portafolio.pdf"'
-        
-        pisa_status = pisa.CreatePDF(
-            BytesIO(html.encode("utf-8")), 
-            dest=response
-        )
-        
-        if pisa_status.err:
-            return HttpResponse('Error al generar PDF', status=500)
-        
-        return response
+    portafolio.solicitar(usuario_id)
+    if ajax:
+        return JsonResponse({'listo': False}, status=202)
+    messages.info(request, "Estamos generando tu portafolio. Vuelve a descargarlo en unos segundos.")
+    return redirect('users:perfil')
 
-    except Exception as e:
-        return HttpResponse(f"Error: {str(e)}", status=500)
\ No newline at end of file
+
+@login_required
+def estado_portafolio(request):
+    """Indica si el PDF del portafolio ya se puede descargar"""
+    usuario_id = usuario_basico(request).get('id_usuario')
+    listo = usuario_id is not None and portafolio.pdf_listo(usuario_id) is not None
+    error = not listo and usuario_id is not None and portafolio.fallo(usuario_id)
+    return JsonResponse({'listo': listo, 'error': error})
@@ -2,8 +2,11 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.db.models import F
 
-from apps.users.models import Usuario, Verificacion, Certificacion
+from apps.users.models import Verificacion, Certificacion, TrabajoOCR
+from apps.users.services import ocr
+from apps.users.middleware import obtener_usuario
 
 
 @login_required
@@ -17,14 +20,17 @@ def solicitar_verificacion(request):
             messages.error(request, "Debes subir un archivo.")
             return redirect('users:perfil')
         
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
+        ruta, sha256 = ocr.guardar_archivo('verificaciones', archivo)
         
-        Verificacion.objects.create(
+        verificacion = Verificacion.objects.create(
             id_usuario=usuario,
             tipo=tipo_verificacion,
-            archivo_url=archivo,
+            archivo_url=ruta,
             estado='pendiente'
         )
+        # La lectura del documento se hace en segundo plano (si no se leyó antes)
+        ocr.leer_documento(usuario, ruta, sha256, verificacion=verificacion)
         
         messages.success(request, "Solicitud enviada. Será revisada pronto.")
         return redirect('users:perfil')
@@ -44,16 +50,41 @@ def subir_certificacion(request):
             messages.error(request, "Título y archivo son obligatorios.")
             return redirect('users:perfil')
         
-        usuario = Usuario.objects.get(user=request.user)
+        usuario = obtener_usuario(request)
+        ruta, sha256 = ocr.guardar_archivo('certificaciones', archivo)
         
-        Certificacion.objects.create(
+        certificacion = Certificacion.objects.create(
             id_usuario=usuario,
             titulo=titulo,
             institucion=institucion,
-            archivo=archivo
+            archivo=ruta
         )
+        resultado, trabajo = ocr.leer_documento(usuario, ruta, sha256, certificacion=certificacion)
         
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': True,
+                'id_certificacion': certificacion.id,
+                'id_trabajo_ocr': trabajo.id if trabajo else None,
+                'texto': resultado.texto if resultado else None,
+            })
         messages.success(request, "Certificación subida correctamente.")
         return redirect('users:perfil')
     
-    return render(request, 'users/verificacion/certificacion.html')
\ No newline at end of file
+    return render(request, 'users/verificacion/certificacion.html')
+
+
+@login_required
+def estado_ocr(request, trabajo_id):
+    """Estado de la lectura OCR de un archivo subido (para consultas periódicas)"""
+    trabajo = TrabajoOCR.objects.filter(
+        id=trabajo_id, id_usuario__user=request.user
+    ).values('id', 'estado', 'error', texto=F('id_resultado__texto')).first()
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado'}, status=404)
+
+    if trabajo['estado'] != 'completado':
+        trabajo['texto'] = None
+    if trabajo['estado'] != 'error':
+        trabajo['error'] = None
+    return JsonResponse(trabajo)
@@ -42,6 +42,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.users.middleware.usuario_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -120,15 +121,74 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # Authentication
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'llamkay:home'
 LOGOUT_REDIRECT_URL = 'llamkay:home'
 
 
+# Segundos que la sesión guarda id/tipo del Usuario (0 desactiva la caché)
+USUARIO_SESION_TTL = 60 * 5
+
+
 # Custom User Model (si lo usas)
 # AUTH_USER_MODEL = 'users.Usuario'
 
 
+# Chats
+CHATS_ARCHIVO_DIAS = 180      # Antigüedad a partir de la cual se archivan los mensajes
+CHATS_ARCHIVO_BLOQUE = 1000   # Mensajes máximos por bloque comprimido
+CHATS_PRESENCIA_TTL = 60      # Segundos que dura un latido de presencia
+CHATS_ESCRIBIENDO_TTL = 6     # Segundos que dura el estado "escribiendo..."
+CHATS_ESTADO_INTERVALO = 3    # Segundos entre consultas del estado en la vista del chat (a lo sumo la mitad de CHATS_ESCRIBIENDO_TTL)
+
+
+# Consulta de documentos (RENIEC / SUNAT)
+DOCUMENTOS_BACKEND = 'apps.users.services.documentos.ApiPeruBackend'
+APIPERU_URL = 'https://api.apis.net.pe/v2'
+APIPERU_TOKEN = os.environ.get(
+    'APIPERU_TOKEN',
+    'b6bcd92e240859cbaf2a08b008e357b250fbe17f7c950501bcdb1262e837140b'
+)
+DOCUMENTOS_TIMEOUT = (3, 8)              # Segundos (conexión, lectura)
+DOCUMENTOS_CACHE_TTL = 60 * 60 * 24 * 7  # Documento encontrado
+DOCUMENTOS_CACHE_TTL_NO_ENCONTRADO = 60 * 30
+DOCUMENTOS_FALLAS_MAX = 5                # Fallas seguidas que abren el circuito
+DOCUMENTOS_PAUSA = 30                    # Segundos con el circuito abierto
+
+
+# OCR (EasyOCR, procesado en segundo plano por `manage.py procesar_ocr`)
+OCR_IDIOMAS = ['es']
+OCR_MAX_CONCURRENTES = 2   # Trabajos OCR simultáneos en todo el sistema
+OCR_REINTENTOS = 3         # Intentos antes de marcar el trabajo como error
+OCR_TIEMPO_MAX = 60 * 10   # Segundos tras los que un trabajo "procesando" se reintenta
+OCR_PDF_DPI = (120, 300)   # DPI mínimo y máximo al rasterizar páginas de PDF
+OCR_PDF_LADO_PX = 2200     # Píxeles buscados para el lado mayor de la página
+OCR_PDF_MIN_TEXTO = 20     # Caracteres de capa de texto para omitir el OCR de la página
+
+
+# Tareas en segundo plano (`manage.py run_worker`)
+TAREAS_TIEMPO_MAX = 60 * 15     # Segundos tras los que una tarea "ejecutando" se reintenta
+TAREAS_REINTENTO_BASE = 10      # Segundos de espera antes del primer reintento (luego se duplica)
+
+
+# Portafolio PDF
+PORTAFOLIO_CACHE_TTL = 60 * 60      # Segundos que se confía en el último PDF sin recalcular la huella
+PORTAFOLIO_GENERANDO_TTL = 60 * 5   # Evita encolar dos veces la misma generación
+PORTAFOLIO_ERROR_TTL = 60 * 10      # Tras un fallo, espera antes de permitir otro intento
+
+
+# Miniaturas de imágenes subidas (WebP y JPEG, lado mayor en píxeles)
+MINIATURAS_TAMANOS = {'chico': 96, 'mediano': 320, 'grande': 960}
+MINIATURAS_CALIDAD = 80
+MINIATURAS_CACHE_TTL = 60 * 60 * 24 * 30   # Segundos que se recuerda que las miniaturas existen
+MINIATURAS_GENERANDO_TTL = 60 * 5          # Evita encolar dos veces la misma imagen
+
+
 # Messages framework
 from django.contrib.messages import constants as messages
 
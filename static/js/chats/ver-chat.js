@@ -18,6 +18,12 @@ function initAutoScroll() {
     }
     
     function scrollToBottom() {
+        // Si se llegó desde la búsqueda, centrar el mensaje encontrado
+        const destacado = messagesContainer.querySelector('.message.highlighted');
+        if (destacado) {
+            destacado.scrollIntoView({ block: 'center' });
+            return;
+        }
         if (messagesContainer) {
             messagesContainer.scrollTop = messagesContainer.scrollHeight;
         }
@@ -202,6 +208,70 @@ function initActionButtons() {
     });
 }
 
+/**
+ * Presencia y estado "escribiendo..." del otro usuario
+ */
+function initPresencia() {
+    const chatWindow = document.querySelector('.chat-window');
+    const status = document.querySelector('.chat-status');
+    const textarea = document.querySelector('.message-form textarea');
+    const csrfInput = document.querySelector('[name=csrfmiddlewaretoken]');
+    
+    if (!chatWindow || !chatWindow.dataset.estadoUrl) return;
+    
+    // Intervalos del servidor (segundos): el estado se consulta y el aviso de
+    // "escribiendo" se renueva antes de que expire en la caché
+    const ESCRIBIENDO_TTL = (parseFloat(chatWindow.dataset.escribiendoTtl) || 6) * 1000;
+    const INTERVALO_ESTADO = (parseFloat(chatWindow.dataset.estadoIntervalo) || 3) * 1000;
+    const INTERVALO_ESCRIBIENDO = ESCRIBIENDO_TTL / 2;
+    let ultimoAvisoEscribiendo = 0;
+    
+    // El sondeo del estado también mantiene vivo el latido del usuario actual
+    function actualizarEstado() {
+        if (document.hidden) return;
+        fetch(chatWindow.dataset.estadoUrl, { credentials: 'same-origin' })
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (!data || !status) return;
+                if (data.escribiendo) {
+                    status.textContent = 'Escribiendo...';
+                } else {
+                    status.textContent = data.en_linea ? 'En línea' : '';
+                }
+            })
+            .catch(() => {});
+    }
+    
+    function avisarEscribiendo(activo) {
+        if (!csrfInput) return;
+        const body = new URLSearchParams({ escribiendo: activo ? '1' : '0' });
+        fetch(chatWindow.dataset.escribiendoUrl, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfInput.value },
+            body: body,
+            credentials: 'same-origin'
+        }).catch(() => {});
+    }
+    
+    if (textarea) {
+        textarea.addEventListener('input', function() {
+            const ahora = Date.now();
+            if (ahora - ultimoAvisoEscribiendo > INTERVALO_ESCRIBIENDO) {
+                ultimoAvisoEscribiendo = ahora;
+                avisarEscribiendo(true);
+            }
+        });
+    }
+    
+    const form = document.querySelector('.message-form');
+    if (form) {
+        form.addEventListener('submit', () => avisarEscribiendo(false));
+    }
+    
+    setInterval(actualizarEstado, INTERVALO_ESTADO);
+    document.addEventListener('visibilitychange', actualizarEstado);
+}
+
 /**
  * Inicializar todo cuando el DOM esté listo
  */
@@ -215,6 +285,7 @@ document.addEventListener('DOMContentLoaded', function() {
         initFormSubmit();
         initModalClose();
         initActionButtons();
+        initPresencia();
         
         console.log('✅ Ver-chat.js inicializado correctamente');
     }
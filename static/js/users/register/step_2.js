@@ -20,8 +20,8 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // ===== Cargar provincias cuando cambia el departamento =====
-    departamentoSelect.addEventListener('change', async function () {
-        const departamentoId = this.value;
+    async function cargarProvincias() {
+        const departamentoId = departamentoSelect.value;
         console.log(`🟢 Departamento seleccionado: ${departamentoId}`);
 
         // Resetear selects
@@ -74,11 +74,12 @@ document.addEventListener('DOMContentLoaded', function () {
             provinciaSelect.disabled = false;
             alert('Error al cargar las provincias. Por favor, intenta de nuevo.');
         }
-    });
+    }
+    departamentoSelect.addEventListener('change', cargarProvincias);
 
     // ===== Cargar distritos cuando cambia la provincia =====
-    provinciaSelect.addEventListener('change', async function () {
-        const provinciaId = this.value;
+    async function cargarDistritos() {
+        const provinciaId = provinciaSelect.value;
         console.log(`🟢 Provincia seleccionada: ${provinciaId}`);
 
         distritoSelect.innerHTML = '<option value="">Selecciona tu distrito</option>';
@@ -127,7 +128,43 @@ document.addEventListener('DOMContentLoaded', function () {
             distritoSelect.disabled = false;
             alert('Error al cargar los distritos. Por favor, intenta de nuevo.');
         }
-    });
+    }
+    provinciaSelect.addEventListener('change', cargarDistritos);
+
+    // ===== Rellenar la cascada con la ubicación del dispositivo =====
+    const ubicacionBtn = document.getElementById('usar-ubicacion');
+    if (ubicacionBtn && navigator.geolocation) {
+        ubicacionBtn.hidden = false;
+        ubicacionBtn.addEventListener('click', function () {
+            ubicacionBtn.disabled = true;
+            navigator.geolocation.getCurrentPosition(async function (posicion) {
+                try {
+                    const { latitude, longitude } = posicion.coords;
+                    const response = await fetch(`${urlUbicacionCercana}?lat=${latitude}&lon=${longitude}`);
+                    const data = await response.json();
+                    if (!data.success) {
+                        alert(data.error || 'No se pudo determinar tu ubicación.');
+                        return;
+                    }
+
+                    departamentoSelect.value = data.id_departamento;
+                    await cargarProvincias();
+                    provinciaSelect.value = data.id_provincia;
+                    await cargarDistritos();
+                    distritoSelect.value = data.id_distrito;
+                    console.log(`📍 Ubicación cercana: ${data.comunidad} (${data.distancia_km} km)`);
+                } catch (error) {
+                    console.error('❌ Error al obtener la ubicación cercana:', error);
+                    alert('No se pudo determinar tu ubicación.');
+                } finally {
+                    ubicacionBtn.disabled = false;
+                }
+            }, function () {
+                ubicacionBtn.disabled = false;
+                alert('Permite el acceso a tu ubicación o selecciónala manualmente.');
+            }, { enableHighAccuracy: true, timeout: 10000 });
+        });
+    }
 
     // ===== Validación de email en tiempo real =====
     if (emailInput) {